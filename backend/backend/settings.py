@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -37,6 +38,8 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_ALL_ORIGINS = True  # For development only
 CORS_ALLOW_CREDENTIALS = True
+# Clients send Idempotency-Key on money-moving requests
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 
 # Application definition
@@ -61,13 +64,14 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'stapp.routers.PinPrimaryAfterWriteMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'stapp.authentication.ClaimsJWTAuthentication',
     )
 }
 
@@ -110,23 +114,126 @@ DATABASES = {
     }
 }
 
+# A pool of open connections per process, shared by the threads that run
+# sync views and async ORM queries, so neither WSGI nor ASGI workers open a
+# connection per request. Needs psycopg 3 (pip install "psycopg[binary,pool]");
+# with only psycopg2 installed, connections stay per request.
+#
+# Each request thread holds at most one connection per alias, so a process's
+# pool is as big as its request threads (gunicorn --threads; under uvicorn,
+# requests past that wait up to the pool timeout for a connection). Postgres
+# must allow WEB_WORKERS * DB_POOL_SIZE connections for each alias.
+WEB_WORKERS = 4
+WEB_THREADS = 20
+DB_POOL_SIZE = WEB_THREADS
+try:
+    import psycopg_pool  # noqa: F401
+except ImportError:
+    pass
+else:
+    DATABASES['default']['OPTIONS'] = {'pool': {'min_size': 2, 'max_size': DB_POOL_SIZE, 'timeout': 10}}
+
+# The async views run their bet transactions on any free executor thread,
+# each with a pooled connection of its own, rather than on the request's
+# thread; tests that keep their fixtures in an open TestCase transaction
+# turn this off (see stapp/async_views.py).
+ASYNC_DB_WORKERS = True
+
+# Reporting and history views read from this alias (see stapp/routers.py).
+# As shipped it is a second connection to the primary, so the routing works
+# locally; point HOST/PORT at the streaming replica in production. Tests
+# mirror it onto default.
+DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['stapp.routers.ReplicaRouter']
+REPLICA_DATABASE = 'replica'
+
+# After a write, the user's reads stay on the primary this long, which
+# should comfortably cover the replica's lag
+REPLICA_STICKY_SECONDS = 5
+
 
 
 AUTH_USER_MODEL = 'stapp.User'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'stapp.authentication.ClaimsJWTAuthentication',
     ),
 }
 
 # JWT token settings with 3-day refresh token validity
+# Access tokens carry is_staff and are trusted without a user query. A
+# blocked or demoted user is cut off at once where the cache is shared
+# (see ClaimsJWTAuthentication) and otherwise within this lifetime, after
+# which the refresh re-reads the user.
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=3),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Per-process cache of full users for ClaimsJWTAuthentication. 0 keeps it
+# off and every request trusts the token's claims.
+JWT_USER_CACHE_SIZE = 0
+JWT_USER_CACHE_TTL = 60
+
+# locmem is per process. For several workers, point 'default' (or a
+# separate alias named by RESPONSE_CACHE_ALIAS) at a shared backend, e.g.
+# {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Cached profile, wallet balance and game status responses (see
+# stapp/caching.py). Writes invalidate them; the TTL bounds how stale
+# another process's locmem copy can get. 0 turns the cache off.
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TTL = 30
+
+# Game times (stapp.Game) are wall-clock times here. Each process keeps the
+# schedule in memory and reloads it after GAME_SCHEDULE_TTL seconds, or at
+# once when it saves a Game itself.
+GAME_TIME_ZONE = 'Asia/Kolkata'
+GAME_SCHEDULE_TTL = 60
+
+
+# Password hashing. PASSWORD_HASHER_PROFILE picks the hasher new and
+# upgraded hashes use; the others stay listed so existing hashes still
+# verify, and each is rehashed with the preferred one on its next login.
+PASSWORD_HASHER_PROFILES = {
+    # Django's default PBKDF2
+    'pbkdf2': [
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ],
+    # Argon2 with the costs below; far less CPU per login than PBKDF2.
+    # Needs argon2-cffi.
+    'argon2': [
+        'stapp.hashers.TunedArgon2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ],
+}
+PASSWORD_HASHER_PROFILE = 'pbkdf2'
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]
+
+ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COST = 19456  # KiB
+ARGON2_PARALLELISM = 1
+
+# Logins hash on a pool of PASSWORD_HASH_WORKERS threads with at most
+# PASSWORD_HASH_QUEUE waiting; past that a login gets a 503 after
+# PASSWORD_HASH_WAIT seconds rather than tying up the request workers.
+PASSWORD_HASH_WORKERS = 4
+PASSWORD_HASH_QUEUE = 32
+PASSWORD_HASH_WAIT = 2
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -179,8 +286,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 AUTHENTICATION_BACKENDS = [
-    'stapp.backends.MobileBackend',   # <- Add this line
-    'django.contrib.auth.backends.ModelBackend',
-    'stapp.authentication.UsernameOrMobileBackend',
+    # One query by mobile or username, one password hash per attempt
+    'stapp.backends.MobileOrUsernameBackend',
+]
 
-]
\ No newline at end of file
+# Most that can be staked on one number (per game and bet type) while a
+# game is open. None means no cap; STAKE_CAPS overrides it per game.
+STAKE_CAP_PER_NUMBER = None
+STAKE_CAPS = {
+    # 'gali': 50000,
+}
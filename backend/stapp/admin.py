@@ -2,7 +2,11 @@ from django.contrib import admin, messages
 from django.utils import timezone
 from decimal import Decimal
 from django import forms
+from django.db import transaction
+from django.db.models import F
 from .models import *
+from .summary import record_withdrawal
+from .caching import invalidate_wallets
 
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.admin.sites import AlreadyRegistered
@@ -36,42 +40,57 @@ class WithdrawRequestAdmin(admin.ModelAdmin):
 
     def approve_withdrawal(self, request, queryset):
         count = 0
-        for withdraw in queryset.filter(is_approved=False, is_rejected=False):
-            wallet = Wallet.objects.get(user=withdraw.user)
-            if wallet.balance >= withdraw.amount:
-                wallet.balance -= Decimal(withdraw.amount)
-                wallet.save()
-
-                withdraw.is_approved = True
-                withdraw.approved_at = timezone.now()
+        for pk in queryset.filter(is_approved=False, is_rejected=False).values_list('pk', flat=True):
+            with transaction.atomic():
+                # Lock the request and re-check it, so an admin approving it
+                # at the same time can't debit the wallet twice
+                withdraw = WithdrawRequest.objects.select_for_update().filter(
+                    pk=pk, is_approved=False, is_rejected=False
+                ).first()
+                if withdraw is None:
+                    continue
+                debited = Wallet.objects.filter(
+                    user_id=withdraw.user_id, balance__gte=withdraw.amount
+                ).update(balance=F('balance') - withdraw.amount)
+                if debited:
+                    invalidate_wallets(withdraw.user_id)
+                    withdraw.is_approved = True
+                    withdraw.approved_at = timezone.now()
+                    withdraw.save()
+
+                    Transaction.objects.create(
+                        user=withdraw.user,
+                        transaction_type='withdraw',
+                        amount=withdraw.amount,
+                        status='success',
+                        note="Withdrawal approved"
+                    )
+                    record_withdrawal(withdraw)
+                    count += 1
+            if not debited:
+                self.message_user(request, f"⚠️ {withdraw.user.username} has insufficient balance.")
+        self.message_user(request, f"✅ {count} withdrawal(s) approved.")
+
+    def reject_withdrawal(self, request, queryset):
+        count = 0
+        for pk in queryset.filter(is_approved=False, is_rejected=False).values_list('pk', flat=True):
+            with transaction.atomic():
+                withdraw = WithdrawRequest.objects.select_for_update().filter(
+                    pk=pk, is_approved=False, is_rejected=False
+                ).first()
+                if withdraw is None:
+                    continue
+                withdraw.is_rejected = True
                 withdraw.save()
 
                 Transaction.objects.create(
                     user=withdraw.user,
                     transaction_type='withdraw',
                     amount=withdraw.amount,
-                    status='success',
-                    note="Withdrawal approved"
+                    status='rejected',
+                    note="Withdrawal rejected"
                 )
                 count += 1
-            else:
-                self.message_user(request, f"⚠️ {withdraw.user.username} has insufficient balance.")
-        self.message_user(request, f"✅ {count} withdrawal(s) approved.")
-
-    def reject_withdrawal(self, request, queryset):
-        count = 0
-        for withdraw in queryset.filter(is_approved=False, is_rejected=False):
-            withdraw.is_rejected = True
-            withdraw.save()
-
-            Transaction.objects.create(
-                user=withdraw.user,
-                transaction_type='withdraw',
-                amount=withdraw.amount,
-                status='rejected',
-                note="Withdrawal rejected"
-            )
-            count += 1
         self.message_user(request, f"❌ {count} withdrawal(s) rejected.")
 
     approve_withdrawal.short_description = "✅ Approve selected withdrawal requests"
@@ -89,3 +108,38 @@ class BetAdmin(admin.ModelAdmin):
     list_display = ('user', 'game', 'bet_type', 'number', 'amount', 'is_win', 'payout', 'created_at')
 
 
+
+
+@admin.register(SettlementJob)
+class SettlementJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'game', 'winning_number', 'status', 'bets_processed', 'bets_total', 'winners', 'payout', 'created_at', 'finished_at')
+    list_filter = ('status', 'game')
+
+
+@admin.register(UserFinancialSummary)
+class UserFinancialSummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'total_deposit', 'total_withdraw', 'referral_count', 'referral_earnings', 'updated_at')
+    search_fields = ('user__username', 'user__mobile')
+
+
+@admin.register(ExposureCounter)
+class ExposureCounterAdmin(admin.ModelAdmin):
+    list_display = ('game', 'bet_type', 'number', 'stake', 'bets', 'updated_at')
+    list_filter = ('game', 'bet_type')
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('user', 'key', 'endpoint', 'status_code', 'created_at')
+    search_fields = ('user__username', 'user__mobile', 'key')
+
+
+@admin.register(CommissionPayout)
+class CommissionPayoutAdmin(admin.ModelAdmin):
+    list_display = ('referrer', 'period_end', 'commission', 'bets')
+    search_fields = ('referrer__username', 'referrer__mobile')
+
+@admin.register(Game)
+class GameAdmin(admin.ModelAdmin):
+    list_display = ('label', 'name', 'opens_at', 'closes_at', 'result_at', 'bet_types', 'is_active')
+    list_editable = ('is_active',)
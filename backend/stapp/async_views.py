@@ -0,0 +1,142 @@
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .authentication import ClaimsJWTAuthentication
+from .caching import cached_response, WALLET
+from .idempotency import check_key, run_once
+from .models import Wallet
+from .pagination import HistoryCursorPagination
+from .routers import replica_reads
+from .schedule import InvalidBet, game_schedule
+from .views import HISTORY, parse_bet, place_bet_result
+
+
+# Async versions of the endpoints clients hit hardest, for ASGI (uvicorn
+# backend.asgi:application). A request waiting on the database holds no
+# worker thread; Django's async ORM still runs each query on a thread, and
+# a write that needs a transaction runs whole on one.
+
+def on_worker(func):
+    """
+    ``func`` as a coroutine function run on any free executor thread, so
+    concurrent bets don't queue for one thread. Database connections are
+    per thread, so the worker's goes back to the pool once ``func`` returns.
+    ASYNC_DB_WORKERS = False runs it on the request's own thread instead,
+    as tests inside a TestCase transaction need.
+    """
+    def run(*args):
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+
+    @wraps(func)
+    async def wrapper(*args):
+        if not getattr(settings, 'ASYNC_DB_WORKERS', True):
+            return await sync_to_async(func)(*args)
+        return await sync_to_async(run, thread_sensitive=False)(*args)
+
+    return wrapper
+
+
+def render(body, status=200):
+    # The same JSON the DRF views render
+    return HttpResponse(JSONRenderer().render(body), status=status, content_type='application/json')
+
+
+def authenticated(view):
+    """
+    IsAuthenticated for async views, with the same JWT authentication as
+    the DRF ones. Sets request.user, so it goes above @cached_response and
+    @replica_reads.
+    """
+    authentication = ClaimsJWTAuthentication()
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            result = await authentication.aauthenticate(request)
+        except APIException as e:
+            return render(e.detail if isinstance(e.detail, dict) else {'detail': e.detail}, status=e.status_code)
+        if result is None:
+            return render({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user = result[0]
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@csrf_exempt
+@require_POST
+@authenticated
+async def place_bet(request):
+    try:
+        game_name, line = parse_bet(json.loads(request.body))
+        # Unknown and closed games are refused without leaving the loop
+        await game_schedule.acheck(game_name, [line])
+    except InvalidBet as e:
+        return render({'error': str(e)}, status=400)
+    except ValueError:
+        return render({'error': 'Invalid JSON'}, status=400)
+
+    key = request.headers.get('Idempotency-Key')
+    if not key:
+        status_code, body = await on_worker(place_bet_result)(request.user, game_name, line)
+        return render(body, status=status_code)
+    if error := check_key(key):
+        return render(error, status=400)
+
+    status_code, body, replayed = await on_worker(run_once)(
+        request.user.id, key, request.path, lambda: place_bet_result(request.user, game_name, line))
+    response = render(body, status=status_code)
+    if replayed:
+        response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+@require_GET
+@authenticated
+@cached_response(WALLET)
+async def wallet_balance(request):
+    try:
+        wallet = await Wallet.objects.filter(user_id=request.user.pk).values('balance', 'bonus', 'winnings').afirst()
+        if wallet is None:
+            await Wallet.objects.acreate(user_id=request.user.pk)
+            return render({'balance': '0.00', 'bonus': '0.00', 'winnings': '0.00'})
+        return render({field: str(value) for field, value in wallet.items()})
+    except Exception as e:
+        return render({'error': str(e)}, status=500)
+
+
+def history_view(name):
+    """An async view serving the same pages as the DRF history endpoint ``name``."""
+    rows, row = HISTORY[name]
+
+    @require_GET
+    @authenticated
+    @replica_reads
+    async def view(request):
+        try:
+            paginator = HistoryCursorPagination()
+            page = await paginator.apaginate_queryset(rows(request.user), Request(request))
+            return render(paginator.get_paginated_response([row(item) for item in page]).data)
+        except Exception as e:
+            return render({'error': str(e)}, status=500)
+
+    return view
+
+
+transaction_history = history_view('transactions')
+view_bets_24h = history_view('bets-24h')
+view_bets_30d = history_view('bets-30d')
+user_bet_history = history_view('my-bets')
@@ -1,34 +1,204 @@
+# stapp/authentication.py
+import copy
+import threading
+import time
+from collections import OrderedDict
 
-from django.contrib.auth.backends import ModelBackend
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 
-UserModel = get_user_model()
+User = get_user_model()
 
-class UsernameOrMobileBackend(ModelBackend):
-    def authenticate(self, request, username=None, password=None, **kwargs):
-        if username is None or password is None:
-            return None
-            
-        # First try to authenticate with mobile number
-        try:
-            user = UserModel.objects.get(mobile=username)
-            if user.check_password(password) and self.user_can_authenticate(user):
-                return user
-        except UserModel.DoesNotExist:
-            pass
-
-        # Then try with username
-        try:
-            user = UserModel.objects.get(username=username)
-            if user.check_password(password) and self.user_can_authenticate(user):
-                return user
-        except UserModel.DoesNotExist:
-            pass
-
-        return None
-
-    def get_user(self, user_id):
-        try:
-            return UserModel.objects.get(pk=user_id)
-        except UserModel.DoesNotExist:
+# Copied into every token so most requests never need the user row. Any
+# other field is loaded from the database the first time a view reads it.
+USER_CLAIMS = ('username', 'mobile', 'is_staff', 'referral_code', 'referred_by_id')
+
+
+def set_user_claims(token, user):
+    for field in USER_CLAIMS:
+        token[field] = getattr(user, field)
+
+
+class UserClaimsRefreshToken(RefreshToken):
+    """A refresh token (and the access tokens made from it) carrying USER_CLAIMS."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_user_claims(token, user)
+        return token
+
+
+class UserClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh that re-reads the user, so revoked staff rights or a blocked
+    account take effect on the next refresh and claims never outlive it.
+    """
+    token_class = UserClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        set_user_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # Blacklist app not installed
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class UserCache:
+    """
+    A small per-process LRU of full User objects that expire after a TTL.
+
+    Sized and timed by JWT_USER_CACHE_SIZE (0 turns it off) and
+    JWT_USER_CACHE_TTL. Saving or deleting a user drops it here (see
+    signals.py); other processes pick the change up within the TTL.
+    """
+
+    def __init__(self):
+        self.users = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def size(self):
+        return getattr(settings, 'JWT_USER_CACHE_SIZE', 0)
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self.users[user_id]
+                return None
+            self.users.move_to_end(user_id)
+        # Views may change request.user, so each request gets its own copy
+        return copy.copy(user)
+
+    def set(self, user_id, user):
+        with self.lock:
+            self.users[user_id] = (copy.copy(user), time.monotonic() + getattr(settings, 'JWT_USER_CACHE_TTL', 60))
+            self.users.move_to_end(user_id)
+            while len(self.users) > self.size:
+                self.users.popitem(last=False)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+
+
+user_cache = UserCache()
+
+
+def access_stamp_key(user_id):
+    return f'auth:access:{user_id}'
+
+
+def stamp_access(user, deleted=False):
+    """
+    Record the user's current is_active/is_staff in the cache for as long
+    as an access token issued before the change can live.
+    """
+    state = (False, False) if deleted else (user.is_active, user.is_staff)
+    cache.set(access_stamp_key(user.pk), state, api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+
+
+def check_access_stamp(user):
+    """Apply a stamp left by a save since the token was issued; raises for blocked users."""
+    state = cache.get(access_stamp_key(user.pk))
+    if state is not None:
+        is_active, user.is_staff = state
+        if not is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+    return user
+
+
+def user_from_claims(token):
+    """
+    A User built from the token without a query; fields outside the claims
+    load on first access. is_active and is_staff are overridden by the
+    access stamp a later save left in the cache (see stamp_access).
+    """
+    values = {'id': User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM]), 'is_active': True}
+    values.update((field, token[field]) for field in USER_CLAIMS)
+    # from_db takes the values in model field order
+    fields = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    return check_access_stamp(User.from_db(None, fields, [values[f] for f in fields]))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that takes the user from the token's claims instead
+    of loading the row on every request.
+
+    With JWT_USER_CACHE_SIZE set, the full user is loaded once per TTL
+    instead, which also notices a blocked account within the TTL rather
+    than at the next token refresh. Tokens issued before the claims
+    existed fall back to the usual query.
+
+    Blocking or demoting a user takes effect on their next request in any
+    process sharing the 'default' cache. With the per-process locmem
+    cache, other workers keep trusting the token's claims until it
+    expires, so ACCESS_TOKEN_LIFETIME bounds that window.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken('Token contained no recognizable user identification')
+        # The claim is a string; signals drop cached users by their int pk
+        user_id = User._meta.pk.to_python(user_id)
+
+        if user_cache.size:
+            user = user_cache.get(user_id)
+            if user is None:
+                user = super().get_user(validated_token)
+                user_cache.set(user_id, user)
+            elif not user.is_active:
+                raise AuthenticationFailed('User is inactive', code='user_inactive')
+            return user
+
+        if any(field not in validated_token for field in USER_CLAIMS):
+            return super().get_user(validated_token)
+        return user_from_claims(validated_token)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views. Checking the token is pure CPU, and
+        so is a user built from its claims; only a load from the database
+        is handed to a thread.
+        """
+        header = self.get_header(request)
+        raw_token = None if header is None else self.get_raw_token(header)
+        if raw_token is None:
             return None
+        validated_token = self.get_validated_token(raw_token)
+        if not user_cache.size and all(field in validated_token for field in USER_CLAIMS):
+            return user_from_claims(validated_token), validated_token
+        return await sync_to_async(self.get_user)(validated_token), validated_token
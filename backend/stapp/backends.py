@@ -1,20 +1,111 @@
 # stapp/backends.py
-from django.contrib.auth.backends import BaseBackend
+from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+
+from .hashers import (
+    acheck_password_bounded, amake_password_bounded, check_password_bounded, make_password_bounded,
+)
 
 User = get_user_model()
 
-class MobileBackend(BaseBackend):
-    def authenticate(self, request, mobile=None, password=None, **kwargs):
-        try:
-            user = User.objects.get(mobile=mobile)
-            if user.check_password(password):
-                return user
-        except User.DoesNotExist:
+# get_user() runs on every session-authenticated request. Cached users are
+# dropped when they are saved or deleted (see signals.py); other processes
+# see the change once their copy expires.
+USER_CACHE_TIMEOUT = 60
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def release_connection(alias):
+    """
+    Hand this thread's pooled connection back before a slow password hash,
+    so logins waiting on the hash pool don't drain the connection pool.
+    The next query checks one out again. Without a pool, or inside a
+    transaction, the connection is kept.
+    """
+    conn = connections[alias]
+    if conn.settings_dict['OPTIONS'].get('pool') and not conn.in_atomic_block:
+        conn.close()
+
+
+def check_user_password(user, password):
+    """
+    user.check_password() with the hashing done on the bounded pool. A hash
+    made by an older hasher or cost is replaced once the password matches.
+    """
+    is_correct, must_update = check_password_bounded(password, user.password)
+    if is_correct and must_update:
+        user.password = make_password_bounded(password)
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+async def acheck_user_password(user, password):
+    is_correct, must_update = await acheck_password_bounded(password, user.password)
+    if is_correct and must_update:
+        user.password = await amake_password_bounded(password)
+        await user.asave(update_fields=['password'])
+    return is_correct
+
+
+class MobileOrUsernameBackend(ModelBackend):
+    """
+    Log in with a mobile number or a username.
+
+    Both are unique and indexed, so one query finds the user, and the
+    password is hashed exactly once whether or not the user exists, so a
+    failed login costs the same either way.
+    """
+
+    def authenticate(self, request, username=None, password=None, mobile=None, **kwargs):
+        identifier = mobile or username or kwargs.get(User.USERNAME_FIELD)
+        if not identifier or password is None:
             return None
 
-    def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
+        matches = User.objects.filter(Q(mobile=identifier) | Q(username=identifier))[:2]
+        user = self._pick(identifier, matches)
+        release_connection(matches.db)
+        if user is None:
+            # Hash anyway so unknown users can't be told apart by timing
+            check_password_bounded(password, '')
+            return None
+        if check_user_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, mobile=None, **kwargs):
+        identifier = mobile or username or kwargs.get(User.USERNAME_FIELD)
+        if not identifier or password is None:
             return None
+
+        matches = User.objects.filter(Q(mobile=identifier) | Q(username=identifier))[:2]
+        user = self._pick(identifier, [u async for u in matches])
+        await sync_to_async(release_connection)(matches.db)
+        if user is None:
+            await acheck_password_bounded(password, '')
+            return None
+        if await acheck_user_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    @staticmethod
+    def _pick(identifier, matches):
+        matches = list(matches)
+        # A mobile number wins over someone else's identical username
+        return next((u for u in matches if u.mobile == identifier), matches[0] if matches else None)
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = User._default_manager.filter(pk=user_id).first()
+            if user is None:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
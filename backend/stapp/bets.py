@@ -0,0 +1,77 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .exposure import add_exposures
+from .models import Bet, ReferralCommission
+from .schedule import NUMBER_RANGES, GameClosed, InvalidBet, game_schedule
+from .wallet import debit_wallet
+
+
+# Referrers earn 1% of every bet their referrals place on these games
+COMMISSION_GAMES = ('faridabad', 'gali', 'disawer', 'ghaziabad')
+COMMISSION_RATE = Decimal('0.01')
+
+MAX_SLIP_LINES = 200
+
+
+def parse_line(line):
+    """Validate one {bet_type, number, amount} line and return it as a (bet_type, number, amount) tuple."""
+    try:
+        bet_type = line.get('bet_type', 'number')
+        number = int(line.get('number'))
+        amount = Decimal(str(line.get('amount', 0)))
+    except (AttributeError, TypeError, ValueError, InvalidOperation):
+        raise InvalidBet('Invalid bet data')
+
+    if bet_type not in NUMBER_RANGES or number not in NUMBER_RANGES[bet_type]:
+        raise InvalidBet(f'Invalid number {number} for {bet_type}')
+    if amount <= 0 or amount != amount.quantize(Decimal('0.01')):
+        raise InvalidBet(f'Invalid amount {amount}')
+    return bet_type, number, amount
+
+
+def place_bets(user, game, lines):
+    """
+    Place parsed (bet_type, number, amount) lines of ``game`` for ``user``,
+    all or nothing.
+
+    One wallet debit for the total, one exposure upsert, one bulk INSERT
+    for the bets and, for referred users, one for the commissions. Returns
+    (bets, balance, bonus). Raises InvalidBet (or GameClosed) for a game
+    the in-memory schedule doesn't have open, before any query, and
+    InsufficientBalance or StakeCapExceeded with nothing placed.
+    """
+    game_schedule.check(game, lines)
+    total = sum(amount for _, _, amount in lines)
+
+    with transaction.atomic():
+        balance, bonus = debit_wallet(user.id, total)
+        add_exposures(game, lines)
+        bets = Bet.objects.bulk_create([
+            Bet(user=user, game=game, bet_type=bet_type, number=number, amount=amount)
+            for bet_type, number, amount in lines
+        ])
+
+        if game in COMMISSION_GAMES and user.referred_by_id:
+            accrue_commissions(user, bets)
+
+    return bets, balance, bonus
+
+
+def accrue_commissions(user, bets):
+    """
+    Log the commission the referrer of ``user`` earns on ``bets``. Call
+    inside the bets' transaction. Only the referrer's id is needed, and
+    that comes with the bettor, so nothing is looked up; the referrer's
+    wallet and summary are credited later by commissions.roll_up_commissions.
+    """
+    ReferralCommission.objects.bulk_create([
+        ReferralCommission(
+            referrer_id=user.referred_by_id,
+            referred_user=user,
+            bet=bet,
+            commission=(bet.amount * COMMISSION_RATE).quantize(Decimal('0.01'))
+        )
+        for bet in bets
+    ])
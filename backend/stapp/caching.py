@@ -0,0 +1,194 @@
+import json
+import threading
+import uuid
+from collections import Counter, defaultdict
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import JsonResponse
+from rest_framework.response import Response
+
+
+# Kinds of cached response, each invalidated on its own
+PROFILE = 'profile'
+WALLET = 'wallet'
+
+
+class ResponseCache:
+    """
+    Cached bodies of the read endpoints every client polls.
+
+    Lives in the RESPONSE_CACHE_ALIAS cache for RESPONSE_CACHE_TTL seconds
+    (0 turns it off). The default locmem backend is per process, so other
+    processes only see a change once their copy expires; point the alias at
+    a shared backend (Redis, Memcached) and every write is seen everywhere.
+
+    An entry is only served if it was stored under the current generation
+    of its kind and the current version of its key, which the same get_many
+    fetches alongside it. Writes move the keys they touch to a new version,
+    once straight away and again after the transaction commits, so a reader
+    that looked the entry up before then stores what it read under a
+    version that is already retired, however late its set() lands. Bulk
+    writes (settlement, commission roll-ups) move the whole kind to a new
+    generation the same way.
+    """
+
+    def __init__(self):
+        self.counts = defaultdict(Counter)
+        self.lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'RESPONSE_CACHE_TTL', 0)
+
+    @staticmethod
+    def key(kind, key):
+        return f'response:{kind}:{key}'
+
+    @staticmethod
+    def generation_key(kind):
+        return f'response:{kind}:generation'
+
+    @staticmethod
+    def version_key(kind, key):
+        return f'response:{kind}:{key}:version'
+
+    def count(self, kind, event, n=1):
+        with self.lock:
+            self.counts[kind][event] += n
+
+    def lookup_keys(self, kind, key):
+        # (entry, generation, version) and the timeout of each token. A
+        # version need not outlive the entries stored under it
+        return (self.key(kind, key), self.generation_key(kind), self.version_key(kind, key)), (None, self.ttl)
+
+    def get(self, kind, key):
+        """(body, token); body is None on a miss. Pass the token to set()."""
+        keys, timeouts = self.lookup_keys(kind, key)
+        found = self.backend.get_many(keys)
+        token = []
+        for token_key, timeout in zip(keys[1:], timeouts):
+            if found.get(token_key) is None:
+                # Never seen or evicted: a fresh token, so no older entry can match it
+                self.backend.add(token_key, uuid.uuid4().hex, timeout)
+                found[token_key] = self.backend.get(token_key)
+            token.append(found[token_key])
+        return self.unpack(kind, found.get(keys[0]), tuple(token))
+
+    async def aget(self, kind, key):
+        keys, timeouts = self.lookup_keys(kind, key)
+        found = await self.backend.aget_many(keys)
+        token = []
+        for token_key, timeout in zip(keys[1:], timeouts):
+            if found.get(token_key) is None:
+                await self.backend.aadd(token_key, uuid.uuid4().hex, timeout)
+                found[token_key] = await self.backend.aget(token_key)
+            token.append(found[token_key])
+        return self.unpack(kind, found.get(keys[0]), tuple(token))
+
+    def unpack(self, kind, entry, token):
+        if entry is not None and entry[0] == token:
+            self.count(kind, 'hits')
+            return entry[1], token
+        self.count(kind, 'misses')
+        return None, token
+
+    def set(self, kind, key, token, body):
+        self.backend.set(self.key(kind, key), (token, body), self.ttl)
+
+    async def aset(self, kind, key, token, body):
+        await self.backend.aset(self.key(kind, key), (token, body), self.ttl)
+
+    def invalidate(self, kind, *keys):
+        """Retire the entries of ``keys``, now and once the current transaction commits."""
+        keys = [self.version_key(kind, key) for key in keys]
+        if not keys:
+            return
+        self.count(kind, 'invalidations', len(keys))
+        bump = lambda: self.backend.set_many({key: uuid.uuid4().hex for key in keys}, self.ttl)
+        bump()
+        transaction.on_commit(bump)
+
+    def invalidate_all(self, kind):
+        """Retire every entry of ``kind``, now and once the current transaction commits."""
+        self.count(kind, 'flushes')
+        bump = lambda: self.backend.set(self.generation_key(kind), uuid.uuid4().hex, None)
+        bump()
+        transaction.on_commit(bump)
+
+    def stats(self):
+        with self.lock:
+            counts = {kind: dict(counts) for kind, counts in self.counts.items()}
+        for kind in counts.values():
+            looked_up = kind.get('hits', 0) + kind.get('misses', 0)
+            kind['hit_rate'] = round(kind.get('hits', 0) / looked_up, 4) if looked_up else None
+        return counts
+
+    def reset_stats(self):
+        with self.lock:
+            self.counts.clear()
+
+
+response_cache = ResponseCache()
+
+
+def invalidate_profiles(*user_ids):
+    response_cache.invalidate(PROFILE, *user_ids)
+
+
+def invalidate_wallets(*user_ids):
+    response_cache.invalidate(WALLET, *user_ids)
+
+
+def cached_response(kind):
+    """
+    Serve a GET API view's 200 responses from the response cache.
+
+    One entry per user. Sets X-Cache to hit or miss. Goes below @api_view
+    so the user is already authenticated; async views return a
+    JsonResponse and must set request.user before calling the wrapped view.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not response_cache.ttl:
+                    return await view(request, *args, **kwargs)
+
+                body, token = await response_cache.aget(kind, request.user.pk)
+                if body is not None:
+                    return JsonResponse(body, headers={'X-Cache': 'hit'})
+
+                response = await view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    await response_cache.aset(kind, request.user.pk, token, json.loads(response.content))
+                response['X-Cache'] = 'miss'
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not response_cache.ttl:
+                return view(request, *args, **kwargs)
+
+            key = request.user.pk
+            body, token = response_cache.get(kind, key)
+            if body is not None:
+                return Response(body, headers={'X-Cache': 'hit'})
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                response_cache.set(kind, key, token, response.data)
+            response['X-Cache'] = 'miss'
+            return response
+
+        return wrapper
+    return decorator
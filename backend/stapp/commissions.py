@@ -0,0 +1,86 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .caching import response_cache, WALLET
+from .models import CommissionPayout, ReferralCommission, UserFinancialSummary, Wallet
+
+
+# Commissions are only logged on the bet path (see bets.accrue_commissions)
+# so a busy referrer's wallet is never locked by their referrals' bets. A
+# roll-up claims the pending ones and, per referrer, credits the wallet
+# once, writes one CommissionPayout and bumps the financial summary.
+ROLL_UP_BATCH = 50000
+
+# Everything in one statement, so it all sees one snapshot: the NOT EXISTS
+# below sees earlier roll-ups but not the rows claimed here.
+ROLL_UP_SQL = """
+WITH claimed AS (
+    UPDATE {commission} SET rolled_up_at = %(now)s
+    WHERE id IN (
+        SELECT id FROM {commission} WHERE rolled_up_at IS NULL
+        ORDER BY id LIMIT %(batch)s FOR UPDATE SKIP LOCKED)
+    RETURNING referrer_id, referred_user_id, commission
+),
+totals AS (
+    SELECT referrer_id, SUM(commission) AS commission, COUNT(*) AS bets
+    FROM claimed GROUP BY referrer_id
+),
+new_referrals AS (
+    SELECT c.referrer_id, COUNT(DISTINCT c.referred_user_id) AS referrals
+    FROM claimed AS c
+    WHERE NOT EXISTS (
+        SELECT 1 FROM {commission} AS r
+        WHERE r.referrer_id = c.referrer_id AND r.referred_user_id = c.referred_user_id
+          AND r.rolled_up_at IS NOT NULL)
+    GROUP BY c.referrer_id
+),
+payouts AS (
+    INSERT INTO {payout} (referrer_id, period_end, commission, bets)
+    SELECT referrer_id, %(now)s, commission, bets FROM totals
+),
+wallets AS (
+    UPDATE {wallet} AS w SET bonus = w.bonus + t.commission
+    FROM totals AS t WHERE w.user_id = t.referrer_id
+),
+summaries AS (
+    INSERT INTO {summary} (user_id, total_deposit, total_withdraw, referral_count, referral_earnings, updated_at)
+    SELECT t.referrer_id, 0, 0, COALESCE(n.referrals, 0), t.commission, CURRENT_TIMESTAMP
+    FROM totals AS t LEFT JOIN new_referrals AS n ON n.referrer_id = t.referrer_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        referral_count = {summary}.referral_count + EXCLUDED.referral_count,
+        referral_earnings = {summary}.referral_earnings + EXCLUDED.referral_earnings,
+        updated_at = CURRENT_TIMESTAMP
+)
+SELECT COUNT(*), COALESCE(SUM(bets), 0), COALESCE(SUM(commission), 0) FROM totals
+"""
+
+# Two roll-ups at once could both count the same new referral
+LOCK_SQL = "SELECT pg_advisory_xact_lock(hashtext('stapp.roll_up_commissions'))"
+
+
+def roll_up_commissions(batch=ROLL_UP_BATCH):
+    """
+    Credit pending commissions, at most ``batch`` per statement, until none
+    are left. Returns (payouts written, commissions credited, total amount).
+    """
+    sql = ROLL_UP_SQL.format(
+        commission=_table(ReferralCommission),
+        payout=_table(CommissionPayout),
+        wallet=_table(Wallet),
+        summary=_table(UserFinancialSummary),
+    )
+    payouts = bets = total = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(LOCK_SQL)
+            cursor.execute(sql, {'now': timezone.now(), 'batch': batch})
+            paid, claimed, credited = cursor.fetchone()
+        if not claimed:
+            return payouts, bets, total
+        # Every paid referrer's bonus moved
+        response_cache.invalidate_all(WALLET)
+        payouts, bets, total = payouts + paid, bets + claimed, total + credited
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
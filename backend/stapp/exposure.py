@@ -0,0 +1,132 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, When
+from django.db.models.functions import Mod
+
+from .models import Bet, ExposureCounter
+
+
+class StakeCapExceeded(Exception):
+    """The bet would take a number's open stake past its cap."""
+
+
+# Add bets to their counters, but only while every total stays within the
+# cap. The check and the increment are one statement per row, so concurrent
+# bets on the same number are serialised by the row lock and can't both
+# slip under the cap. A counter that would pass the cap isn't returned.
+#
+# The statement first takes the game's exposure lock shared, so bets don't
+# wait on each other for it but do wait while rebuild_exposure holds it.
+ADD_SQL = """
+    INSERT INTO {table} (game, bet_type, number, stake, bets, updated_at)
+    SELECT line.*, CURRENT_TIMESTAMP
+    FROM pg_advisory_xact_lock_shared(hashtext('stapp.exposure:' || %s)) AS game_lock,
+         (VALUES {values}) AS line (game, bet_type, number, stake, bets)
+    ON CONFLICT (game, bet_type, number) DO UPDATE
+    SET stake = {table}.stake + EXCLUDED.stake,
+        bets = {table}.bets + EXCLUDED.bets,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE %s IS NULL OR {table}.stake + EXCLUDED.stake <= %s
+    RETURNING bet_type, number
+"""
+
+# Held alone while a game's counters are recounted, so no bet commits in
+# between the count and the rewrite
+LOCK_SQL = "SELECT pg_advisory_xact_lock(hashtext('stapp.exposure:' || %s))"
+
+
+def stake_cap(game):
+    """The configured cap for one number of ``game``, or None."""
+    cap = getattr(settings, 'STAKE_CAPS', {}).get(game, getattr(settings, 'STAKE_CAP_PER_NUMBER', None))
+    return None if cap is None else Decimal(str(cap))
+
+
+def exposure_number(bet_type, number):
+    # A number bet on 100 pays out on the same result as 0
+    return number % 100 if bet_type == 'number' else number
+
+
+def add_exposure(game, bet_type, number, amount):
+    """Count one new bet against its number, see add_exposures."""
+    add_exposures(game, [(bet_type, number, amount)])
+
+
+def add_exposures(game, lines):
+    """
+    Count new bets, given as (bet_type, number, amount) lines, against their
+    numbers in one statement.
+
+    Call inside the transaction that places the bets. Raises
+    StakeCapExceeded if any number would pass the cap; the caller's
+    transaction then rolls back the counters and the debit together.
+    """
+    totals = {}
+    for bet_type, number, amount in lines:
+        key = (bet_type, exposure_number(bet_type, number))
+        stake, bets = totals.get(key, (0, 0))
+        totals[key] = (stake + amount, bets + 1)
+
+    cap = stake_cap(game)
+    if cap is not None and any(stake > cap for stake, _ in totals.values()):
+        raise StakeCapExceeded(cap)
+
+    params = []
+    for (bet_type, number), (stake, bets) in totals.items():
+        params.extend([game, bet_type, number, stake, bets])
+    sql = ADD_SQL.format(
+        table=connection.ops.quote_name(ExposureCounter._meta.db_table),
+        values=', '.join(['(%s, %s, %s, %s, %s)'] * len(totals)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [game] + params + [cap, cap])
+        if cursor.rowcount < len(totals):
+            raise StakeCapExceeded(cap)
+
+
+def rebuild_exposure(game=None):
+    """Recount the counters of ``game`` (or every game) from its pending bets."""
+    if game is None:
+        games = set(Bet.objects.filter(status='pending').values_list('game', flat=True).distinct())
+        games.update(ExposureCounter.objects.values_list('game', flat=True).distinct())
+        for game in sorted(games):
+            rebuild_exposure(game)
+        return
+
+    with transaction.atomic():
+        # Bets placed before the lock are counted, later ones wait for it
+        with connection.cursor() as cursor:
+            cursor.execute(LOCK_SQL, [game])
+        rows = list(
+            Bet.objects.filter(status='pending', game=game)
+            .annotate(key=Case(When(bet_type='number', then=Mod('number', 100)), default=F('number'),
+                               output_field=IntegerField()))
+            .values('bet_type', 'key')
+            .annotate(stake=Sum('amount'), bets=Count('id'))
+        )
+        ExposureCounter.objects.filter(game=game).delete()
+        ExposureCounter.objects.bulk_create(
+            ExposureCounter(game=game, bet_type=row['bet_type'], number=row['key'],
+                            stake=row['stake'], bets=row['bets'])
+            for row in rows
+        )
+
+
+def exposure_book(game):
+    """Open stake and payout liability per bet type and number of ``game``, biggest liability first."""
+    from .settlement import PAYOUT_MULTIPLIERS, DEFAULT_MULTIPLIERS
+
+    number_x, digit_x = PAYOUT_MULTIPLIERS.get(game, DEFAULT_MULTIPLIERS)
+    rows = []
+    for counter in ExposureCounter.objects.filter(game=game, bets__gt=0):
+        multiplier = number_x if counter.bet_type == 'number' else digit_x
+        rows.append({
+            'bet_type': counter.bet_type,
+            'number': counter.number,
+            'stake': counter.stake,
+            'bets': counter.bets,
+            'liability': counter.stake * multiplier,
+        })
+    rows.sort(key=lambda row: row['liability'], reverse=True)
+    return rows
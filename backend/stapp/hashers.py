@@ -0,0 +1,94 @@
+# stapp/hashers.py
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, make_password, verify_password
+from rest_framework.exceptions import APIException
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2 with its costs taken from ARGON2_TIME_COST, ARGON2_MEMORY_COST
+    and ARGON2_PARALLELISM. Hashes made with other costs are upgraded the
+    next time their user logs in.
+    """
+    time_cost = getattr(settings, 'ARGON2_TIME_COST', Argon2PasswordHasher.time_cost)
+    memory_cost = getattr(settings, 'ARGON2_MEMORY_COST', Argon2PasswordHasher.memory_cost)
+    parallelism = getattr(settings, 'ARGON2_PARALLELISM', Argon2PasswordHasher.parallelism)
+
+
+class PasswordCheckBusy(APIException):
+    status_code = 503
+    default_detail = 'Too many logins right now, please try again in a moment.'
+    default_code = 'password_check_busy'
+
+
+# Password hashing is CPU bound, so at most PASSWORD_HASH_WORKERS run at
+# once and at most PASSWORD_HASH_QUEUE more wait for a worker. Anything
+# past that is turned away after PASSWORD_HASH_WAIT seconds instead of
+# piling up on the request workers that also serve bets.
+WORKERS = getattr(settings, 'PASSWORD_HASH_WORKERS', 4)
+QUEUE = getattr(settings, 'PASSWORD_HASH_QUEUE', 32)
+WAIT = getattr(settings, 'PASSWORD_HASH_WAIT', 2)
+
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='password-hash')
+_slots = threading.BoundedSemaphore(WORKERS + QUEUE)
+
+
+def _run(func, *args):
+    # The caller holds a slot; it is given back when the job finishes
+    future = _pool.submit(func, *args)
+    future.add_done_callback(lambda f: _slots.release())
+    return future
+
+
+def _call(func, *args):
+    if not _slots.acquire(timeout=WAIT):
+        raise PasswordCheckBusy()
+    return _run(func, *args).result()
+
+
+def _release_if_acquired(waiting):
+    if not waiting.cancelled() and waiting.result():
+        _slots.release()
+
+
+async def _acall(func, *args):
+    loop = asyncio.get_running_loop()
+    # Wait for a slot off the event loop, then await the hash without holding a thread
+    if not _slots.acquire(blocking=False):
+        waiting = loop.run_in_executor(None, _slots.acquire, True, WAIT)
+        try:
+            acquired = await asyncio.shield(waiting)
+        except asyncio.CancelledError:
+            # The login was cancelled (the client went away) but the thread
+            # still waits, and gives back any slot it gets
+            waiting.add_done_callback(_release_if_acquired)
+            raise
+        if not acquired:
+            raise PasswordCheckBusy()
+    return await asyncio.wrap_future(_run(func, *args))
+
+
+def check_password_bounded(password, encoded):
+    """
+    (is_correct, must_update) for ``password`` against ``encoded``, hashed on
+    the bounded pool. An empty ``encoded`` hashes anyway so unknown users take
+    as long as wrong passwords. Raises PasswordCheckBusy when the pool is full.
+    """
+    return _call(verify_password, password, encoded)
+
+
+def make_password_bounded(password):
+    return _call(make_password, password)
+
+
+async def acheck_password_bounded(password, encoded):
+    """check_password_bounded() for async views; the event loop is free while the hash runs."""
+    return await _acall(verify_password, password, encoded)
+
+
+async def amake_password_bounded(password):
+    return await _acall(make_password, password)
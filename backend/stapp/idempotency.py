@@ -0,0 +1,103 @@
+from datetime import timedelta
+from functools import wraps
+
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+# How long a key keeps answering retries
+KEY_TTL = timedelta(hours=24)
+MAX_KEY_LENGTH = 64
+
+# Claim the key, or take over an expired one. A concurrent request with the
+# same key blocks on the unique index until the first one commits and then
+# finds the key taken, so the write path never runs twice.
+CLAIM_SQL = """
+    INSERT INTO {table} (user_id, key, endpoint, status_code, response, created_at)
+    VALUES (%(user_id)s, %(key)s, %(endpoint)s, NULL, NULL, %(now)s)
+    ON CONFLICT (user_id, key) DO UPDATE
+    SET endpoint = EXCLUDED.endpoint, status_code = NULL, response = NULL, created_at = EXCLUDED.created_at
+    WHERE {table}.created_at < %(expired)s
+    RETURNING id
+"""
+
+
+def claim_key(user_id, key, endpoint):
+    """Return the id of the newly claimed key, or None if a live one already exists."""
+    now = timezone.now()
+    sql = CLAIM_SQL.format(table=connection.ops.quote_name(IdempotencyKey._meta.db_table))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'user_id': user_id, 'key': key, 'endpoint': endpoint,
+                             'now': now, 'expired': now - KEY_TTL})
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def run_once(user_id, key, endpoint, run):
+    """
+    Call ``run()``, which returns (status_code, body), at most once per key.
+
+    The first call with a key runs it and stores the result in the same
+    transaction, so the key and the write commit together. A retry gets the
+    stored result without running it. Server errors aren't stored, so a
+    request that failed can be retried with the same key. Returns
+    (status_code, body, replayed).
+    """
+    with transaction.atomic():
+        key_id = claim_key(user_id, key, endpoint)
+        if key_id is None:
+            stored = IdempotencyKey.objects.get(user_id=user_id, key=key)
+            if stored.endpoint != endpoint:
+                return 422, {'error': 'Idempotency-Key was already used for another request'}, False
+            return stored.status_code, stored.response, True
+
+        status_code, body = run()
+        if status_code >= 500:
+            # Release the key along with whatever was written
+            transaction.set_rollback(True)
+        else:
+            IdempotencyKey.objects.filter(pk=key_id).update(status_code=status_code, response=body)
+        return status_code, body, False
+
+
+def check_key(key):
+    """An error body for an unusable Idempotency-Key, or None."""
+    if len(key) > MAX_KEY_LENGTH:
+        return {'error': f'Idempotency-Key is longer than {MAX_KEY_LENGTH} characters'}
+    return None
+
+
+def idempotent(view):
+    """
+    Honour an Idempotency-Key header on a money-moving API view (see
+    run_once). Goes below @api_view so the user is already authenticated.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(request, *args, **kwargs)
+        if error := check_key(key):
+            return Response(error, status=400)
+
+        responses = []
+
+        def run():
+            responses.append(view(request, *args, **kwargs))
+            return responses[0].status_code, responses[0].data
+
+        status_code, body, replayed = run_once(request.user.id, key, request.path, run)
+        if responses:
+            return responses[0]
+        return Response(body, status=status_code, headers={'Idempotent-Replayed': 'true'} if replayed else None)
+
+    return wrapper
+
+
+def purge_expired_keys():
+    """Delete keys past their TTL and return how many went."""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - KEY_TTL).delete()
+    return deleted
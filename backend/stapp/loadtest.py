@@ -0,0 +1,126 @@
+import asyncio
+import json
+import socket
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+
+# HTTP load generation for bench_asgi and load_test: kept-alive HTTP/1.1
+# connections on asyncio streams, so a single process can hold thousands
+# open without a client library.
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server did not start on {host}:{port}')
+
+
+class Connection:
+    """One kept-alive connection to ``base_url``, reopened after any error."""
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.prefix = url.path.rstrip('/')
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, token=None):
+        """(status, decoded JSON body or None)."""
+        # The server may have closed a connection left idle, so one that
+        # was reused gets a second try on a fresh one
+        reused = self.writer is not None
+        try:
+            return await self.send(method, path, body, token)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            if not reused:
+                raise
+        return await self.send(method, path, body, token)
+
+    async def send(self, method, path, body, token):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = b'' if body is None else json.dumps(body).encode()
+        headers = f'{method} {self.prefix}{path} HTTP/1.1\r\nHost: {self.host}\r\n'
+        if token:
+            headers += f'Authorization: Bearer {token}\r\n'
+        headers += f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n'
+        try:
+            self.writer.write(headers.encode() + payload)
+            await self.writer.drain()
+            status = int((await self.reader.readline()).split()[1])
+            length, close = 0, False
+            while (line := await self.reader.readline()) not in (b'\r\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                name = name.lower()
+                if name == 'content-length':
+                    length = int(value)
+                elif name == 'connection':
+                    close = value.strip().lower() == 'close'
+            content = await self.reader.readexactly(length)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            self.close()
+            raise
+        if close:
+            self.close()
+        try:
+            return status, json.loads(content) if content else None
+        except ValueError:
+            return status, None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def percentile(ordered, q):
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class Stats:
+    """Latencies and outcomes per endpoint name."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(lambda: {'4xx': 0, '5xx': 0, 'failed': 0})
+
+    async def timed(self, name, connection, method, path, body=None, token=None):
+        """connection.request(), recorded under ``name``; (None, None) if the request failed."""
+        started = time.perf_counter()
+        try:
+            status, data = await connection.request(method, path, body, token)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            self.outcomes[name]['failed'] += 1
+            return None, None
+        self.record(name, time.perf_counter() - started, status)
+        return status, data
+
+    def record(self, name, seconds, status=200):
+        self.latencies[name].append(seconds)
+        if status >= 500:
+            self.outcomes[name]['5xx'] += 1
+        elif status >= 400:
+            self.outcomes[name]['4xx'] += 1
+
+    def summary(self, duration):
+        """One row per endpoint: requests, req/sec, latency percentiles in ms and failures."""
+        rows = []
+        for name in sorted(set(self.latencies) | set(self.outcomes)):
+            ordered = sorted(self.latencies[name])
+            row = {'endpoint': name, 'requests': len(ordered), 'per_sec': round(len(ordered) / duration, 1)}
+            for label, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+                row[label] = round(percentile(ordered, q) * 1000, 1) if ordered else None
+            rows.append({**row, **self.outcomes[name]})
+        return rows
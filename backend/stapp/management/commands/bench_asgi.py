@@ -0,0 +1,119 @@
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+from datetime import time as clock
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from stapp.authentication import UserClaimsRefreshToken
+from stapp.loadtest import Connection, Stats, free_port, wait_for
+from stapp.models import User, Wallet, Bet, Transaction, ExposureCounter, Game
+
+
+# (name, method, sync path, async path) of each endpoint compared
+ENDPOINTS = (
+    ('balance', 'GET', '/balance/', '/async/balance/'),
+    ('transactions', 'GET', '/transactions/?page_size=20', '/async/transactions/?page_size=20'),
+    ('place-bet', 'POST', '/place-bet/', '/async/place-bet/'),
+)
+
+
+async def load(base_url, method, path, tokens, concurrency, duration):
+    """Keep ``concurrency`` connections busy with ``path`` for ``duration`` seconds."""
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+
+    async def client(token):
+        connection = Connection(base_url)
+        try:
+            while time.perf_counter() < deadline:
+                body = None
+                if method == 'POST':
+                    body = {'game': 'bench', 'number': random.randrange(101), 'amount': '10'}
+                await stats.timed(path, connection, method, path, body, token)
+        finally:
+            connection.close()
+
+    await asyncio.gather(*(client(tokens[i % len(tokens)]) for i in range(concurrency)))
+    return stats.summary(duration)[0]
+
+
+class Command(BaseCommand):
+    help = "Benchmark req/sec and latency of the async endpoints under uvicorn against the sync ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=200, help='Open connections')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per endpoint')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=1, help='Server processes')
+        parser.add_argument('--threads', type=int, default=settings.WEB_THREADS, help='Threads per gunicorn worker')
+
+    def handle(self, *args, **options):
+        users = [
+            User.objects.get_or_create(username=f'bench_asgi_{i}', defaults={'mobile': f'00000030{i:02d}'})[0]
+            for i in range(options['users'])
+        ]
+        for user in users:
+            Wallet.objects.get_or_create(user=user)
+        Wallet.objects.filter(user__in=users).update(balance=Decimal('10000000.00'), bonus=0)
+        Transaction.objects.bulk_create(
+            Transaction(user=user, transaction_type='deposit', amount=Decimal('100.00'))
+            for user in users for _ in range(50)
+        )
+        # Always open, so every bet gets as far as the wallet
+        Game.objects.update_or_create(name='bench', defaults={
+            'label': 'Bench', 'opens_at': clock(0), 'closes_at': clock(0), 'result_at': clock(0)})
+        tokens = [str(UserClaimsRefreshToken.for_user(user).access_token) for user in users]
+
+        servers = [('uvicorn (ASGI)', [sys.executable, '-m', 'uvicorn', 'backend.asgi:application',
+                                       '--workers', str(options['workers']), '--log-level', 'warning',
+                                       '--no-access-log'], True)]
+        if shutil.which('gunicorn'):
+            servers.append(('gunicorn (WSGI)', ['gunicorn', 'backend.wsgi:application', '-k', 'gthread',
+                                                '--workers', str(options['workers']),
+                                                '--threads', str(options['threads'])], False))
+        else:
+            self.stdout.write("gunicorn not installed, skipping the WSGI run")
+
+        try:
+            for name, command, asgi in servers:
+                self.run(name, command, asgi, tokens, options)
+        finally:
+            Bet.objects.filter(user__in=users).delete()
+            ExposureCounter.objects.filter(game='bench').delete()
+            Game.objects.filter(name='bench').delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def run(self, name, command, asgi, tokens, options):
+        port = free_port()
+        bind = ['--host', '127.0.0.1', '--port', str(port)] if asgi else ['--bind', f'127.0.0.1:{port}']
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings')}
+        server = subprocess.Popen(command + bind, cwd=settings.BASE_DIR, env=env)
+        try:
+            wait_for('127.0.0.1', port)
+            self.stdout.write(f"{name}, {options['workers']} worker(s), {options['concurrency']} connections:")
+            for endpoint, method, sync_path, async_path in ENDPOINTS:
+                paths = (('sync', sync_path), ('async', async_path)) if asgi else (('sync', sync_path),)
+                for kind, path in paths:
+                    row = asyncio.run(load(f'http://127.0.0.1:{port}/api', method, path, tokens,
+                                           options['concurrency'], options['duration']))
+                    self.report(f'{endpoint} ({kind})', row)
+        finally:
+            server.terminate()
+            server.wait()
+
+    def report(self, label, row):
+        errors = row['4xx'] + row['5xx'] + row['failed']
+        if not row['requests']:
+            self.stdout.write(f"{label:>22}: no responses, errors: {errors}")
+            return
+        self.stdout.write(
+            f"{label:>22}: {row['per_sec']:,.0f} req/sec, "
+            f"p50 {row['p50']:,.1f} ms, p99 {row['p99']:,.1f} ms, errors: {errors}"
+        )
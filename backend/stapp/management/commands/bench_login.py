@@ -0,0 +1,89 @@
+import threading
+import time
+
+from django.contrib.auth.backends import ModelBackend
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from stapp.backends import MobileOrUsernameBackend
+from stapp.models import User
+
+
+def legacy_authenticate(request, username=None, password=None):
+    """The old three-backend chain, in the order AUTHENTICATION_BACKENDS tried it."""
+    # stapp.backends.MobileBackend only read a mobile= kwarg, so it looked up mobile=None
+    try:
+        user = User.objects.get(mobile=None)
+        if user.check_password(password):
+            return user
+    except User.DoesNotExist:
+        pass
+
+    user = ModelBackend().authenticate(request, username=username, password=password)
+    if user:
+        return user
+
+    # stapp.authentication.UsernameOrMobileBackend
+    for field in ('mobile', 'username'):
+        try:
+            user = User.objects.get(**{field: username})
+            if user.check_password(password):
+                return user
+        except User.DoesNotExist:
+            pass
+    return None
+
+
+class Command(BaseCommand):
+    help = "Benchmark logins/sec of the consolidated auth backend against the old backend chain"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--attempts', type=int, default=10, help='Logins per thread for each case')
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username='bench_login', defaults={'mobile': '0000000002'})
+        user.set_password('bench-password')
+        user.save()
+
+        cases = (
+            ('valid', user.mobile, 'bench-password'),
+            ('wrong password', user.mobile, 'wrong'),
+            ('unknown user', '0000000099', 'wrong'),
+        )
+        backends = (('old chain', legacy_authenticate), ('consolidated', MobileOrUsernameBackend().authenticate))
+        try:
+            for case, identifier, password in cases:
+                for name, authenticate in backends:
+                    self.run(name, case, authenticate, identifier, password, options['threads'], options['attempts'])
+        finally:
+            user.delete()
+
+    def run(self, name, case, authenticate, identifier, password, threads, attempts):
+        with CaptureQueriesContext(connection) as queries:
+            authenticate(None, username=identifier, password=password)
+
+        barrier = threading.Barrier(threads)
+
+        def client():
+            try:
+                barrier.wait()
+                for _ in range(attempts):
+                    authenticate(None, username=identifier, password=password)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=client) for _ in range(threads)]
+        started = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        total = threads * attempts
+        self.stdout.write(
+            f"{case:>15} / {name:<12}: {total / elapsed:,.1f} logins/sec, "
+            f"{elapsed / total * 1000:,.0f} ms each, {len(queries)} queries"
+        )
@@ -0,0 +1,100 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from stapp.models import User, Wallet, Bet
+from stapp.wallet import debit_wallet, InsufficientBalance
+
+
+def legacy_debit(user_id, amount):
+    """The old place_bet path: read the wallet, change it in Python, save()."""
+    wallet = Wallet.objects.get(user_id=user_id)
+    if wallet.balance + wallet.bonus < amount:
+        raise InsufficientBalance('Insufficient balance')
+    if wallet.balance >= amount:
+        wallet.balance -= amount
+    else:
+        remaining = amount - wallet.balance
+        wallet.balance = Decimal('0.00')
+        wallet.bonus -= remaining
+    wallet.save()
+    return wallet.balance, wallet.bonus
+
+
+class Command(BaseCommand):
+    help = "Benchmark bets/sec of the atomic wallet debit against the old read-modify-write path"
+
+    def add_arguments(self, parser):
+        # Each client holds a connection for all its bets
+        parser.add_argument('--clients', type=int, default=settings.DB_POOL_SIZE,
+                            help='Concurrent clients, at most DB_POOL_SIZE with connection pooling')
+        parser.add_argument('--bets', type=int, default=40, help='Bets per client')
+        parser.add_argument('--amount', default='10.00')
+
+    def handle(self, *args, **options):
+        clients = options['clients']
+        bets = options['bets']
+        amount = Decimal(options['amount'])
+        if connection.settings_dict['OPTIONS'].get('pool') and clients > settings.DB_POOL_SIZE:
+            raise CommandError(f"--clients can't exceed the pool of {settings.DB_POOL_SIZE} connections")
+
+        user, _ = User.objects.get_or_create(
+            username='bench_place_bet', defaults={'mobile': '0000000001'}
+        )
+        wallet, _ = Wallet.objects.get_or_create(user=user)
+
+        try:
+            for name, debit in (('read-modify-write', legacy_debit), ('atomic', debit_wallet)):
+                self.run(name, debit, user, wallet, clients, bets, amount)
+        finally:
+            Bet.objects.filter(user=user).delete()
+            wallet.delete()
+            user.delete()
+
+    def run(self, name, debit, user, wallet, clients, bets, amount):
+        opening = amount * clients * bets * 2
+        Wallet.objects.filter(pk=wallet.pk).update(balance=opening, bonus=0)
+        Bet.objects.filter(user=user).delete()
+
+        placed = []
+        errors = []
+        barrier = threading.Barrier(clients)
+
+        def client():
+            count = 0
+            try:
+                barrier.wait()
+                for _ in range(bets):
+                    with transaction.atomic():
+                        debit(user.id, amount)
+                        Bet.objects.create(
+                            user=user, game='gali', bet_type='number', number=1, amount=amount
+                        )
+                    count += 1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                placed.append(count)
+                connection.close()
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        total = sum(placed)
+        wallet.refresh_from_db()
+        expected = opening - amount * total
+        lost = (wallet.balance - expected) / amount
+
+        self.stdout.write(
+            f"{name:>18}: {total} bets from {clients} clients in {elapsed:.2f}s "
+            f"= {total / elapsed:,.0f} bets/sec, lost updates: {lost:.0f}, errors: {len(errors)}"
+        )
@@ -0,0 +1,113 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+
+from stapp.models import User, Wallet, Bet, ExposureCounter
+from stapp.settlement import settle_game, PAYOUT_MULTIPLIERS, DEFAULT_MULTIPLIERS
+
+
+# Not a real game, so no real player's pending bets are settled or paid
+GAME = 'bench_settle'
+
+SEED_SQL = """
+    INSERT INTO {bet} (user_id, game, bet_type, number, amount, is_win, payout, status, created_at)
+    SELECT
+        (%(user_ids)s)[1 + (i %% %(users)s)],
+        %(game)s,
+        (ARRAY['number', 'andar', 'bahar'])[1 + (i %% 3)],
+        CASE WHEN i %% 3 = 0 THEN 1 + (i * 7) %% 100 ELSE (i * 7) %% 10 END,
+        10,
+        false,
+        0,
+        'pending',
+        now()
+    FROM generate_series(1, %(bets)s) AS i
+"""
+
+
+def legacy_settle(game, winning_number):
+    """The old declare_result loop: one Wallet get/save per winner and a save() per bet."""
+    number_x, digit_x = PAYOUT_MULTIPLIERS.get(game, DEFAULT_MULTIPLIERS)
+    count = 0
+    with transaction.atomic():
+        for bet in Bet.objects.filter(game=game, status='pending'):
+            if bet.bet_type == 'number':
+                won, multiplier = bet.number % 100 == winning_number, number_x
+            elif bet.bet_type == 'andar':
+                won, multiplier = bet.number == winning_number // 10, digit_x
+            else:
+                won, multiplier = bet.number == winning_number % 10, digit_x
+            if won:
+                bet.payout = bet.amount * multiplier
+                wallet = Wallet.objects.get(user=bet.user)
+                wallet.winnings += bet.payout
+                wallet.save()
+            bet.is_win = won
+            bet.status = 'won' if won else 'lost'
+            bet.save()
+            count += 1
+    return count
+
+
+class Command(BaseCommand):
+    help = "Benchmark set-based settlement against the old per-bet declare_result loop (PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bets', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--legacy-bets', type=int, default=5000,
+                            help='Smaller sample for the per-bet loop, which is too slow at full size')
+
+    def handle(self, *args, **options):
+        users = self.create_users(options['users'])
+        user_ids = [u.id for u in users]
+
+        try:
+            if options['legacy_bets']:
+                self.seed(user_ids, options['legacy_bets'])
+                started = time.perf_counter()
+                count = legacy_settle(GAME, 42)
+                self.report('per-bet loop', count, time.perf_counter() - started)
+
+            self.seed(user_ids, options['bets'])
+            started = time.perf_counter()
+            result = settle_game(GAME, 42)
+            self.report('set-based', result['bets'], time.perf_counter() - started)
+        finally:
+            # Raw delete, the ORM cascade would load every bet into memory
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {connection.ops.quote_name(Bet._meta.db_table)} WHERE user_id = ANY(%s)',
+                    [user_ids],
+                )
+            User.objects.filter(id__in=user_ids).delete()
+            ExposureCounter.objects.filter(game=GAME).delete()
+
+    def create_users(self, count):
+        # Usernames unique to this run, mobiles past the highest one starting
+        # with 0 (which no real number does), referral codes from the sequence
+        run = uuid.uuid4().hex[:8]
+        last = User.objects.filter(mobile__startswith='0').aggregate(last=Max('mobile'))['last']
+        start = int(last) + 1 if last else 1
+        users = User.objects.bulk_create([
+            User(username=f'bench_settle_{run}_{i}', mobile=f'{start + i:010d}')
+            for i in range(count)
+        ])
+        Wallet.objects.bulk_create([Wallet(user=u) for u in users])
+        return users
+
+    def seed(self, user_ids, bets):
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_SQL.format(bet=connection.ops.quote_name(Bet._meta.db_table)), {
+                'user_ids': user_ids,
+                'users': len(user_ids),
+                'game': GAME,
+                'bets': bets,
+            })
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(Bet._meta.db_table)}')
+
+    def report(self, name, bets, elapsed):
+        self.stdout.write(f"{name:>12}: {bets:,} bets in {elapsed:.2f}s = {bets / elapsed:,.0f} bets/sec")
@@ -0,0 +1,158 @@
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from stapp.models import User, Wallet
+
+
+FIELDS = ('username', 'mobile', 'email', 'password', 'referral_code')
+
+
+def read_rows(path, fmt):
+    """(line number, row dict) for each user in a CSV or JSONL file, read lazily."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            # Line 1 is the header
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                yield line, row
+        else:
+            for line, text in enumerate(f, start=1):
+                if text.strip():
+                    try:
+                        yield line, json.loads(text)
+                    except json.JSONDecodeError:
+                        yield line, None
+
+
+def clean(row):
+    """The row's fields stripped, or a reason to reject it."""
+    if not isinstance(row, dict):
+        return None, 'not a JSON object'
+    row = {field: str(row.get(field) or '').strip() for field in FIELDS}
+    if not row['username']:
+        return None, 'username is required'
+    if len(row['username']) > User._meta.get_field('username').max_length:
+        return None, 'username is too long'
+    if not (row['mobile'].isdigit() and len(row['mobile']) == 10):
+        return None, 'mobile must be 10 digits'
+    return row, None
+
+
+class Command(BaseCommand):
+    help = ("Import users from a CSV or JSONL file (username, mobile, email, password, referral_code) "
+            "with a wallet each, hashing passwords in a process pool and inserting in chunks")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Hashing processes; 0 hashes in this process')
+        parser.add_argument('--rejects', help='Write rejected rows here as JSONL, with the reason')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if Path(path).suffix.lower() == '.csv' else 'jsonl')
+        if not Path(path).is_file():
+            raise CommandError(f"No such file: {path}")
+
+        pool = None
+        if options['workers']:
+            # Spawned, not forked, so no worker shares this process's pooled
+            # database connections
+            pool = ProcessPoolExecutor(options['workers'], mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=django.setup)
+        rejects = open(options['rejects'], 'w', encoding='utf-8') if options['rejects'] else None
+
+        self.imported = self.rejected = 0
+        started = time.perf_counter()
+        try:
+            rows = read_rows(path, fmt)
+            while chunk := list(islice(rows, options['chunk_size'])):
+                self.import_chunk(chunk, pool, rejects)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{self.imported} imported, {self.rejected} rejected "
+                                  f"({self.imported / elapsed:.0f} users/s)")
+        finally:
+            if pool:
+                pool.shutdown()
+            if rejects:
+                rejects.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.imported} users and rejected {self.rejected} in {elapsed:.1f}s "
+            f"({self.imported / elapsed:.0f} users/s)"))
+
+    def reject(self, rejects, line, row, reason):
+        self.rejected += 1
+        if rejects:
+            row = {k: v for k, v in row.items() if k != 'password'} if isinstance(row, dict) else row
+            rejects.write(json.dumps({'line': line, 'row': row, 'reason': reason}) + '\n')
+        elif self.rejected <= 20:
+            self.stderr.write(f"line {line}: {reason}")
+
+    def import_chunk(self, chunk, pool, rejects):
+        valid, seen = [], set()
+        for line, row in chunk:
+            cleaned, reason = clean(row)
+            if reason is None and ({cleaned['username'], cleaned['mobile']} & seen):
+                reason = 'duplicate username or mobile in file'
+            if reason:
+                self.reject(rejects, line, row, reason)
+                continue
+            seen.update((cleaned['username'], cleaned['mobile']))
+            valid.append((line, cleaned))
+
+        # One query each for the chunk's clashes and referrers
+        usernames = [row['username'] for _, row in valid]
+        mobiles = [row['mobile'] for _, row in valid]
+        taken = set()
+        for username, mobile in User.objects.filter(
+                Q(username__in=usernames) | Q(mobile__in=mobiles)).values_list('username', 'mobile'):
+            taken.update((username, mobile))
+        codes = {row['referral_code'] for _, row in valid if row['referral_code']}
+        referrers = dict(User.objects.filter(referral_code__in=codes).values_list('referral_code', 'id'))
+
+        accepted = []
+        for line, row in valid:
+            if row['username'] in taken or row['mobile'] in taken:
+                self.reject(rejects, line, row, 'username or mobile already registered')
+            elif row['referral_code'] and row['referral_code'] not in referrers:
+                self.reject(rejects, line, row, f"unknown referral code {row['referral_code']}")
+            else:
+                accepted.append((line, row))
+        if not accepted:
+            return
+
+        # A missing password gets an unusable hash
+        passwords = [row['password'] or None for _, row in accepted]
+        hashes = list(pool.map(make_password, passwords, chunksize=64) if pool else map(make_password, passwords))
+
+        users = [
+            User(username=row['username'], mobile=row['mobile'], email=row['email'] or None, password=password,
+                 referred_by_id=referrers.get(row['referral_code']))
+            for (_, row), password in zip(accepted, hashes)
+        ]
+        try:
+            with transaction.atomic():
+                # Ids and referral codes come back from the INSERT
+                User.objects.bulk_create(users)
+                Wallet.objects.bulk_create(Wallet(user=user) for user in users)
+        except IntegrityError as e:
+            # Someone registered one of these since the check above
+            for line, row in accepted:
+                self.reject(rejects, line, row, f'chunk failed: {e}'.splitlines()[0])
+            return
+        self.imported += len(users)
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from stapp.loadtest import Connection, Stats, free_port, wait_for
+from stapp.models import Bet, User
+
+
+GAMES = [game for game, _ in Bet.GAME_CHOICES]
+
+# The player reads with an async version, by URL name
+READS = {
+    'balance': ('wallet-balance', '/balance/'),
+    'transactions': ('transaction-history', '/transactions/?page_size=20'),
+    'my-bets': ('user-bet-history', '/my-bets/?page_size=20'),
+}
+ASYNC_READS = {
+    'balance': ('async-wallet-balance', '/async/balance/'),
+    'transactions': ('async-transaction-history', '/async/transactions/?page_size=20'),
+    'my-bets': ('async-user-bet-history', '/async/my-bets/?page_size=20'),
+}
+
+# Admin dashboard reads, by URL name
+DASHBOARDS = (
+    ('admin_users_stats', '/admin/users-stats/'),
+    ('admin-grouped-bets', '/admin/bets/'),
+    ('admin-exposure', '/admin/exposure/?game={game}'),
+    ('admin_referral_summary', '/admin/referral-summary/'),
+    ('admin_referrers', '/admin/referrers/'),
+    ('admin_transactions', '/admin/transactions/'),
+    ('admin_list_deposit_requests', '/admin/deposit-requests/'),
+    ('admin_withdraw_requests', '/admin/withdraw-requests/'),
+)
+
+
+class Harness:
+    """
+    Players, admins and a result announcer sharing one event loop until
+    the deadline, each on its own kept-alive connection.
+    """
+
+    def __init__(self, base_url, mobiles, options):
+        self.base_url = base_url
+        self.mobiles = mobiles
+        self.options = options
+        self.stats = Stats()
+        self.open_games = []
+        self.deadline = 0.0
+        self.reads = ASYNC_READS if options['async_reads'] else READS
+        # (weight, action) of each thing a signed-in player does next;
+        # mostly polling, as a festival-day crowd does
+        self.actions = (
+            (45, self.poll_balance),
+            (25, self.place_slip),
+            (10, self.check_games),
+            (10, self.read_history),
+            (5, self.read_referrals),
+            (5, self.sign_in_again),
+        )
+
+    async def run(self):
+        self.deadline = time.monotonic() + self.options['duration']
+        tasks = [self.player(random.choice(self.mobiles)) for _ in range(self.options['players'])]
+        tasks += [self.admin() for _ in range(self.options['admins'])]
+        if self.options['result_every']:
+            tasks.append(self.announcer())
+        started = time.monotonic()
+        await asyncio.gather(*tasks)
+        return time.monotonic() - started
+
+    def running(self):
+        return time.monotonic() < self.deadline
+
+    async def pause(self):
+        # Exponential think time, so requests arrive unevenly
+        await asyncio.sleep(min(random.expovariate(1 / self.options['think']), max(self.deadline - time.monotonic(), 0)))
+
+    async def player(self, mobile):
+        connection = Connection(self.base_url)
+        try:
+            # Players drift in rather than arriving at once
+            await asyncio.sleep(random.uniform(0, self.options['think']))
+            token = await self.sign_in(connection, mobile, register=random.random() < self.options['register'])
+            while self.running():
+                if token is None:
+                    await self.pause()
+                    token = await self.sign_in(connection, mobile)
+                    continue
+                action = random.choices([a for _, a in self.actions], [w for w, _ in self.actions])[0]
+                token = await action(connection, token, mobile) or token
+                await self.pause()
+        finally:
+            connection.close()
+
+    async def sign_in(self, connection, mobile, register=False):
+        """A fresh access token for ``mobile`` (or a newly registered user), or None."""
+        password = self.options['password']
+        if register:
+            mobile = f'2{random.randrange(10 ** 9):09d}'
+            status, _ = await self.stats.timed('register', connection, 'POST', '/register/', {
+                'username': f"{self.options['prefix']}_load_{uuid.uuid4().hex[:12]}",
+                'mobile': mobile, 'password': password})
+            if status != 201:
+                return None
+        status, data = await self.stats.timed('login', connection, 'POST', '/login/',
+                                              {'mobile': mobile, 'password': password})
+        return data['access'] if status == 200 else None
+
+    async def poll_balance(self, connection, token, mobile):
+        name, path = self.reads['balance']
+        await self.stats.timed(name, connection, 'GET', path, token=token)
+
+    async def place_slip(self, connection, token, mobile):
+        game = random.choice(self.open_games or GAMES)
+        lines = []
+        for _ in range(random.randint(1, self.options['slip_lines'])):
+            bet_type = random.choices(('number', 'andar', 'bahar'), (6, 2, 2))[0]
+            number = random.randrange(100 if bet_type == 'number' else 10)
+            lines.append({'bet_type': bet_type, 'number': number, 'amount': random.choice((10, 10, 20, 50, 100))})
+        await self.stats.timed('place-bet-slip', connection, 'POST', '/place-bet-slip/',
+                               {'game': game, 'bets': lines}, token)
+
+    async def check_games(self, connection, token, mobile):
+        status, data = await self.stats.timed('game-status', connection, 'GET', '/game-status/', token=token)
+        if status == 200:
+            self.open_games = [game['name'] for game in data['games'] if game['status'] == 'open']
+
+    async def read_history(self, connection, token, mobile):
+        name, path = self.reads[random.choice(('transactions', 'my-bets'))]
+        await self.stats.timed(name, connection, 'GET', path, token=token)
+
+    async def read_referrals(self, connection, token, mobile):
+        await self.stats.timed('user_referral_summary', connection, 'GET', '/user/my-referrals/', token=token)
+
+    async def sign_in_again(self, connection, token, mobile):
+        return await self.sign_in(connection, mobile)
+
+    async def admin_token(self, connection):
+        status, data = await self.stats.timed('admin_token_obtain_pair', connection, 'POST', '/admin/token/', {
+            'username': f"{self.options['prefix']}_admin", 'password': self.options['password']})
+        return data['access'] if status == 200 else None
+
+    async def admin(self):
+        connection = Connection(self.base_url)
+        try:
+            token = await self.admin_token(connection)
+            while self.running() and token:
+                name, path = random.choice(DASHBOARDS)
+                await self.stats.timed(name, connection, 'GET', path.format(game=random.choice(GAMES)), token=token)
+                await self.pause()
+        finally:
+            connection.close()
+
+    async def announcer(self):
+        """Declare a result every --result-every seconds and time its settlement to the end."""
+        connection = Connection(self.base_url)
+        try:
+            token = await self.admin_token(connection)
+            games = list(GAMES)
+            random.shuffle(games)
+            while token and self.running():
+                await asyncio.sleep(min(self.options['result_every'], max(self.deadline - time.monotonic(), 0)))
+                if not self.running():
+                    break
+                game = games.pop()
+                games.insert(0, game)
+                declared = time.monotonic()
+                status, data = await self.stats.timed('declare-result', connection, 'POST', '/admin/declare-result/',
+                                                      {'game': game, 'winning_number': random.randrange(100)}, token)
+                if status != 202:
+                    continue
+                while self.running():
+                    status, job = await self.stats.timed('settlement-job-status', connection, 'GET',
+                                                         f"/admin/settlement-jobs/{data['job_id']}/", token=token)
+                    if status == 200 and job['status'] in ('done', 'failed'):
+                        self.stats.record('settlement (end to end)', time.monotonic() - declared,
+                                          200 if job['status'] == 'done' else 500)
+                        break
+                    await asyncio.sleep(1)
+        finally:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = ("Drive a festival-day traffic mix (registration, login, bet slips, balance polling, result declaration, "
+            "admin dashboards) at the API and report throughput and latency percentiles per endpoint. "
+            "Players sign in as users from seed_data. Declaring results settles their pending bets, "
+            "so point it at a load-test database only.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='API base URL, e.g. http://staging:8000/api; '
+                                          'by default a uvicorn server is started on this database')
+        parser.add_argument('--workers', type=int, default=1, help='uvicorn processes, without --url')
+        parser.add_argument('--duration', type=float, default=60, help='Seconds')
+        parser.add_argument('--players', type=int, default=200, help='Concurrent players')
+        parser.add_argument('--admins', type=int, default=2, help='Concurrent admins reading dashboards')
+        parser.add_argument('--think', type=float, default=1.0, help="Mean seconds between a client's requests")
+        parser.add_argument('--register', type=float, default=0.05, help='Share of players who register first')
+        parser.add_argument('--slip-lines', type=int, default=5, help='Most lines on one bet slip')
+        parser.add_argument('--result-every', type=float, default=30, help='Seconds between results; 0 declares none')
+        parser.add_argument('--settle', action='store_true', help='Run a settlement_worker alongside')
+        parser.add_argument('--async-reads', action='store_true', help='Poll the async balance and history views')
+        parser.add_argument('--prefix', default='seed', help='The seed_data --prefix')
+        parser.add_argument('--password', default='seed-password', help='The seed_data --password')
+        parser.add_argument('--output', help='Also write the results here as JSON')
+
+    def handle(self, *args, **options):
+        mobiles = list(User.objects.filter(username__startswith=f"{options['prefix']}_", is_staff=False)
+                       .values_list('mobile', flat=True)[:max(options['players'] * 10, 1000)])
+        if not mobiles:
+            raise CommandError(f"No {options['prefix']}_ users; run seed_data first")
+
+        processes = []
+        try:
+            base_url = options['url']
+            if not base_url:
+                port = free_port()
+                processes.append(subprocess.Popen(
+                    [sys.executable, '-m', 'uvicorn', 'backend.asgi:application', '--host', '127.0.0.1',
+                     '--port', str(port), '--workers', str(options['workers']), '--log-level', 'warning',
+                     '--no-access-log'], cwd=settings.BASE_DIR))
+                wait_for('127.0.0.1', port)
+                base_url = f'http://127.0.0.1:{port}/api'
+            if options['settle']:
+                processes.append(subprocess.Popen(
+                    [sys.executable, 'manage.py', 'settlement_worker'], cwd=settings.BASE_DIR,
+                    stdout=subprocess.DEVNULL))
+
+            self.stdout.write(f"{options['players']} players and {options['admins']} admins "
+                              f"against {base_url} for {options['duration']:.0f}s")
+            harness = Harness(base_url, mobiles, options)
+            elapsed = asyncio.run(harness.run())
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+        rows = harness.stats.summary(elapsed)
+        self.report(rows, elapsed)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'duration': round(elapsed, 1), 'players': options['players'],
+                           'admins': options['admins'], 'endpoints': rows}, f, indent=2)
+
+    def report(self, rows, elapsed):
+        ms = lambda value: '-' if value is None else f'{value:,.1f}'
+        self.stdout.write(f"{'endpoint':<28}{'requests':>9}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+                          f"{'4xx':>7}{'5xx':>7}{'failed':>8}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['endpoint']:<28}{row['requests']:>9}{row['per_sec']:>9,.1f}{ms(row['p50']):>10}"
+                f"{ms(row['p95']):>10}{ms(row['p99']):>10}{row['4xx']:>7}{row['5xx']:>7}{row['failed']:>8}")
+        total = sum(row['requests'] for row in rows)
+        self.stdout.write(f"{total} requests in {elapsed:.1f}s = {total / elapsed:,.0f} req/sec")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from stapp.exposure import rebuild_exposure
+from stapp.models import ExposureCounter
+
+
+class Command(BaseCommand):
+    help = "Recount the live exposure counters from pending bets"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--game', help='Only rebuild this game')
+
+    def handle(self, *args, **options):
+        rebuild_exposure(options['game'])
+        self.stdout.write(f"Rebuilt {ExposureCounter.objects.count()} exposure counters")
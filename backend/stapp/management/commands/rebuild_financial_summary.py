@@ -0,0 +1,57 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+from stapp.models import (
+    DepositRequest, WithdrawRequest, ReferralCommission, UserFinancialSummary, DailyFinancialSummary,
+)
+
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user financial summary and daily buckets from deposits, withdrawals and commissions"
+
+    def handle(self, *args, **options):
+        zero = Decimal('0.00')
+        summaries = defaultdict(lambda: {
+            'total_deposit': zero, 'total_withdraw': zero, 'referral_count': 0, 'referral_earnings': zero,
+        })
+        daily = defaultdict(lambda: {'deposit': zero, 'withdraw': zero})
+
+        deposits = DepositRequest.objects.filter(status='approved')
+        withdrawals = WithdrawRequest.objects.filter(is_approved=True)
+
+        for row in deposits.values('user').annotate(total=Sum('amount')):
+            summaries[row['user']]['total_deposit'] = row['total']
+        for row in withdrawals.values('user').annotate(total=Sum('amount')):
+            summaries[row['user']]['total_withdraw'] = row['total']
+        # Pending commissions are counted by the roll-up that credits them
+        for row in ReferralCommission.objects.filter(rolled_up_at__isnull=False).values('referrer').annotate(
+                total=Sum('commission'), referrals=Count('referred_user', distinct=True)):
+            summaries[row['referrer']]['referral_earnings'] = row['total']
+            summaries[row['referrer']]['referral_count'] = row['referrals']
+
+        for row in deposits.annotate(day=TruncDate('created_at')).values('user', 'day').annotate(total=Sum('amount')):
+            daily[row['user'], row['day']]['deposit'] = row['total']
+        for row in withdrawals.annotate(day=TruncDate('created_at')).values('user', 'day').annotate(total=Sum('amount')):
+            daily[row['user'], row['day']]['withdraw'] = row['total']
+
+        with transaction.atomic():
+            UserFinancialSummary.objects.all().delete()
+            DailyFinancialSummary.objects.all().delete()
+            UserFinancialSummary.objects.bulk_create(
+                (UserFinancialSummary(user_id=user_id, **totals) for user_id, totals in summaries.items()),
+                batch_size=BATCH_SIZE,
+            )
+            DailyFinancialSummary.objects.bulk_create(
+                (DailyFinancialSummary(user_id=user_id, day=day, **totals) for (user_id, day), totals in daily.items()),
+                batch_size=BATCH_SIZE,
+            )
+
+        self.stdout.write(f"Rebuilt {len(summaries)} user summaries and {len(daily)} daily buckets")
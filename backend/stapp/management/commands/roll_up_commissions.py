@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from stapp.commissions import ROLL_UP_BATCH, roll_up_commissions
+
+
+class Command(BaseCommand):
+    help = "Credit pending referral commissions to referrers' wallets, one payout per referrer per roll-up"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=300.0, help='Seconds between roll-ups')
+        parser.add_argument('--batch', type=int, default=ROLL_UP_BATCH, help='Commissions per statement')
+        parser.add_argument('--once', action='store_true', help='Roll up once and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            payouts, commissions, total = roll_up_commissions(options['batch'])
+            if commissions:
+                self.stdout.write(
+                    f"Credited {commissions} commissions in {payouts} payouts, ₹{total}, "
+                    f"in {time.perf_counter() - started:.2f}s"
+                )
+            if options['once']:
+                return
+            time.sleep(options['every'])
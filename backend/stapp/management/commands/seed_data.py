@@ -0,0 +1,281 @@
+import random
+import time
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from stapp.bets import COMMISSION_GAMES, COMMISSION_RATE
+from stapp.exposure import rebuild_exposure
+from stapp.models import (
+    User, Wallet, Bet, Transaction, DepositRequest, WithdrawRequest, ReferralCommission, CommissionPayout,
+)
+from stapp.settlement import PAYOUT_MULTIPLIERS, DEFAULT_MULTIPLIERS
+
+
+USER_CHUNK = 5000
+REFERRAL_BONUS = Decimal('50.00')
+
+# Drawn in the database, so millions of rows never pass through Python.
+# Bets placed before today are settled (1% of number bets and 10% of
+# andar/bahar bets win); today's are still pending. Low user indexes bet
+# more, as a few heavy players do.
+BETS_SQL = """
+    INSERT INTO {bet} (user_id, game, bet_type, number, amount, is_win, payout, status, created_at)
+    SELECT user_id, %(game)s, bet_type, number, amount, won,
+           CASE WHEN won THEN amount * CASE WHEN bet_type = 'number' THEN %(number_x)s ELSE %(digit_x)s END
+                ELSE 0 END,
+           CASE WHEN NOT settled THEN 'pending' WHEN won THEN 'won' ELSE 'lost' END,
+           created_at
+    FROM (
+        SELECT *, settled AND random() < CASE WHEN bet_type = 'number' THEN 0.01 ELSE 0.1 END AS won
+        FROM (
+            SELECT
+                (%(user_ids)s)[1 + floor(random() ^ 2 * %(users)s)::int] AS user_id,
+                CASE WHEN r < 0.6 THEN 'number' WHEN r < 0.8 THEN 'andar' ELSE 'bahar' END AS bet_type,
+                CASE WHEN r < 0.6 THEN floor(random() * 100)::int ELSE floor(random() * 10)::int END AS number,
+                (ARRAY[10, 10, 10, 20, 20, 50, 50, 100, 200, 500])[1 + floor(random() * 10)::int] AS amount,
+                created_at,
+                created_at < %(today)s AS settled
+            FROM (
+                SELECT random() AS r, now() - random() * %(days)s * interval '1 day' AS created_at
+                FROM generate_series(1, %(bets)s)
+            ) AS drawn
+        ) AS lines
+    ) AS bets
+"""
+
+# Commissions on the seeded bets of referred users, as place_bets logs
+# them; those before today count as credited by a roll-up at midnight
+COMMISSIONS_SQL = """
+    INSERT INTO {commission} (referred_user_id, referrer_id, bet_id, commission, created_at, rolled_up_at)
+    SELECT bet.user_id, u.referred_by_id, bet.id, round(bet.amount * %(rate)s, 2), bet.created_at,
+           CASE WHEN bet.created_at < %(today)s THEN %(today)s::timestamptz END
+    FROM {bet} bet JOIN {user} u ON u.id = bet.user_id
+    WHERE bet.id > %(after)s AND bet.game = ANY(%(games)s) AND u.referred_by_id IS NOT NULL
+"""
+
+PAYOUTS_SQL = """
+    INSERT INTO {payout} (referrer_id, period_end, commission, bets)
+    SELECT referrer_id, rolled_up_at, sum(commission), count(*)
+    FROM {commission}
+    WHERE id > %(after)s AND rolled_up_at IS NOT NULL
+    GROUP BY referrer_id, rolled_up_at
+"""
+
+CREDIT_PAYOUTS_SQL = """
+    UPDATE {wallet} wallet SET bonus = wallet.bonus + payout.commission
+    FROM {payout} payout
+    WHERE payout.id > %(after)s AND wallet.user_id = payout.referrer_id
+"""
+
+# Most deposits are approved within a couple of hours; recent ones may
+# still be waiting
+DEPOSITS_SQL = """
+    INSERT INTO {deposit} (user_id, amount, utr_number, created_at, status, approved_at)
+    SELECT user_id, amount, utr, created_at, status,
+           CASE WHEN status = 'approved' THEN created_at + random() * interval '2 hours' END
+    FROM (
+        SELECT
+            (%(user_ids)s)[1 + floor(random() * %(users)s)::int] AS user_id,
+            (ARRAY[100, 200, 500, 500, 1000, 1000, 2000, 5000])[1 + floor(random() * 8)::int] AS amount,
+            lpad(floor(random() * 1e12)::bigint::text, 12, '0') AS utr,
+            created_at,
+            CASE WHEN created_at >= %(today)s AND r < 0.5 THEN 'pending'
+                 WHEN r < 0.94 THEN 'approved' ELSE 'rejected' END AS status
+        FROM (
+            SELECT random() AS r, now() - random() * %(days)s * interval '1 day' AS created_at
+            FROM generate_series(1, %(rows)s)
+        ) AS drawn
+    ) AS deposits
+"""
+
+WITHDRAWALS_SQL = """
+    INSERT INTO {withdraw} (user_id, amount, is_approved, is_rejected, created_at, approved_at)
+    SELECT user_id, amount, decision = 'approved', decision = 'rejected', created_at,
+           CASE WHEN decision = 'approved' THEN created_at + random() * interval '6 hours' END
+    FROM (
+        SELECT
+            (%(user_ids)s)[1 + floor(random() * %(users)s)::int] AS user_id,
+            (ARRAY[200, 500, 1000, 2000, 5000])[1 + floor(random() * 5)::int] AS amount,
+            created_at,
+            CASE WHEN created_at >= %(today)s AND r < 0.5 THEN 'pending'
+                 WHEN r < 0.85 THEN 'approved' ELSE 'rejected' END AS decision
+        FROM (
+            SELECT random() AS r, now() - random() * %(days)s * interval '1 day' AS created_at
+            FROM generate_series(1, %(rows)s)
+        ) AS drawn
+    ) AS withdrawals
+"""
+
+# The Transaction rows the deposit and withdrawal views write
+TRANSACTIONS_SQL = """
+    INSERT INTO {transaction} (user_id, transaction_type, amount, status, created_at, note)
+    SELECT user_id, 'deposit', amount, status, created_at, 'Deposit request - UTR: ' || utr_number
+    FROM {deposit} WHERE id > %(deposits_after)s
+    UNION ALL
+    SELECT user_id, 'withdraw', amount, CASE WHEN is_approved THEN 'approved' ELSE 'rejected' END,
+           coalesce(approved_at, created_at),
+           CASE WHEN is_approved THEN 'Withdrawal approved' ELSE 'Withdrawal rejected' END
+    FROM {withdraw} WHERE id > %(withdrawals_after)s AND (is_approved OR is_rejected)
+"""
+
+SEEDED_TABLES = (ReferralCommission, Bet, Transaction, DepositRequest, WithdrawRequest)
+
+
+def last_id(model):
+    return model.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+class Command(BaseCommand):
+    help = ("Seed synthetic load-test data: users with wallets and referral chains, bets across every game, "
+            "commissions, deposits and withdrawals (PostgreSQL)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--bets', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=30, help='History spread over this many days')
+        parser.add_argument('--referred', type=float, default=0.6, help='Share of users who have a referrer')
+        parser.add_argument('--deposits', type=float, default=3, help='Deposit requests per user')
+        parser.add_argument('--withdrawals', type=float, default=1, help='Withdrawal requests per user')
+        parser.add_argument('--batch-size', type=int, default=250000, help='Bets per INSERT')
+        parser.add_argument('--prefix', default='seed', help='Seeded usernames start with this and _')
+        parser.add_argument('--password', default='seed-password', help='Password of every seeded user')
+        parser.add_argument('--clear', action='store_true', help='Delete the users seeded with --prefix and exit')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("seed_data needs PostgreSQL")
+        self.quote = connection.ops.quote_name
+        self.prefix = options['prefix']
+        if options['clear']:
+            self.clear()
+            return
+
+        self.today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        started = time.perf_counter()
+
+        user_ids = self.step('users', self.seed_users, options)
+        self.step('bets', self.seed_bets, user_ids, options)
+        self.step('deposits and withdrawals', self.seed_payments, user_ids, options)
+
+        # Derived state, as the live paths would have left it
+        self.step('summaries', call_command, 'rebuild_financial_summary', stdout=self.stdout)
+        self.step('exposure', rebuild_exposure)
+        with connection.cursor() as cursor:
+            for model in (User, Wallet, *SEEDED_TABLES):
+                cursor.execute(f'ANALYZE {self.quote(model._meta.db_table)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(user_ids)} users and {options['bets']} bets in {time.perf_counter() - started:.1f}s; "
+            f"log in as any {self.prefix}_ user (staff: {self.prefix}_admin) with password {options['password']!r}"))
+
+    def step(self, name, run, *args, **kwargs):
+        started = time.perf_counter()
+        result = run(*args, **kwargs)
+        self.stdout.write(f"{name}: {time.perf_counter() - started:.1f}s")
+        return result
+
+    def seed_users(self, options):
+        """Ids of the new users, oldest first."""
+        start = User.objects.filter(username__startswith=f'{self.prefix}_').count()
+        # One hash for everyone; hashing each would take longer than the rest of the seed
+        password = make_password(options['password'])
+
+        users = []
+        for offset in range(0, options['users'], USER_CHUNK):
+            chunk = [
+                User(username=f'{self.prefix}_{n}', mobile=f'1{n:09d}', password=password)
+                for n in range(start + offset, start + min(offset + USER_CHUNK, options['users']))
+            ]
+            with transaction.atomic():
+                User.objects.bulk_create(chunk)
+                Wallet.objects.bulk_create(
+                    Wallet(user=user, balance=Decimal(1000 + int(random.lognormvariate(7, 1.2)) // 10 * 10))
+                    for user in chunk
+                )
+            users.extend(chunk)
+        if not users:
+            return []
+
+        # Referrers are earlier users, mostly the earliest few, so there are
+        # agents with hundreds of referrals and chains several levels deep
+        referrals = Counter()
+        for i, user in enumerate(users[1:], start=1):
+            if random.random() < options['referred']:
+                user.referred_by_id = users[int(i * random.random() ** 3)].id
+                referrals[user.referred_by_id] += 1
+        User.objects.bulk_update(users, ['referred_by'], batch_size=USER_CHUNK)
+        # The signup bonus for each referral, one update per referral count
+        by_count = defaultdict(list)
+        for user_id, count in referrals.items():
+            by_count[count].append(user_id)
+        for count, referrer_ids in by_count.items():
+            Wallet.objects.filter(user_id__in=referrer_ids).update(bonus=REFERRAL_BONUS * count)
+
+        User.objects.get_or_create(
+            username=f'{self.prefix}_admin',
+            defaults={'mobile': f'1{999999999 - start:09d}', 'password': password, 'is_staff': True})
+        return [user.id for user in users]
+
+    def seed_bets(self, user_ids, options):
+        if not user_ids:
+            return
+        tables = {'bet': self.quote(Bet._meta.db_table)}
+        after = last_id(Bet)
+        games = [game for game, _ in Bet.GAME_CHOICES]
+        with connection.cursor() as cursor:
+            for i, game in enumerate(games):
+                # An even share each, the remainder to the first games
+                remaining = options['bets'] // len(games) + (i < options['bets'] % len(games))
+                number_x, digit_x = PAYOUT_MULTIPLIERS.get(game, DEFAULT_MULTIPLIERS)
+                while remaining > 0:
+                    batch = min(remaining, options['batch_size'])
+                    cursor.execute(BETS_SQL.format(**tables), {
+                        'user_ids': user_ids, 'users': len(user_ids), 'game': game, 'bets': batch,
+                        'number_x': number_x, 'digit_x': digit_x, 'days': options['days'], 'today': self.today,
+                    })
+                    remaining -= batch
+
+            tables.update(commission=self.quote(ReferralCommission._meta.db_table),
+                          user=self.quote(User._meta.db_table),
+                          payout=self.quote(CommissionPayout._meta.db_table),
+                          wallet=self.quote(Wallet._meta.db_table))
+            commissions_after, payouts_after = last_id(ReferralCommission), last_id(CommissionPayout)
+            cursor.execute(COMMISSIONS_SQL.format(**tables), {
+                'rate': COMMISSION_RATE, 'today': self.today, 'after': after, 'games': list(COMMISSION_GAMES)})
+            cursor.execute(PAYOUTS_SQL.format(**tables), {'after': commissions_after})
+            cursor.execute(CREDIT_PAYOUTS_SQL.format(**tables), {'after': payouts_after})
+
+    def seed_payments(self, user_ids, options):
+        if not user_ids:
+            return
+        tables = {
+            'deposit': self.quote(DepositRequest._meta.db_table),
+            'withdraw': self.quote(WithdrawRequest._meta.db_table),
+            'transaction': self.quote(Transaction._meta.db_table),
+        }
+        params = {'user_ids': user_ids, 'users': len(user_ids), 'days': options['days'], 'today': self.today}
+        after = {'deposits_after': last_id(DepositRequest), 'withdrawals_after': last_id(WithdrawRequest)}
+        with connection.cursor() as cursor:
+            cursor.execute(DEPOSITS_SQL.format(**tables), {**params, 'rows': int(len(user_ids) * options['deposits'])})
+            cursor.execute(WITHDRAWALS_SQL.format(**tables),
+                           {**params, 'rows': int(len(user_ids) * options['withdrawals'])})
+            cursor.execute(TRANSACTIONS_SQL.format(**tables), after)
+
+    def clear(self):
+        user_ids = list(User.objects.filter(username__startswith=f'{self.prefix}_').values_list('id', flat=True))
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Raw deletes, the ORM cascade would load every bet into memory
+            for model in SEEDED_TABLES:
+                column = 'referred_user_id' if model is ReferralCommission else 'user_id'
+                cursor.execute(
+                    f'DELETE FROM {self.quote(model._meta.db_table)} WHERE {column} = ANY(%s)', [user_ids])
+            User.objects.filter(id__in=user_ids).delete()
+        rebuild_exposure()
+        self.stdout.write(f"Deleted {len(user_ids)} {self.prefix}_ users and their data")
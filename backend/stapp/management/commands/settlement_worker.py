@@ -0,0 +1,38 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from stapp.settlement import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Process queued result settlement jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Processes used to settle a large game (default: CPU count)')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds between polls when idle')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll'])
+                continue
+
+            self.stdout.write(f"Settling {job.game} -> {job.winning_number} (job {job.pk})")
+            try:
+                run_job(job, workers=options['workers'])
+            except Exception as e:
+                self.stderr.write(f"Job {job.pk} failed: {e}")
+                continue
+
+            job.refresh_from_db()
+            self.stdout.write(
+                f"Job {job.pk} done: {job.bets_processed} bets, {job.winners} winners, "
+                f"payout {job.payout} in {job.elapsed():.1f}s"
+            )
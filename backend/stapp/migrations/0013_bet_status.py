@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:44
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def settle_existing_bets(apps, schema_editor):
+    # Winners were paid already; left 'pending', the next result would pay
+    # them again. Nothing recorded which draws had a result, but results
+    # come in draw order, so a non-winning bet lost only if a bet on its
+    # game placed no earlier won. The rest wait for their draw's result.
+    Bet = apps.get_model('stapp', 'Bet')
+    Bet.objects.filter(is_win=True).update(status='won')
+    later_win = Bet.objects.filter(game=OuterRef('game'), is_win=True, created_at__gte=OuterRef('created_at'))
+    Bet.objects.filter(is_win=False).filter(Exists(later_win)).update(status='lost')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0012_user_profile_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bet',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('won', 'Won'), ('lost', 'Lost')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(settle_existing_bets, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['game', 'id'], name='bet_pending_game_idx'),
+        ),
+    ]
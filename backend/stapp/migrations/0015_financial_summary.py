@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0014_settlementjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserFinancialSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='financial_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_deposit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_withdraw', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('referral_count', models.IntegerField(default=0)),
+                ('referral_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyFinancialSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('deposit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('withdraw', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_financials', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='daily_financials_user_day_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0015_financial_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='depositrequest',
+            index=models.Index(fields=['created_at', 'id'], name='deposit_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['created_at', 'id'], name='transaction_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawrequest',
+            index=models.Index(fields=['created_at', 'id'], name='withdraw_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0017_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(fields=['game', 'created_at', 'id'], name='bet_game_created_idx'),
+        ),
+    ]
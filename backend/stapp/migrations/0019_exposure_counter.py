@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0018_bet_game_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExposureCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game', models.CharField(max_length=20)),
+                ('bet_type', models.CharField(max_length=10)),
+                ('number', models.IntegerField()),
+                ('stake', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('bets', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('game', 'bet_type', 'number'), name='exposure_game_type_number_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:16
+
+import stapp.models
+from django.db import migrations, models
+
+
+# Referral codes are the sequence value run through an invertible 40-bit
+# scramble (odd multipliers mod 2^40 and xor-shifts), written as eight
+# Crockford base32 characters split by a dash, e.g. "3JXB-K5HE".
+# Distinct values give distinct codes, and older codes never contain a
+# dash past their third character, so new codes can't clash with them.
+CREATE_SQL = """
+CREATE SEQUENCE stapp_referral_code_seq;
+
+CREATE FUNCTION stapp_referral_code(n bigint) RETURNS varchar AS $$
+DECLARE
+    alphabet text := '0123456789ABCDEFGHJKMNPQRSTVWXYZ';
+    m bigint := 1099511627776;
+    v bigint := (n * 7777777 + 31415926535) % m;
+    code text := '';
+BEGIN
+    v := v # (v >> 20);
+    v := (v * 5555555) % m;
+    v := v # (v >> 20);
+    FOR i IN 1..8 LOOP
+        code := substr(alphabet, (v % 32)::int + 1, 1) || code;
+        v := v / 32;
+    END LOOP;
+    RETURN substr(code, 1, 4) || '-' || substr(code, 5, 4);
+END
+$$ LANGUAGE plpgsql IMMUTABLE;
+"""
+
+DROP_SQL = """
+DROP FUNCTION stapp_referral_code(bigint);
+DROP SEQUENCE stapp_referral_code_seq;
+"""
+
+# Users saved before codes were guaranteed may have none
+BACKFILL_SQL = """
+UPDATE stapp_user SET referral_code = stapp_referral_code(nextval('stapp_referral_code_seq'))
+WHERE referral_code IS NULL OR referral_code = '';
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0020_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+        migrations.AlterField(
+            model_name='user',
+            name='referral_code',
+            field=models.CharField(blank=True, db_default=stapp.models.NextReferralCode(), max_length=20, null=True, unique=True),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Schema only. The backfill and dropping the old column follow in their own
+# migrations: Postgres refuses to alter a table with pending trigger events,
+# which an UPDATE of the new foreign key leaves behind in the same transaction.
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0021_referral_code_sequence'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='user',
+            old_name='referred_by',
+            new_name='referred_by_code',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='referred_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='referrals', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+# Point each user at the referrer whose code they stored; codes that
+# match nobody are dropped
+FORWARD_SQL = """
+UPDATE stapp_user AS u SET referred_by_id = r.id
+FROM stapp_user AS r
+WHERE r.referral_code = u.referred_by_code
+"""
+
+BACKWARD_SQL = """
+UPDATE stapp_user AS u SET referred_by_code = r.referral_code
+FROM stapp_user AS r
+WHERE r.id = u.referred_by_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0022_referred_by_fk'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, BACKWARD_SQL),
+    ]
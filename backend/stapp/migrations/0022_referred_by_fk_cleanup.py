@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0022_referred_by_fk_backfill'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='referred_by_code',
+        ),
+    ]
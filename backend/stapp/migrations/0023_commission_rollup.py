@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0022_referred_by_fk_cleanup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommissionPayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_end', models.DateTimeField()),
+                ('commission', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('bets', models.IntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='referralcommission',
+            name='rolled_up_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # Commissions so far were credited when their bet was placed
+        migrations.RunSQL(
+            "UPDATE stapp_referralcommission SET rolled_up_at = created_at",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='referralcommission',
+            index=models.Index(condition=models.Q(('rolled_up_at__isnull', True)), fields=['id'], name='commission_pending_idx'),
+        ),
+        migrations.AddField(
+            model_name='commissionpayout',
+            name='referrer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='commission_payouts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='commissionpayout',
+            constraint=models.UniqueConstraint(fields=('referrer', 'period_end'), name='payout_referrer_period_uniq'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0023_commission_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='referralcommission',
+            index=models.Index(fields=['referrer', '-created_at', '-id'], name='commission_referrer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='referralcommission',
+            index=models.Index(fields=['created_at', 'id'], name='commission_created_idx'),
+        ),
+    ]
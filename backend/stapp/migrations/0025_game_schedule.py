@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:33
+
+import datetime
+
+import stapp.models
+from django.db import migrations, models
+
+
+# The times the admin panel has been showing: betting reopens with each
+# result and closes shortly before the next one
+GAMES = [
+    ('jaipur king', 'Jaipur King', '15:00', '14:45'),
+    ('diamond king', 'Diamond King', '16:30', '16:15'),
+    ('disawer', 'Disawer', '17:15', '17:00'),
+    ('faridabad', 'Faridabad', '18:15', '18:00'),
+    ('ghaziabad', 'Ghaziabad', '20:40', '20:30'),
+    ('gali', 'Gali', '23:00', '22:50'),
+]
+
+
+def seed_games(apps, schema_editor):
+    Game = apps.get_model('stapp', 'Game')
+    time = datetime.time.fromisoformat
+    Game.objects.bulk_create([
+        Game(name=name, label=label, opens_at=time(result), closes_at=time(closes), result_at=time(result),
+             bet_types=['number', 'andar', 'bahar'])
+        for name, label, result, closes in GAMES
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0024_referral_commission_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Game',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='As stored on Bet.game', max_length=20, unique=True)),
+                ('label', models.CharField(max_length=50)),
+                ('opens_at', models.TimeField()),
+                ('closes_at', models.TimeField()),
+                ('result_at', models.TimeField()),
+                ('bet_types', models.JSONField(default=stapp.models.default_bet_types)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['result_at'],
+            },
+        ),
+        migrations.RunPython(seed_games, migrations.RunPython.noop),
+    ]
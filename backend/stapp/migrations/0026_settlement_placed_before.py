@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0025_game_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='settlementjob',
+            name='placed_before',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,30 +1,30 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.conf import settings
-import uuid
+from django.utils import timezone
+
+
+class NextReferralCode(models.Func):
+    """
+    A fresh referral code, computed by the database on INSERT from its own
+    sequence, so codes never collide and need no lookups (see migration
+    0021_referral_code_sequence).
+    """
+    template = "stapp_referral_code(nextval('stapp_referral_code_seq'))"
+    output_field = models.CharField()
 
 
 class User(AbstractUser):
     mobile = models.CharField(max_length=10, unique=True)
     email = models.EmailField(blank=True, null=True)
-    referral_code = models.CharField(max_length=20,unique=True, blank=True, null=True)
-    referred_by = models.CharField(max_length=20, blank=True, null=True)
+    referral_code = models.CharField(max_length=20, unique=True, blank=True, null=True, db_default=NextReferralCode())
+    referred_by = models.ForeignKey('self', on_delete=models.SET_NULL, blank=True, null=True, related_name='referrals')
    
 
 
     USERNAME_FIELD = 'mobile'
     REQUIRED_FIELDS = ['username']
-
-    def save(self, *args, **kwargs):
-        if not self.referral_code:
-            # auto generate: first 3 letters of name + 4 random digits
-            base = self.username[:3].upper()
-            while True:
-                code = base + uuid.uuid4().hex[:4].upper()
-                if not User.objects.filter(referral_code=code).exists():
-                    self.referral_code = code
-                    break
-        super().save(*args, **kwargs)
     
 
 class Wallet(models.Model):
@@ -50,6 +50,11 @@ class DepositRequest(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     approved_at = models.DateTimeField(null=True, blank=True)  # ✅ Add this if you need timestamp
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='deposit_created_idx'),
+        ]
+
     def is_approved(self):
         return self.status == "approved"
 
@@ -71,6 +76,11 @@ class WithdrawRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     approved_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='withdraw_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} Withdraw ₹{self.amount}"
 
@@ -87,7 +97,11 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     note = models.CharField(max_length=255, null=True, blank=True)
 
-
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='transaction_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='transaction_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.transaction_type} - {self.amount} - {self.status}"
@@ -113,6 +127,11 @@ class Bet(models.Model):
         ('andar', 'Andar'),
         ('bahar', 'Bahar'),
     ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('won', 'Won'),
+        ('lost', 'Lost'),
+    ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     game = models.CharField(max_length=20, choices=GAME_CHOICES)
@@ -121,8 +140,19 @@ class Bet(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     is_win = models.BooleanField(default=False)
     payout = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Settlement walks a game's pending bets by id range
+            models.Index(fields=['game', 'id'], condition=models.Q(status='pending'), name='bet_pending_game_idx'),
+            # A user's bet history, newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='bet_user_created_idx'),
+            # Admin bet book windows and drill-down
+            models.Index(fields=['game', 'created_at', 'id'], name='bet_game_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.game} - {self.bet_type} - {self.number}"
 
@@ -137,6 +167,175 @@ class ReferralCommission(models.Model):
     bet = models.ForeignKey('Bet', on_delete=models.CASCADE)
     commission = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the commission is credited to the referrer by a roll-up (see commissions.py)
+    rolled_up_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(rolled_up_at__isnull=True), name='commission_pending_idx'),
+            models.Index(fields=['referrer', '-created_at', '-id'], name='commission_referrer_idx'),
+            models.Index(fields=['created_at', 'id'], name='commission_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.referrer} earned ₹{self.commission} from {self.referred_user}"
+
+
+class CommissionPayout(models.Model):
+    """
+    One referrer's commissions from one roll-up, credited to their wallet in
+    a single update. Its commissions are the referrer's ReferralCommissions
+    with rolled_up_at equal to period_end.
+    """
+    referrer = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='commission_payouts', on_delete=models.CASCADE)
+    period_end = models.DateTimeField()
+    commission = models.DecimalField(max_digits=14, decimal_places=2)
+    bets = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['referrer', 'period_end'], name='payout_referrer_period_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.referrer_id} ₹{self.commission} at {self.period_end}"
+
+class SettlementJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    game = models.CharField(max_length=20, choices=Bet.GAME_CHOICES)
+    winning_number = models.IntegerField()
+    # Only bets placed before this (the draw's close) are settled
+    placed_before = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    bets_total = models.IntegerField(default=0)
+    bets_processed = models.IntegerField(default=0)
+    winners = models.IntegerField(default=0)
+    payout = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    error = models.TextField(blank=True, default='')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='settlementjob_queue_idx'),
+        ]
+
+    def elapsed(self):
+        if not self.started_at:
+            return 0
+        return ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+
+    def __str__(self):
+        return f"{self.game} -> {self.winning_number} ({self.status})"
+
+
+class UserFinancialSummary(models.Model):
+    """Running per-user totals, kept up to date by the approval paths and commission roll-ups."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, primary_key=True, related_name='financial_summary', on_delete=models.CASCADE)
+    total_deposit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_withdraw = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    referral_count = models.IntegerField(default=0)
+    referral_earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} summary"
+
+
+class DailyFinancialSummary(models.Model):
+    """Per-user deposit/withdrawal totals for one day, keyed by the request's created_at date."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='daily_financials', on_delete=models.CASCADE)
+    day = models.DateField()
+    deposit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    withdraw = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='daily_financials_user_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.day}"
+
+
+class ExposureCounter(models.Model):
+    """Open (pending) stake per game, bet type and number, kept up to date by place_bet."""
+    game = models.CharField(max_length=20)
+    bet_type = models.CharField(max_length=10)
+    number = models.IntegerField()
+    stake = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    bets = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'bet_type', 'number'], name='exposure_game_type_number_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.game} {self.bet_type} {self.number}: {self.stake}"
+
+
+class IdempotencyKey(models.Model):
+    """A client's Idempotency-Key and the response it got, replayed on retries until it expires."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='idempotency_keys', on_delete=models.CASCADE)
+    key = models.CharField(max_length=64)
+    endpoint = models.CharField(max_length=100)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.key} -> {self.status_code}"
+
+
+def default_bet_types():
+    return [bet_type for bet_type, _ in Bet.BET_TYPE_CHOICES]
+
+
+class Game(models.Model):
+    """
+    A game's daily betting window and result time, in GAME_TIME_ZONE.
+    Betting is open from opens_at until closes_at, wrapping past midnight
+    when closes_at is the earlier time; equal times never close. Bets read
+    it through schedule.game_schedule, not from here.
+    """
+    name = models.CharField(max_length=20, unique=True, help_text='As stored on Bet.game')
+    label = models.CharField(max_length=50)
+    opens_at = models.TimeField()
+    closes_at = models.TimeField()
+    result_at = models.TimeField()
+    bet_types = models.JSONField(default=default_bet_types)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['result_at']
+
+    def clean(self):
+        known = dict(Bet.BET_TYPE_CHOICES)
+        if not isinstance(self.bet_types, list) or not set(self.bet_types) <= set(known):
+            raise ValidationError({'bet_types': f"Pick from {', '.join(known)}"})
 
     def __str__(self):
-        return f"{self.referrer} earned ₹{self.commission} from {self.referred_user}"
\ No newline at end of file
+        return f"{self.label} ({self.opens_at:%H:%M}-{self.closes_at:%H:%M}, result {self.result_at:%H:%M})"
@@ -1,8 +1,22 @@
 # your_app/pagination.py
 
-from rest_framework.pagination import PageNumberPagination
+from asgiref.sync import sync_to_async
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10  # default items per page
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+
+class HistoryCursorPagination(CursorPagination):
+    # Seeks on the (user, created_at) indexes, so a deep page costs the same as the first
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # DRF paginates synchronously; like Django's own async queryset
+        # methods, the page query runs on a worker thread
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
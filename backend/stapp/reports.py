@@ -0,0 +1,341 @@
+import base64
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, connections, router
+from django.db.models import Count, DecimalField, Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    User, Wallet, DailyFinancialSummary, Transaction, DepositRequest, WithdrawRequest, Bet, ReferralCommission,
+)
+
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+# query param -> (annotation, lookup); every one of them is evaluated in SQL
+USER_STATS_FILTERS = {
+    'min_balance': ('balance', 'gte'),
+    'max_balance': ('balance', 'lte'),
+    'min_deposit': ('total_deposit', 'gte'),
+    'max_deposit': ('total_deposit', 'lte'),
+    'min_withdraw': ('total_withdraw', 'gte'),
+    'max_withdraw': ('total_withdraw', 'lte'),
+    'min_earning': ('total_earning', 'gte'),
+    'max_earning': ('total_earning', 'lte'),
+    'min_today_deposit': ('today_deposit', 'gte'),
+    'max_today_deposit': ('today_deposit', 'lte'),
+    'min_today_withdraw': ('today_withdraw', 'gte'),
+    'max_today_withdraw': ('today_withdraw', 'lte'),
+    'min_referrals': ('total_referrals', 'gte'),
+    'max_referrals': ('total_referrals', 'lte'),
+    'min_referral_earnings': ('referral_earnings', 'gte'),
+    'max_referral_earnings': ('referral_earnings', 'lte'),
+}
+
+USER_STATS_ORDERING = [
+    'id', 'username', 'date_joined', 'balance', 'total_deposit', 'total_withdraw', 'total_earning',
+    'today_deposit', 'today_withdraw', 'total_referrals', 'referral_earnings',
+]
+
+
+def _money(expression):
+    return Coalesce(expression, Value(Decimal('0.00')), output_field=MONEY)
+
+
+def users_stats_queryset():
+    """
+    Every user annotated with wallet, deposit, withdrawal and referral totals in one query.
+
+    Totals come from the incrementally maintained UserFinancialSummary and
+    today's DailyFinancialSummary bucket, so each user costs a couple of
+    primary-key lookups however much history they have.
+    """
+    wallet = Wallet.objects.filter(user=OuterRef('pk'))
+    today = DailyFinancialSummary.objects.filter(user=OuterRef('pk'), day=timezone.localdate())
+
+    return User.objects.annotate(
+        balance=_money(Subquery(wallet.values('balance')[:1])),
+        bonus=_money(Subquery(wallet.values('bonus')[:1])),
+        winnings=_money(Subquery(wallet.values('winnings')[:1])),
+        total_deposit=_money(F('financial_summary__total_deposit')),
+        total_withdraw=_money(F('financial_summary__total_withdraw')),
+        today_deposit=_money(Subquery(today.values('deposit')[:1])),
+        today_withdraw=_money(Subquery(today.values('withdraw')[:1])),
+        total_referrals=Coalesce(F('financial_summary__referral_count'), Value(0)),
+        referral_earnings=_money(F('financial_summary__referral_earnings')),
+    ).annotate(
+        total_earning=F('winnings') + F('referral_earnings'),
+    )
+
+
+# Commissions earned in this window count towards active referrals and recent earnings
+REFERRAL_ACTIVE_DAYS = 30
+
+
+def _aggregate(queryset, group_by, aggregate):
+    # ``aggregate`` over ``queryset`` as a correlated subquery; ``group_by`` is the OuterRef'd column
+    return Subquery(queryset.order_by().values(group_by).annotate(value=aggregate).values('value'))
+
+
+def referrer_stats_queryset():
+    """
+    Users annotated with their referral totals in one query.
+
+    Credited earnings come from the financial summary, so only commissions
+    still waiting for a roll-up and those of the last REFERRAL_ACTIVE_DAYS
+    are read, through the (referrer, created_at) index.
+    """
+    since = timezone.now() - timedelta(days=REFERRAL_ACTIVE_DAYS)
+    commissions = ReferralCommission.objects.filter(referrer=OuterRef('pk'))
+    recent = commissions.filter(created_at__gte=since)
+    referrals = User.objects.filter(referred_by=OuterRef('pk'))
+
+    return User.objects.annotate(
+        total_referrals=Coalesce(_aggregate(referrals, 'referred_by', Count('id')), Value(0)),
+        credited_commission=_money(F('financial_summary__referral_earnings')),
+        pending_commission=_money(_aggregate(
+            commissions.filter(rolled_up_at__isnull=True), 'referrer', Sum('commission'))),
+        recent_commission=_money(_aggregate(recent, 'referrer', Sum('commission'))),
+        active_referrals=Coalesce(_aggregate(recent, 'referrer', Count('referred_user', distinct=True)), Value(0)),
+    ).annotate(
+        total_commission=F('credited_commission') + F('pending_commission'),
+    )
+
+
+def referrers_queryset():
+    """referrer_stats_queryset() narrowed to users who have referred someone, biggest earners first."""
+    return referrer_stats_queryset().filter(
+        Exists(User.objects.filter(referred_by=OuterRef('pk')))
+    ).order_by('-total_commission', '-id')
+
+
+def filter_users_stats(queryset, params):
+    """Apply the admin users panel filters, search and ordering from query params."""
+    filters = {}
+    for param, (field, lookup) in USER_STATS_FILTERS.items():
+        value = params.get(param)
+        if value not in (None, ''):
+            filters[f'{field}__{lookup}'] = Decimal(value)
+    queryset = queryset.filter(**filters)
+
+    status = params.get('status')
+    if status == 'active':
+        queryset = queryset.filter(is_active=True)
+    elif status == 'blocked':
+        queryset = queryset.filter(is_active=False)
+
+    search = params.get('search', '').strip()
+    if search:
+        queryset = queryset.filter(
+            Q(username__icontains=search) | Q(mobile__icontains=search) | Q(email__icontains=search))
+
+    ordering = params.get('ordering', '-id')
+    if ordering.lstrip('-') not in USER_STATS_ORDERING:
+        ordering = '-id'
+    # id breaks ties so pages don't overlap
+    return queryset.order_by(ordering) if ordering.lstrip('-') == 'id' else queryset.order_by(ordering, '-id')
+
+
+# Admin ledger: Transaction, DepositRequest and WithdrawRequest rows as one
+# feed, newest first. Each branch is cut to one page on its own
+# (created_at, id) index before the UNION ALL, so a page costs the same
+# however big the tables get. Rows are ordered by (created_at, source, id)
+# so ties across tables still have a stable position for the cursor.
+LEDGER_BRANCHES = {
+    'txn': {
+        'table': Transaction,
+        'kind': 'transaction_type',
+        'status': 'status',
+        'note': "COALESCE(note, '')",
+    },
+    'dep': {
+        'table': DepositRequest,
+        'kind': "'deposit'",
+        'status': 'status',
+        'note': "'UTR: ' || utr_number",
+    },
+    'with': {
+        'table': WithdrawRequest,
+        'kind': "'withdraw'",
+        'status': "CASE WHEN is_approved THEN 'approved' WHEN is_rejected THEN 'rejected' ELSE 'pending' END",
+        'note': "''",
+    },
+}
+
+LEDGER_BRANCH_SQL = """
+    (SELECT %s AS source, id, user_id, {kind} AS kind, amount, {status} AS status, created_at, {note} AS note
+     FROM {table}
+     WHERE {where}
+     ORDER BY created_at DESC, id DESC
+     LIMIT %s)
+"""
+
+LEDGER_SQL = """
+    SELECT l.source, l.id, l.kind, l.amount, l.status, l.created_at, l.note, u.username, u.mobile
+    FROM ({branches}) AS l
+    JOIN {user_table} AS u ON u.id = l.user_id
+    ORDER BY l.created_at DESC, l.source DESC, l.id DESC
+    LIMIT %s
+"""
+
+LEDGER_PAGE_SIZE = 50
+LEDGER_MAX_PAGE_SIZE = 200
+
+
+def encode_ledger_cursor(row):
+    value = f"{row['created_at'].isoformat()}|{row['source']}|{row['id']}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_ledger_cursor(cursor):
+    created_at, source, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    if source not in LEDGER_BRANCHES:
+        raise ValueError('Invalid cursor')
+    return datetime.fromisoformat(created_at), source, int(pk)
+
+
+def _ledger_branch(source, branch, params, cursor, limit):
+    where, args = ['TRUE'], []
+
+    # Keyset: everything strictly after the cursor in (created_at, source, id) DESC order
+    if cursor:
+        created_at, cursor_source, pk = cursor
+        if source < cursor_source:
+            where.append('created_at <= %s')
+            args.append(created_at)
+        elif source == cursor_source:
+            where.append('(created_at, id) < (%s, %s)')
+            args.extend([created_at, pk])
+        else:
+            where.append('created_at < %s')
+            args.append(created_at)
+
+    transaction_type = params.get('type')
+    if transaction_type:
+        where.append(f"{branch['kind']} = %s")
+        args.append(transaction_type)
+
+    status = params.get('status')
+    if status:
+        where.append(f"{branch['status']} = %s")
+        args.append(status)
+
+    if params.get('date_from'):
+        where.append('created_at >= %s')
+        args.append(_day_start(params['date_from']))
+    if params.get('date_to'):
+        where.append('created_at < %s')
+        args.append(_day_start(params['date_to']) + timedelta(days=1))
+
+    search = params.get('search', '').strip()
+    if search:
+        where.append(f'user_id IN (SELECT id FROM {_table(User)} WHERE username ILIKE %s OR mobile ILIKE %s)')
+        args.extend([f'%{search}%', f'%{search}%'])
+
+    sql = LEDGER_BRANCH_SQL.format(
+        table=_table(branch['table']),
+        kind=branch['kind'],
+        status=branch['status'],
+        note=branch['note'],
+        where=' AND '.join(where),
+    )
+    return sql, [source] + args + [limit]
+
+
+def ledger_page(params):
+    """
+    One page of the admin ledger as (rows, next_cursor).
+
+    ``params`` takes ``cursor``, ``page_size``, ``type``, ``status``,
+    ``date_from``/``date_to`` (YYYY-MM-DD) and ``search`` (username or mobile).
+    """
+    # A page_size that isn't a number raises ValueError, which the view turns into a 400
+    page_size = max(1, min(int(params.get('page_size') or LEDGER_PAGE_SIZE), LEDGER_MAX_PAGE_SIZE))
+    cursor = decode_ledger_cursor(params['cursor']) if params.get('cursor') else None
+
+    branches, args = [], []
+    for source, branch in LEDGER_BRANCHES.items():
+        sql, branch_args = _ledger_branch(source, branch, params, cursor, page_size + 1)
+        branches.append(sql)
+        args.extend(branch_args)
+
+    sql = LEDGER_SQL.format(branches=' UNION ALL '.join(branches), user_table=_table(User))
+    # Raw SQL skips the router, so ask it which alias to read from
+    with connections[router.db_for_read(Transaction)].cursor() as db:
+        db.execute(sql, args + [page_size + 1])
+        columns = [c[0] for c in db.description]
+        rows = [dict(zip(columns, r)) for r in db.fetchall()]
+
+    next_cursor = encode_ledger_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+
+def bet_window(params):
+    """
+    Bets in the ``date_from``/``date_to`` window (YYYY-MM-DD, both default
+    to today), optionally narrowed to one ``game`` and ``status``.
+    """
+    today = timezone.localdate().isoformat()
+    date_from = params.get('date_from') or today
+    date_to = params.get('date_to') or today
+    bets = Bet.objects.filter(
+        created_at__gte=_day_start(date_from), created_at__lt=_day_start(date_to) + timedelta(days=1))
+
+    game = (params.get('game') or '').lower()
+    if game:
+        if game not in dict(Bet.GAME_CHOICES):
+            raise ValueError(f'Unknown game {game}')
+        bets = bets.filter(game=game)
+
+    status = params.get('status')
+    if status:
+        if status not in dict(Bet.STATUS_CHOICES):
+            raise ValueError(f'Unknown status {status}')
+        bets = bets.filter(status=status)
+
+    return bets, date_from, date_to
+
+
+def bet_book(params):
+    """
+    Stake, bet count and distinct bettors per game, bet type and number for
+    a date window, grouped in SQL. At most 120 rows per game however many
+    bets were placed.
+    """
+    bets, date_from, date_to = bet_window(params)
+
+    book = {}
+    for row in bets.values('game').annotate(stake=Sum('amount'), bets=Count('id'), users=Count('user', distinct=True)):
+        book[row['game']] = {
+            'total_stake': str(row['stake']),
+            'total_bets': row['bets'],
+            'total_users': row['users'],
+            'number': [],
+            'andar': [],
+            'bahar': [],
+        }
+
+    rows = (
+        bets.values('game', 'bet_type', 'number')
+        .annotate(stake=Sum('amount'), bets=Count('id'), users=Count('user', distinct=True))
+        .order_by('game', 'bet_type', 'number')
+    )
+    for row in rows:
+        book[row['game']].setdefault(row['bet_type'], []).append({
+            'number': row['number'],
+            'stake': str(row['stake']),
+            'bets': row['bets'],
+            'users': row['users'],
+        })
+
+    return {'date_from': date_from, 'date_to': date_to, 'games': book}
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _day_start(value):
+    return timezone.make_aware(datetime.combine(date.fromisoformat(value), time.min))
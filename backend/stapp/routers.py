@@ -0,0 +1,143 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.functional import empty
+
+
+# Set while a @replica_reads view runs. A ContextVar, so concurrent
+# requests on threads or in the event loop each see their own.
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def sticky_key(user_id):
+    return f'db:primary:{user_id}'
+
+
+def pin_primary(*user_ids):
+    """
+    Keep these users' reads on the primary for REPLICA_STICKY_SECONDS, so
+    they see what was just written for them before the replica catches up.
+    """
+    cache.set_many({sticky_key(user_id): True for user_id in user_ids}, sticky_seconds())
+
+
+async def apin_primary(*user_ids):
+    await cache.aset_many({sticky_key(user_id): True for user_id in user_ids}, sticky_seconds())
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+
+def is_pinned(user_id):
+    return cache.get(sticky_key(user_id), False)
+
+
+async def ais_pinned(user_id):
+    return await cache.aget(sticky_key(user_id), False)
+
+
+@contextmanager
+def reading_from_replica():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Reads go to the REPLICA_DATABASE alias inside @replica_reads views and
+    to the primary everywhere else (or everywhere, if it is None). Writes
+    always go to the primary, including saves of objects read from the
+    replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = getattr(settings, 'REPLICA_DATABASE', None)
+        if _use_replica.get() and replica in connections.databases:
+            return replica
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+
+def replica_reads(view):
+    """
+    Run a read-only view's queries on the replica, unless the user wrote
+    something in the last REPLICA_STICKY_SECONDS. Goes below @api_view (or
+    method_decorator on an APIView method) so the user is authenticated.
+    Async views must set request.user before calling the wrapped view.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if await ais_pinned(request.user.pk):
+                return await view(request, *args, **kwargs)
+            # Threads the ORM hands queries to inherit the context
+            with reading_from_replica():
+                return await view(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if is_pinned(request.user.pk):
+            return view(request, *args, **kwargs)
+        with reading_from_replica():
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class PinPrimaryAfterWriteMiddleware:
+    """
+    Pin the user to the primary after any successful POST, PUT, PATCH or
+    DELETE. Runs either way, so async views under ASGI stay on the loop.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if user_id := self.writer(request, response):
+            pin_primary(user_id)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if user_id := self.writer(request, response):
+            await apin_primary(user_id)
+        return response
+
+    def writer(self, request, response):
+        if request.method in self.SAFE_METHODS or response.status_code >= 400:
+            return None
+        # DRF, and the async views, hand the user they authenticated down to
+        # the Django request. A lazy session user nobody looked at is left
+        # alone, since loading it would be a query.
+        user = getattr(request, 'user', None)
+        if user is None or getattr(user, '_wrapped', None) is empty or not user.is_authenticated:
+            return None
+        return user.pk
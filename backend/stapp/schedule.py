@@ -0,0 +1,153 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Game
+
+
+# Numbers each bet type can be placed on (100 is shown as "00")
+NUMBER_RANGES = {
+    'number': range(0, 101),
+    'andar': range(0, 10),
+    'bahar': range(0, 10),
+}
+
+
+class InvalidBet(ValueError):
+    """A bet slip line that can't be placed."""
+
+
+class GameClosed(InvalidBet):
+    """The game isn't taking bets at the moment."""
+
+
+class ScheduledGame:
+    """One active Game, compiled for checks that need no query."""
+
+    __slots__ = ('name', 'label', 'opens_at', 'closes_at', 'result_at', 'ranges')
+
+    def __init__(self, game):
+        self.name = game.name
+        self.label = game.label
+        self.opens_at = game.opens_at
+        self.closes_at = game.closes_at
+        self.result_at = game.result_at
+        self.ranges = {bet_type: NUMBER_RANGES[bet_type] for bet_type in game.bet_types if bet_type in NUMBER_RANGES}
+
+    def is_open(self, at):
+        """Whether betting is open at the local time of day ``at``."""
+        if self.opens_at == self.closes_at:
+            return True
+        if self.opens_at < self.closes_at:
+            return self.opens_at <= at < self.closes_at
+        # The window runs past midnight
+        return at >= self.opens_at or at < self.closes_at
+
+
+class GameSchedule:
+    """
+    The active games, loaded in one query and kept in process memory.
+
+    Saving or deleting a Game drops the snapshot in this process (see
+    signals.py); other processes reload theirs once it is older than
+    GAME_SCHEDULE_TTL seconds.
+    """
+
+    def __init__(self):
+        self.games = None
+        self.loaded_at = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'GAME_SCHEDULE_TTL', 60)
+
+    @property
+    def time_zone(self):
+        return ZoneInfo(getattr(settings, 'GAME_TIME_ZONE', settings.TIME_ZONE))
+
+    @property
+    def stale(self):
+        return self.games is None or time.monotonic() - self.loaded_at > self.ttl
+
+    def snapshot(self):
+        """Active games by name."""
+        games = self.games
+        if self.stale:
+            with self.lock:
+                games = {game.name: ScheduledGame(game) for game in Game.objects.filter(is_active=True)}
+                self.games, self.loaded_at = games, time.monotonic()
+        return games
+
+    def invalidate(self):
+        """Reload on next use, and again if the current transaction commits a change."""
+        self.games = None
+        transaction.on_commit(self._drop)
+
+    def _drop(self):
+        self.games = None
+
+    def local_time(self, now=None):
+        return timezone.localtime(now or timezone.now(), self.time_zone).time()
+
+    def check(self, game, lines, now=None, games=None):
+        """
+        Raise InvalidBet unless ``game`` is known and open and every parsed
+        (bet_type, number, amount) line is one it takes.
+        """
+        scheduled = (self.snapshot() if games is None else games).get(game)
+        if scheduled is None:
+            raise InvalidBet(f'Unknown game {game}')
+        if not scheduled.is_open(self.local_time(now)):
+            raise GameClosed(f'Betting is closed for {scheduled.label}')
+        for bet_type, number, _ in lines:
+            if bet_type not in scheduled.ranges:
+                raise InvalidBet(f'{scheduled.label} does not take {bet_type} bets')
+            if number not in scheduled.ranges[bet_type]:
+                raise InvalidBet(f'Invalid number {number} for {bet_type}')
+
+    def last_close(self, game, at):
+        """
+        When betting on ``game`` last closed at or before ``at``, or None for
+        an unknown game or one that never closes.
+        """
+        scheduled = self.snapshot().get(game)
+        if scheduled is None or scheduled.opens_at == scheduled.closes_at:
+            return None
+        local = timezone.localtime(at, self.time_zone)
+        closed = datetime.combine(local.date(), scheduled.closes_at, tzinfo=self.time_zone)
+        if closed > local:
+            closed = datetime.combine(local.date() - timedelta(days=1), scheduled.closes_at, tzinfo=self.time_zone)
+        return closed
+
+    async def acheck(self, game, lines, now=None):
+        """check() for async views; only a reload of the snapshot goes to a thread."""
+        games = self.games
+        if games is None or self.stale:
+            games = await sync_to_async(self.snapshot)()
+        self.check(game, lines, now, games)
+
+    def status(self, now=None):
+        """Every active game with its window and whether it is open now."""
+        at = self.local_time(now)
+        return [
+            {
+                'name': game.name,
+                'label': game.label,
+                'status': 'open' if game.is_open(at) else 'closed',
+                'opens_at': game.opens_at.strftime('%H:%M'),
+                'closes_at': game.closes_at.strftime('%H:%M'),
+                'result_at': game.result_at.strftime('%H:%M'),
+                'bet_types': list(game.ranges),
+            }
+            for game in sorted(self.snapshot().values(), key=lambda game: game.result_at)
+        ]
+
+
+game_schedule = GameSchedule()
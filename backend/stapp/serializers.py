@@ -2,8 +2,8 @@ from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import authenticate, get_user_model
 from .models import Wallet, DepositRequest, Bet,WithdrawRequest,ReferralCommission
-import random
-import string
+from .authentication import UserClaimsRefreshToken
+from .backends import check_user_password
 
 User = get_user_model()
 
@@ -11,8 +11,6 @@ User = get_user_model()
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Wallet
-import random
-import string
 
 User = get_user_model()
 
@@ -34,13 +32,6 @@ class RegisterSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"confirm_password": "Passwords do not match."})
         return data
 
-    def generate_referral_code(self, username):
-        base = username[:3].upper()
-        while True:
-            code = base + ''.join(random.choices(string.digits, k=4))
-            if not User.objects.filter(referral_code=code).exists():
-                return code
-
     def create(self, validated_data):
         validated_data.pop('confirm_password')
         password = validated_data.pop('password')
@@ -48,14 +39,10 @@ class RegisterSerializer(serializers.ModelSerializer):
 
         referred_by = None
         if referral_code_input:
-            if User.objects.filter(referral_code=referral_code_input).exists():
-                referred_by = referral_code_input
-
-        user = User(
-            **validated_data,
-            referred_by=referred_by,
-            referral_code=self.generate_referral_code(validated_data['username'])
-        )
+            referred_by = User.objects.filter(referral_code=referral_code_input).first()
+
+        # The referral code is assigned by the database on INSERT
+        user = User(**validated_data, referred_by=referred_by)
         user.set_password(password)
         user.save()
 
@@ -66,6 +53,7 @@ class RegisterSerializer(serializers.ModelSerializer):
 # ✅ Custom Login with Mobile (for normal users)
 class MobileTokenObtainPairSerializer(TokenObtainPairSerializer):
     username_field = 'mobile'
+    token_class = UserClaimsRefreshToken
 
 
 # ✅ User Profile Serializer
@@ -78,6 +66,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
 # ✅ Admin login serializer (login via username instead of mobile, only staff allowed)
 class AdminTokenSerializer(TokenObtainPairSerializer):
     username_field = 'username'
+    token_class = UserClaimsRefreshToken
 
     def validate(self, attrs):
         username = attrs.get("username")
@@ -91,7 +80,7 @@ class AdminTokenSerializer(TokenObtainPairSerializer):
         except User.DoesNotExist:
             raise serializers.ValidationError("Invalid username or password.")
 
-        if not user.check_password(password):
+        if not check_user_password(user, password):
             raise serializers.ValidationError("Invalid username or password.")
 
         if not user.is_staff:
@@ -201,7 +190,9 @@ class ReferralCommissionSerializer(serializers.ModelSerializer):
     referred_user = serializers.CharField(source='referred_user.username')
     bet_game = serializers.CharField(source='bet.game')
     date = serializers.DateTimeField(source='created_at', format="%Y-%m-%d %H:%M")
+    # Null until a roll-up credits it to the wallet
+    credited_at = serializers.DateTimeField(source='rolled_up_at', format="%Y-%m-%d %H:%M")
 
     class Meta:
         model = ReferralCommission
-        fields = ['referred_user', 'bet_game', 'commission', 'date']
+        fields = ['referred_user', 'bet_game', 'commission', 'date', 'credited_at']
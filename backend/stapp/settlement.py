@@ -0,0 +1,257 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Min, Q
+from django.utils import timezone
+from .models import Bet, Wallet, SettlementJob
+from .exposure import rebuild_exposure
+from .caching import response_cache, WALLET
+from .schedule import game_schedule
+
+
+# Payout multipliers per game as (number, andar/bahar), same as the admin panel shows
+DEFAULT_MULTIPLIERS = (91, 9)
+PAYOUT_MULTIPLIERS = {
+    'jaipur king': (100, 10),
+    'diamond king': (90, 9),
+}
+
+CHUNK_SIZE = 50000
+
+# Games with fewer pending bets than this are settled by the worker itself,
+# bigger ones are split by user-id range across a process pool
+SHARD_MIN_BETS = 200000
+
+# A running job whose progress hasn't moved for this long is assumed to
+# belong to a dead worker and is handed out again
+STALE_AFTER = timedelta(minutes=10)
+
+# A number bet matches the full result (100 on the board is "00"), andar
+# matches its tens digit and bahar its units digit.
+WIN_SQL = """(CASE bet_type
+    WHEN 'number' THEN number %% 100 = %(result)s
+    WHEN 'andar' THEN number = %(andar)s
+    WHEN 'bahar' THEN number = %(bahar)s
+    ELSE false END)"""
+
+# Winners are a small slice of a game's bets, so they get their own UPDATE
+# whose RETURNING rows feed one grouped credit per user. Only rows changed by
+# this statement are credited, so bets settled by an earlier result are never
+# paid twice. Losers are then marked in a plain UPDATE with nothing returned.
+WINNERS_SQL = """
+    WITH won AS (
+        UPDATE {bet}
+        SET status = 'won',
+            is_win = true,
+            payout = amount * (CASE bet_type WHEN 'number' THEN %(number_x)s ELSE %(digit_x)s END)
+        WHERE game = %(game)s AND status = 'pending' AND id >= %(lo)s AND id < %(hi)s{users}{placed} AND {win}
+        RETURNING user_id, payout
+    ), credited AS (
+        UPDATE {wallet} AS w
+        SET winnings = w.winnings + s.total
+        FROM (SELECT user_id, SUM(payout) AS total FROM won GROUP BY user_id) AS s
+        WHERE w.user_id = s.user_id
+        RETURNING w.id
+    )
+    SELECT COUNT(*), COALESCE(SUM(payout), 0) FROM won
+"""
+
+LOSERS_SQL = """
+    UPDATE {bet}
+    SET status = 'lost'
+    WHERE game = %(game)s AND status = 'pending' AND id >= %(lo)s AND id < %(hi)s{users}{placed}
+"""
+
+USERS_SQL = " AND user_id >= %(user_lo)s AND user_id < %(user_hi)s"
+
+# Bets placed after the draw closed are for the next draw
+PLACED_SQL = " AND created_at < %(placed_before)s"
+
+
+def settle_chunk(game, winning_number, lo, hi, users=None, placed_before=None):
+    """
+    Settle the pending bets of ``game`` with ``lo <= id < hi``, optionally only
+    those of users in the half-open id range ``users`` and those placed
+    before ``placed_before``. Returns (bets, winners, payout).
+    """
+    number_x, digit_x = PAYOUT_MULTIPLIERS.get(game, DEFAULT_MULTIPLIERS)
+    quote = connection.ops.quote_name
+    tables = {
+        'bet': quote(Bet._meta.db_table),
+        'wallet': quote(Wallet._meta.db_table),
+        'win': WIN_SQL,
+        'users': USERS_SQL if users else '',
+        'placed': PLACED_SQL if placed_before else '',
+    }
+    params = {
+        'game': game,
+        'result': winning_number,
+        'andar': winning_number // 10,
+        'bahar': winning_number % 10,
+        'number_x': number_x,
+        'digit_x': digit_x,
+        'lo': lo,
+        'hi': hi,
+        'user_lo': users[0] if users else None,
+        'user_hi': users[1] if users else None,
+        'placed_before': placed_before,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(WINNERS_SQL.format(**tables), params)
+        winners, payout = cursor.fetchone()
+        cursor.execute(LOSERS_SQL.format(**tables), params)
+        losers = cursor.rowcount
+    if winners:
+        # Winners can be any number of users, so their cached balances are
+        # retired in one go rather than key by key
+        response_cache.invalidate_all(WALLET)
+    return winners + losers, winners, Decimal(payout)
+
+
+def draw_bets(game, placed_before):
+    """The pending bets of ``game`` that belong to the draw which closed at ``placed_before``."""
+    return Bet.objects.filter(game=game, status='pending', created_at__lt=placed_before)
+
+
+def settle_game(game, winning_number, chunk_size=CHUNK_SIZE, placed_before=None):
+    """
+    Settle the pending bets of ``game`` placed before ``placed_before``
+    (default: when its betting last closed) against ``winning_number`` (0-99).
+
+    Runs in one transaction, walking the pending bets in id windows of
+    ``chunk_size``. Returns a dict with the number of bets settled, winners
+    and total payout.
+    """
+    result = {'bets': 0, 'winners': 0, 'payout': Decimal('0.00')}
+    placed_before = placed_before or draw_closed_at(game)
+
+    with transaction.atomic():
+        bounds = draw_bets(game, placed_before).aggregate(lo=Min('id'), hi=Max('id'))
+        if bounds['lo'] is None:
+            return result
+
+        for lo in range(bounds['lo'], bounds['hi'] + 1, chunk_size):
+            bets, winners, payout = settle_chunk(game, winning_number, lo, lo + chunk_size,
+                                                 placed_before=placed_before)
+            result['bets'] += bets
+            result['winners'] += winners
+            result['payout'] += payout
+
+        # The settled bets no longer count towards the game's open exposure
+        rebuild_exposure(game)
+
+    return result
+
+
+def draw_closed_at(game, at=None):
+    """When betting on ``game`` last closed, or ``at`` (default now) for a game that never closes."""
+    at = at or timezone.now()
+    return game_schedule.last_close(game, at) or at
+
+
+def enqueue_settlement(game, winning_number, user=None):
+    """
+    Queue a settlement job for the worker and return it. The job settles
+    only bets placed before the draw closed, however late the worker gets
+    to it, so bets already taken for the next draw stay pending.
+    """
+    now = timezone.now()
+    return SettlementJob.objects.create(
+        game=game, winning_number=winning_number, created_by=user, placed_before=draw_closed_at(game, now))
+
+
+def claim_next_job():
+    """
+    Hand the oldest queued (or stale running) job to this worker, or return None.
+
+    SKIP LOCKED lets several workers poll the same table without handing out
+    a job twice.
+    """
+    stale = timezone.now() - STALE_AFTER
+    with transaction.atomic():
+        job = (
+            SettlementJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='queued') | Q(status='running', updated_at__lt=stale))
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.started_at = job.started_at or timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated_at'])
+    return job
+
+
+def settle_shard(job_id, game, winning_number, lo, hi, users, chunk_size=CHUNK_SIZE, placed_before=None):
+    """
+    Settle one user-id range of a job, one id window per transaction.
+
+    Each window's progress is added to the job in the same transaction as
+    the settlement itself, so the job row always matches what is committed
+    and a restarted job simply picks up the bets that are still pending.
+    """
+    for start in range(lo, hi + 1, chunk_size):
+        with transaction.atomic():
+            bets, winners, payout = settle_chunk(game, winning_number, start, start + chunk_size, users, placed_before)
+            if bets:
+                SettlementJob.objects.filter(pk=job_id).update(
+                    bets_processed=F('bets_processed') + bets,
+                    winners=F('winners') + winners,
+                    payout=F('payout') + payout,
+                    updated_at=timezone.now(),
+                )
+
+
+def _user_shards(user_lo, user_hi, shards):
+    step = (user_hi - user_lo) // shards + 1
+    return [(start, start + step) for start in range(user_lo, user_hi + 1, step)]
+
+
+def run_job(job, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Settle a claimed job, splitting big games by user-id range over ``workers`` processes.
+
+    Shards touch disjoint bets and wallets, so they never wait on each other.
+    """
+    workers = workers or os.cpu_count() or 1
+    # Jobs queued before placed_before was recorded settle what was placed before them
+    placed_before = job.placed_before or job.created_at
+    try:
+        stats = draw_bets(job.game, placed_before).aggregate(
+            total=Count('id'), lo=Min('id'), hi=Max('id'), user_lo=Min('user_id'), user_hi=Max('user_id'))
+        SettlementJob.objects.filter(pk=job.pk).update(
+            bets_total=F('bets_processed') + stats['total'], updated_at=timezone.now())
+
+        if stats['total']:
+            shards = min(workers, -(-stats['total'] // SHARD_MIN_BETS))
+            args = (job.pk, job.game, job.winning_number, stats['lo'], stats['hi'])
+            if shards == 1:
+                settle_shard(*args, None, chunk_size, placed_before)
+            else:
+                # Spawned, not forked: with connection pooling, close_all() hands
+                # connections back to the pool rather than closing them, and a
+                # forked child would share their sockets
+                with ProcessPoolExecutor(max_workers=shards, mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=django.setup) as pool:
+                    futures = [
+                        pool.submit(settle_shard, *args, users, chunk_size, placed_before)
+                        for users in _user_shards(stats['user_lo'], stats['user_hi'], shards)
+                    ]
+                    for future in futures:
+                        future.result()
+
+        # The settled bets no longer count towards the game's open exposure
+        rebuild_exposure(job.game)
+
+        SettlementJob.objects.filter(pk=job.pk).update(
+            status='done', finished_at=timezone.now(), updated_at=timezone.now())
+    except Exception as e:
+        SettlementJob.objects.filter(pk=job.pk).update(
+            status='failed', error=str(e), finished_at=timezone.now(), updated_at=timezone.now())
+        raise
@@ -1,13 +1,23 @@
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.utils.crypto import get_random_string
-from .models import User
+from .authentication import stamp_access, user_cache
+from .backends import user_cache_key
+from .caching import invalidate_profiles, invalidate_wallets
+from .models import Game, User, Wallet
+from .schedule import game_schedule
 
-def generate_referral_code():
-    return get_random_string(length=8).upper()
+@receiver([post_save, post_delete], sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
+    user_cache.discard(instance.pk)
+    stamp_access(instance, deleted=kwargs['signal'] is post_delete)
+    invalidate_profiles(instance.pk)
 
-@receiver(post_save, sender=User)
-def set_referral_code(sender, instance, created, **kwargs):
-    if created and not instance.referral_code:
-        instance.referral_code = generate_referral_code()
-        instance.save()
+@receiver([post_save, post_delete], sender=Wallet)
+def drop_cached_wallet(sender, instance, **kwargs):
+    invalidate_wallets(instance.user_id)
+
+@receiver([post_save, post_delete], sender=Game)
+def reload_game_schedule(sender, instance, **kwargs):
+    game_schedule.invalidate()
@@ -0,0 +1,49 @@
+from django.db import connection
+from django.utils import timezone
+
+from .models import UserFinancialSummary, DailyFinancialSummary
+
+
+SUMMARY_COUNTERS = ('total_deposit', 'total_withdraw', 'referral_count', 'referral_earnings')
+DAILY_COUNTERS = ('deposit', 'withdraw')
+
+# Add to the counters of a summary row, creating it on first use. One
+# statement, so concurrent approvals for the same user can't lose an increment.
+UPSERT_SQL = """
+    INSERT INTO {table} ({columns}, updated_at)
+    VALUES ({values}, CURRENT_TIMESTAMP)
+    ON CONFLICT ({conflict}) DO UPDATE SET {updates}, updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def _increment(model, keys, counters, **deltas):
+    # Every counter is written so a freshly inserted row has no NULLs
+    deltas = {c: deltas.get(c, 0) for c in counters}
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = list(keys) + list(deltas)
+    sql = UPSERT_SQL.format(
+        table=table,
+        columns=', '.join(quote(c) for c in columns),
+        values=', '.join(['%s'] * len(columns)),
+        conflict=', '.join(quote(c) for c in keys),
+        updates=', '.join(f'{quote(c)} = {table}.{quote(c)} + EXCLUDED.{quote(c)}' for c in deltas),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(keys.values()) + list(deltas.values()))
+
+
+def record_deposit(deposit):
+    """Count an approved deposit. Call inside the approval's transaction."""
+    _increment(UserFinancialSummary, {'user_id': deposit.user_id}, SUMMARY_COUNTERS,
+               total_deposit=deposit.amount)
+    _increment(DailyFinancialSummary, {'user_id': deposit.user_id, 'day': timezone.localdate(deposit.created_at)},
+               DAILY_COUNTERS, deposit=deposit.amount)
+
+
+def record_withdrawal(withdrawal):
+    """Count an approved withdrawal. Call inside the approval's transaction."""
+    _increment(UserFinancialSummary, {'user_id': withdrawal.user_id}, SUMMARY_COUNTERS,
+               total_withdraw=withdrawal.amount)
+    _increment(DailyFinancialSummary, {'user_id': withdrawal.user_id, 'day': timezone.localdate(withdrawal.created_at)},
+               DAILY_COUNTERS, withdraw=withdrawal.amount)
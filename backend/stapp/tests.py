@@ -1,3 +1,1125 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import time, timedelta
+from unittest import mock, skipUnless
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib import admin
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .admin import WithdrawRequestAdmin
+from .authentication import UserClaimsRefreshToken, user_cache
+from .backends import MobileOrUsernameBackend
+from .bets import COMMISSION_GAMES
+from .caching import WALLET, invalidate_wallets, response_cache
+from .commissions import roll_up_commissions
+from .hashers import acheck_password_bounded
+from .exposure import LOCK_SQL as EXPOSURE_LOCK_SQL, rebuild_exposure
+from .models import (
+    User, Wallet, Bet, Transaction, DepositRequest, WithdrawRequest, ReferralCommission, ExposureCounter,
+    CommissionPayout, UserFinancialSummary, Game, SettlementJob,
+)
+from .routers import ReplicaRouter, reading_from_replica
+from .schedule import ScheduledGame, game_schedule
+from .settlement import CHUNK_SIZE, enqueue_settlement, run_job, settle_chunk, settle_game
+from .summary import record_deposit
+from .urls import urlpatterns
+
+
+# Queries each endpoint may run, whatever the fixture volume. Every URL in
+# stapp/urls.py must have an entry; raise a budget only with a reason.
+QUERY_BUDGETS = {
+    'register': 4,
+    'login': 1,
+    'user-profile': 0,
+    'get_profile': 0,
+    'wallet-balance': 1,
+    'withdraw-request': 2,
+    'transaction-history': 1,
+    'place-bet': 6,
+    'place-bet-slip': 6,
+    'view-bets-24h': 1,
+    'view-bets-30d': 1,
+    'user-bet-history': 1,
+    'admin_token_obtain_pair': 1,
+    'token_refresh': 1,
+    'admin-grouped-bets': 2,
+    'admin-bet-records': 1,
+    'admin-exposure': 1,
+    'admin_withdraw_requests': 1,
+    'admin_withdraw_action': 8,
+    'admin_transactions': 1,
+    'user_deposit_request': 2,
+    'admin_list_deposit_requests': 1,
+    'admin_deposit_action': 9,
+    'declare-result': 1,
+    'settlement-job-status': 1,
+    'referral_earnings': 1,
+    'admin_referral_summary': 1,
+    'admin_referrers': 2,
+    'admin_cache_stats': 0,
+    'user_referral_summary': 1,
+    'admin_users_stats': 3,
+    'game-status': 0,
+    'async-wallet-balance': 1,
+    'async-place-bet': 6,
+    'async-transaction-history': 1,
+    'async-view-bets-24h': 1,
+    'async-view-bets-30d': 1,
+    'async-user-bet-history': 1,
+}
+
+# The replica is a separate connection in tests, which can't see a
+# TestCase's uncommitted rows, so only ReplicaRoutingTests reads from it
+PRIMARY_ONLY = override_settings(REPLICA_DATABASE=None)
+
+# A worker thread's connection can't see a TestCase's uncommitted rows
+# either, so async views run their writes on the request's thread there
+ON_REQUEST_THREAD = override_settings(ASYNC_DB_WORKERS=False)
+
+# Rows per user in the budget fixtures: enough that one query per row
+# can't hide inside a budget
+ROWS_PER_USER = 12
+USERS = 10
+
+# Rows seeded for the query plan tests, so the planner prefers an index
+# wherever one applies
+PLAN_BETS = 200000
+PLAN_ROWS = 50000
+PLAN_USERS = 1000
+
+
+def seed_user(mobile, username, **fields):
+    user = User.objects.create(
+        mobile=mobile, username=username, password=make_password('secret123'), **fields)
+    Wallet.objects.create(user=user, balance=Decimal('10000.00'))
+    return user
+
+
+def open_game(test, name='gali', **fields):
+    """Make ``name`` a game that takes bets round the clock, and load the schedule."""
+    fields = {'label': name.title(), 'opens_at': time(0), 'closes_at': time(0), 'result_at': time(0), **fields}
+    game, _ = Game.objects.update_or_create(name=name, defaults=fields)
+    test.addCleanup(game_schedule.invalidate)
+    game_schedule.invalidate()
+    game_schedule.snapshot()
+    return game
+
+
+@PRIMARY_ONLY
+@ON_REQUEST_THREAD
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = seed_user('9000000000', 'admin', is_staff=True)
+        cls.referrer = seed_user('9000000001', 'referrer')
+        cls.users = [
+            seed_user(f'91000000{i:02d}', f'user{i}', referred_by=cls.referrer)
+            for i in range(USERS)
+        ]
+        cls.user = cls.users[0]
+
+        for user in cls.users:
+            bets = Bet.objects.bulk_create(
+                Bet(user=user, game='gali', bet_type='number', number=i, amount=Decimal('10.00'))
+                for i in range(ROWS_PER_USER)
+            )
+            Transaction.objects.bulk_create(
+                Transaction(user=user, transaction_type='deposit', amount=Decimal('100.00'))
+                for _ in range(ROWS_PER_USER)
+            )
+            for i in range(ROWS_PER_USER):
+                deposit = DepositRequest.objects.create(
+                    user=user, amount=Decimal('100.00'), utr_number=f'{i:012d}', status='approved')
+                record_deposit(deposit)
+            WithdrawRequest.objects.bulk_create(
+                WithdrawRequest(user=user, amount=Decimal('50.00')) for _ in range(ROWS_PER_USER)
+            )
+            ReferralCommission.objects.bulk_create(
+                ReferralCommission(referrer=cls.referrer, referred_user=user, bet=bet, commission=Decimal('0.10'))
+                for bet in bets
+            )
+        roll_up_commissions()
+
+    def setUp(self):
+        self.client = APIClient()
+        open_game(self)
+        response_cache.backend.clear()
+
+    def bearer(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {UserClaimsRefreshToken.for_user(user).access_token}'}
+
+    def assertBudget(self, name, method='get', user=None, data=None, args=None, **kwargs):
+        if user is not None:
+            self.client.force_authenticate(user)
+        with self.assertNumQueries(QUERY_BUDGETS[name]):
+            response = getattr(self.client, method)(reverse(name, args=args), data, **kwargs)
+        self.assertLess(response.status_code, 400, response.content)
+        return response
+
+    def test_every_url_has_a_budget(self):
+        self.assertEqual({p.name for p in urlpatterns}, set(QUERY_BUDGETS))
+
+    def test_register(self):
+        body = json.dumps({'username': 'newuser', 'mobile': '9200000000', 'password': 'secret123'})
+        response = self.assertBudget('register', 'post', data=body, content_type='application/json')
+        self.assertEqual(response.json()['referral_code'], User.objects.get(mobile='9200000000').referral_code)
+
+    def test_register_with_referral_code(self):
+        body = json.dumps({'username': 'invited', 'mobile': '9200000002', 'password': 'secret123',
+                           'referral_code': self.referrer.referral_code})
+        bonus = Wallet.objects.get(user=self.referrer).bonus
+        response = self.client.post(reverse('register'), body, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(User.objects.get(username='invited').referred_by_id, self.referrer.id)
+        self.assertEqual(Wallet.objects.get(user=self.referrer).bonus, bonus + Decimal('50.00'))
+
+    def test_register_reports_the_taken_field(self):
+        for body, error in (
+            ({'username': self.user.username, 'mobile': '9200000001'}, 'Username already exists'),
+            ({'username': 'fresh', 'mobile': self.user.mobile}, 'Mobile number already exists'),
+        ):
+            response = self.client.post(reverse('register'), json.dumps({**body, 'password': 'secret123'}),
+                                        content_type='application/json')
+            self.assertEqual((response.status_code, response.json()['error']), (400, error))
+        self.assertEqual(User.objects.filter(username='fresh').count(), 0)
+
+    def test_login(self):
+        body = json.dumps({'mobile': self.user.mobile, 'password': 'secret123'})
+        self.assertBudget('login', 'post', data=body, content_type='application/json')
+
+    def test_admin_token(self):
+        self.assertBudget('admin_token_obtain_pair', 'post',
+                          data={'username': 'admin', 'password': 'secret123'}, format='json')
+
+    def test_token_refresh(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        self.assertBudget('token_refresh', 'post', data={'refresh': refresh}, format='json')
+
+    def test_profile(self):
+        self.assertBudget('user-profile', user=self.user)
+        self.assertBudget('get_profile', user=self.user)
+
+    def test_wallet_balance(self):
+        self.assertBudget('wallet-balance', user=self.user)
+
+    def test_withdraw_request(self):
+        self.assertBudget('withdraw-request', 'post', user=self.user, data={'amount': '100'}, format='json')
+
+    def test_history(self):
+        for name in ('transaction-history', 'view-bets-24h', 'view-bets-30d', 'user-bet-history'):
+            with self.subTest(name=name):
+                response = self.assertBudget(name, user=self.user, data={'page_size': 5})
+                # Following the cursor costs the same as the first page
+                with self.assertNumQueries(QUERY_BUDGETS[name]):
+                    self.client.get(response.data['next'])
+
+    def test_async_reads(self):
+        auth = self.bearer(self.user)
+        self.assertBudget('async-wallet-balance', **auth)
+        for name in ('async-transaction-history', 'async-view-bets-24h', 'async-view-bets-30d',
+                     'async-user-bet-history'):
+            with self.subTest(name=name):
+                response = self.assertBudget(name, data={'page_size': 5}, **auth)
+                with self.assertNumQueries(QUERY_BUDGETS[name]):
+                    self.client.get(response.json()['next'], **auth)
+
+    def test_async_history_matches_the_sync_views(self):
+        auth = self.bearer(self.user)
+        self.client.force_authenticate(self.user)
+        for name in ('transaction-history', 'view-bets-24h', 'view-bets-30d', 'user-bet-history'):
+            with self.subTest(name=name):
+                sync = self.client.get(reverse(name), {'page_size': 5}).json()
+                self.assertEqual(self.client.get(reverse(f'async-{name}'), {'page_size': 5}, **auth).json()['results'],
+                                 sync['results'])
+
+    def test_async_place_bet(self):
+        self.assertBudget('async-place-bet', 'post', content_type='application/json',
+                          data={'game': 'gali', 'bet_type': 'number', 'number': 42, 'amount': '20'},
+                          **self.bearer(self.user))
+
+    def test_place_bet_with_referral_commission(self):
+        self.assertBudget('place-bet', 'post', user=self.user, format='json',
+                          data={'game': 'gali', 'bet_type': 'number', 'number': 42, 'amount': '20'})
+
+    def test_commissions_are_credited_by_the_roll_up(self):
+        summary = UserFinancialSummary.objects.get(user=self.referrer)
+        bonus = Wallet.objects.get(user=self.referrer).bonus
+        newcomer = seed_user('9200000003', 'newcomer', referred_by=self.referrer)
+        for user, amount in ((self.user, '20'), (newcomer, '30'), (newcomer, '50')):
+            self.client.force_authenticate(user)
+            self.client.post(reverse('place-bet'), {'game': 'gali', 'number': 7, 'amount': amount}, format='json')
+        self.assertEqual(Wallet.objects.get(user=self.referrer).bonus, bonus)
+
+        self.assertEqual(roll_up_commissions(), (1, 3, Decimal('1.00')))
+        self.assertEqual(roll_up_commissions(), (0, 0, 0))
+        self.assertEqual(Wallet.objects.get(user=self.referrer).bonus, bonus + Decimal('1.00'))
+        payout = CommissionPayout.objects.filter(referrer=self.referrer).latest('period_end')
+        self.assertEqual((payout.commission, payout.bets), (Decimal('1.00'), 3))
+        updated = UserFinancialSummary.objects.get(user=self.referrer)
+        self.assertEqual(updated.referral_count, summary.referral_count + 1)
+        self.assertEqual(updated.referral_earnings, summary.referral_earnings + Decimal('1.00'))
+
+    def test_bet_slip_costs_the_same_as_one_bet(self):
+        lines = [{'bet_type': 'number', 'number': n, 'amount': '10'} for n in range(1, 31)]
+        lines += [{'bet_type': 'andar', 'number': n, 'amount': '5'} for n in range(10)]
+        self.assertBudget('place-bet-slip', 'post', user=self.user, format='json',
+                          data={'game': 'gali', 'bets': lines})
+
+    def test_deposit_request(self):
+        self.assertBudget('user_deposit_request', 'post', user=self.user, format='json',
+                          data={'amount': '500', 'utr_number': '123456789012'})
+
+    def test_admin_lists(self):
+        for name in ('admin-grouped-bets', 'admin-bet-records', 'admin_withdraw_requests', 'admin_list_deposit_requests',
+                     'admin_transactions', 'admin_referral_summary', 'admin_referrers', 'admin_users_stats'):
+            with self.subTest(name=name):
+                self.assertBudget(name, user=self.admin)
+        self.assertBudget('admin-exposure', user=self.admin, data={'game': 'gali'})
+
+    def test_admin_ledger_page_size(self):
+        self.client.force_authenticate(self.admin)
+        for page_size, rows in (('0', 1), ('-5', 1), ('3', 3)):
+            with self.subTest(page_size=page_size):
+                response = self.client.get(reverse('admin_transactions'), {'page_size': page_size})
+                self.assertEqual(len(response.json()['results']), rows)
+                self.assertTrue(response.json()['next_cursor'])
+        response = self.client.get(reverse('admin_transactions'), {'page_size': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_withdraw_action(self):
+        withdrawal = WithdrawRequest.objects.filter(user=self.user).first()
+        self.assertBudget('admin_withdraw_action', 'post', user=self.admin, format='json',
+                          data={'withdraw_id': withdrawal.id, 'action': 'approve'})
+
+    def test_admin_deposit_action(self):
+        deposit = DepositRequest.objects.create(user=self.user, amount=Decimal('300.00'), utr_number='1' * 12)
+        self.assertBudget('admin_deposit_action', 'post', user=self.admin, format='json',
+                          data={'deposit_id': deposit.id, 'action': 'approve'})
+
+    def test_declare_result_and_job_status(self):
+        response = self.assertBudget('declare-result', 'post', user=self.admin, format='json',
+                                     data={'game': 'gali', 'winning_number': 7})
+        self.assertBudget('settlement-job-status', user=self.admin, args=[response.data['job_id']])
+        for body in ({'game': 5, 'winning_number': 7}, {'game': 'gali'}, {'game': 'gali', 'winning_number': None},
+                     {'game': 'gali', 'winning_number': 'seven'}, {'game': 'gali', 'winning_number': 100}):
+            with self.subTest(body=body):
+                response = self.client.post(reverse('declare-result'), body, format='json')
+                self.assertEqual(response.json(), {'error': 'Invalid game or winning number'})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(SettlementJob.objects.count(), 1)
+
+    def test_referrals(self):
+        page = self.assertBudget('referral_earnings', user=self.referrer, data={'page_size': 5})
+        self.assertEqual(len(page.data['results']), 5)
+        self.assertTrue(page.data['next'])
+
+        # One pending commission on top of the rolled-up fixture
+        bet = Bet.objects.filter(user=self.user).first()
+        ReferralCommission.objects.create(referrer=self.referrer, referred_user=self.user, bet=bet,
+                                          commission=Decimal('0.50'))
+        credited = UserFinancialSummary.objects.get(user=self.referrer).referral_earnings
+        response = self.assertBudget('user_referral_summary', user=self.referrer)
+        self.assertEqual(response.data['total_referrals'], USERS)
+        self.assertEqual(response.data['active_referrals'], USERS)
+        self.assertEqual(response.data['pending_earnings'], '0.50')
+        self.assertEqual(Decimal(response.data['total_earnings']), credited + Decimal('0.50'))
+        self.assertEqual(Decimal(response.data['last_30_days_earnings']), credited + Decimal('0.50'))
+
+        referrers = self.assertBudget('admin_referrers', user=self.admin).data['results']
+        self.assertEqual([r['id'] for r in referrers], [self.referrer.id])
+
+    def test_game_status(self):
+        self.assertBudget('game-status')
+
+
+@override_settings(STAKE_CAP_PER_NUMBER=100)
+class ExposureTests(TestCase):
+    def setUp(self):
+        self.user = seed_user('9000000002', 'bettor')
+        open_game(self)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bet(self, number, amount, bet_type='number'):
+        return self.client.post(reverse('place-bet'), format='json', data={
+            'game': 'gali', 'bet_type': bet_type, 'number': number, 'amount': amount})
+
+    def test_cap_rejects_bet_and_keeps_wallet(self):
+        self.assertEqual(self.bet(5, 60).status_code, 200)
+        self.assertEqual(self.bet(5, 50).status_code, 400)
+        # 100 settles like 0, a different number from 5
+        self.assertEqual(self.bet(100, 50).status_code, 200)
+
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('9890.00'))
+        self.assertEqual(Bet.objects.filter(user=self.user).count(), 2)
+        counter = ExposureCounter.objects.get(game='gali', bet_type='number', number=5)
+        self.assertEqual((counter.stake, counter.bets), (Decimal('60.00'), 1))
+
+    def test_bet_slip_is_all_or_nothing(self):
+        lines = [{'number': n, 'amount': 40} for n in (1, 2, 3)] + [{'number': 101, 'amount': 40}]
+        response = self.client.post(reverse('place-bet-slip'), {'game': 'gali', 'bets': lines}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # Two lines on 7 add up past the cap
+        lines = [{'number': n, 'amount': 60} for n in (1, 2, 7, 7)]
+        response = self.client.post(reverse('place-bet-slip'), {'game': 'gali', 'bets': lines}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('10000.00'))
+        self.assertFalse(Bet.objects.filter(user=self.user).exists())
+        self.assertFalse(ExposureCounter.objects.exists())
+
+    def test_rebuild_matches_live_counters(self):
+        for number, amount in ((5, 10), (105, 20), (5, 30), (7, 40)):
+            self.bet(number, amount)
+        self.bet(3, 25, bet_type='andar')
+        live = set(ExposureCounter.objects.values_list('game', 'bet_type', 'number', 'stake', 'bets'))
+        rebuild_exposure()
+        self.assertEqual(set(ExposureCounter.objects.values_list('game', 'bet_type', 'number', 'stake', 'bets')), live)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = seed_user('9000000003', 'retrier')
+        open_game(self)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, name, data, key):
+        return self.client.post(reverse(name), data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_stored_response_without_writing(self):
+        bet = {'game': 'gali', 'number': 5, 'amount': 100}
+        first = self.post('place-bet', bet, 'slip-1')
+        # Claim the key, read the stored response, nothing else
+        with self.assertNumQueries(4):
+            replay = self.post('place-bet', bet, 'slip-1')
+
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(Bet.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('9900.00'))
+
+    def test_key_is_scoped_to_its_endpoint(self):
+        self.post('withdraw-request', {'amount': 100}, 'k')
+        response = self.post('user_deposit_request', {'amount': 500, 'utr_number': '1' * 12}, 'k')
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(DepositRequest.objects.exists())
+
+
+@PRIMARY_ONLY
+@ON_REQUEST_THREAD
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.user = seed_user('9000000011', 'streamer')
+        open_game(self)
+        response_cache.backend.clear()
+        token = UserClaimsRefreshToken.for_user(self.user).access_token
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def post(self, data, **headers):
+        return self.client.post(reverse('async-place-bet'), data, content_type='application/json',
+                                **self.auth, **headers)
+
+    def test_needs_a_token(self):
+        self.assertEqual(self.client.get(reverse('async-wallet-balance')).status_code, 401)
+        response = self.client.get(reverse('async-wallet-balance'), HTTP_AUTHORIZATION='Bearer nonsense')
+        self.assertEqual(response.status_code, 401)
+
+    def test_bet_is_debited_and_the_cached_balance_dropped(self):
+        balance = self.client.get(reverse('async-wallet-balance'), **self.auth)
+        self.assertEqual((balance['X-Cache'], balance.json()['balance']), ('miss', '10000.00'))
+        response = self.post({'game': 'gali', 'number': 5, 'amount': 100})
+        self.assertEqual(response.status_code, 200, response.content)
+        balance = self.client.get(reverse('async-wallet-balance'), **self.auth)
+        self.assertEqual((balance['X-Cache'], balance.json()['balance']), ('miss', '9900.00'))
+
+    def test_invalid_bets_are_refused_before_any_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post({'game': 'nowhere', 'number': 5, 'amount': 100}).status_code, 400)
+            self.assertEqual(self.post({'game': 'gali', 'number': 500, 'amount': 100}).status_code, 400)
+            self.assertEqual(self.post({'game': 5, 'number': 5, 'amount': 100}).json(), {'error': 'Invalid bet data'})
+            self.assertEqual(self.post({'game': ['gali'], 'number': 5, 'amount': 100}).status_code, 400)
+            self.assertEqual(self.post('{').status_code, 400)
+
+    def test_idempotent_replay(self):
+        bet = {'game': 'gali', 'number': 5, 'amount': 100}
+        first = self.post(bet, HTTP_IDEMPOTENCY_KEY='async-1')
+        replay = self.post(bet, HTTP_IDEMPOTENCY_KEY='async-1')
+        self.assertEqual((replay.status_code, replay.json()), (200, first.json()))
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(Bet.objects.filter(user=self.user).count(), 1)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.user = seed_user('9000000007', 'poller')
+        self.admin = seed_user('9000000008', 'cashier', is_staff=True)
+        open_game(self)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        response_cache.backend.clear()
+        response_cache.reset_stats()
+
+    def balance(self):
+        response = self.client.get(reverse('wallet-balance'))
+        return response['X-Cache'], response.json()['balance']
+
+    def test_repeat_reads_skip_the_database(self):
+        self.assertEqual(self.balance(), ('miss', '10000.00'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.balance(), ('hit', '10000.00'))
+
+    def test_writes_invalidate_the_balance(self):
+        self.balance()
+        self.client.post(reverse('place-bet'), {'game': 'gali', 'number': 5, 'amount': 100}, format='json')
+        self.assertEqual(self.balance(), ('miss', '9900.00'))
+
+        deposit = DepositRequest.objects.create(user=self.user, amount=Decimal('500.00'), utr_number='1' * 12)
+        self.client.force_authenticate(self.admin)
+        self.client.post(reverse('admin_deposit_action'), {'deposit_id': deposit.id, 'action': 'approve'}, format='json')
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.balance(), ('miss', '10400.00'))
+
+        # A settlement retires every cached balance at once
+        self.balance()
+        settle_game('gali', 5)
+        self.assertEqual(self.balance()[0], 'miss')
+
+    def test_a_read_racing_a_write_is_not_served_after_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_wallets(self.user.pk)
+            # A reader looks the balance up before the write commits...
+            _, token = response_cache.get(WALLET, self.user.pk)
+        # ...and stores what it read once it has
+        response_cache.set(WALLET, self.user.pk, token, {'balance': '10000.00'})
+        self.assertEqual(response_cache.get(WALLET, self.user.pk)[0], None)
+
+    def test_profile_is_dropped_when_the_user_is_saved(self):
+        self.client.get(reverse('user-profile'))
+        self.user.email = 'poller@example.com'
+        self.user.save()
+        response = self.client.get(reverse('user-profile'))
+        self.assertEqual((response['X-Cache'], response.json()['email']), ('miss', 'poller@example.com'))
+
+    def test_stats(self):
+        self.balance()
+        self.balance()
+        self.client.force_authenticate(self.admin)
+        stats = self.client.get(reverse('admin_cache_stats')).json()
+        self.assertEqual(stats['kinds']['wallet'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+
+class SettlementTests(TestCase):
+    def settle(self, user, game, winning_number, bets):
+        """Settle ``bets`` of (bet_type, number) at 10.00 each for ``user``; {(bet_type, number): (status, payout)}."""
+        placed = [Bet.objects.create(user=user, game=game, bet_type=bet_type, number=number, amount=Decimal('10.00'))
+                  for bet_type, number in bets]
+        settle_game(game, winning_number, placed_before=timezone.now())
+        return {(bet.bet_type, bet.number): (bet.status, bet.payout)
+                      for bet in Bet.objects.filter(pk__in=[bet.pk for bet in placed])}
+
+    def test_payouts_follow_each_games_multipliers(self):
+        # The digits swapped, so andar must match the tens and bahar the units
+        bets = [('number', 47), ('andar', 4), ('bahar', 7), ('number', 74), ('andar', 7), ('bahar', 4)]
+        games = (('jaipur king', 100, 10), ('diamond king', 90, 9), ('gali', 91, 9))
+        for i, (game, number_x, digit_x) in enumerate(games):
+            with self.subTest(game=game):
+                user = seed_user(f'910000000{i}', f'settled{i}')
+                settled = self.settle(user, game, 47, bets)
+                self.assertEqual(settled, {
+                    ('number', 47): ('won', Decimal(10 * number_x)),
+                    ('andar', 4): ('won', Decimal(10 * digit_x)),
+                    ('bahar', 7): ('won', Decimal(10 * digit_x)),
+                    ('number', 74): ('lost', 0),
+                    ('andar', 7): ('lost', 0),
+                    ('bahar', 4): ('lost', 0),
+                })
+                self.assertEqual(Wallet.objects.get(user=user).winnings, Decimal(10 * number_x + 20 * digit_x))
+
+    def test_number_100_wins_on_00(self):
+        user = seed_user('9100000009', 'boardzero')
+        settled = self.settle(user, 'faridabad', 0, [('number', 100), ('number', 0), ('andar', 0), ('bahar', 1)])
+        self.assertEqual(settled, {
+            ('number', 100): ('won', Decimal('910.00')),
+            ('number', 0): ('won', Decimal('910.00')),
+            ('andar', 0): ('won', Decimal('90.00')),
+            ('bahar', 1): ('lost', 0),
+        })
+        self.assertEqual(Wallet.objects.get(user=user).winnings, Decimal('1910.00'))
+
+
+class GameScheduleTests(TestCase):
+    def setUp(self):
+        self.user = seed_user('9000000009', 'latecomer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bet(self, game, bet_type='number', number=5):
+        return self.client.post(reverse('place-bet'), {'game': game, 'bet_type': bet_type, 'number': number,
+                                                       'amount': 10}, format='json')
+
+    def test_window_wraps_past_midnight(self):
+        game = ScheduledGame(Game(name='gali', label='Gali', opens_at=time(23), closes_at=time(22, 50),
+                                  result_at=time(23), bet_types=['number']))
+        self.assertTrue(game.is_open(time(23, 30)))
+        self.assertTrue(game.is_open(time(12)))
+        self.assertFalse(game.is_open(time(22, 55)))
+
+    def test_rejects_without_a_query(self):
+        # A window that opens an hour from now is closed now, whatever the time
+        now = timezone.localtime(timezone.now(), game_schedule.time_zone)
+        open_game(self, 'gali', opens_at=(now + timedelta(hours=1)).time(), closes_at=(now + timedelta(hours=2)).time())
+        open_game(self, 'faridabad', bet_types=['number'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.bet('gali').json()['error'], 'Betting is closed for Gali')
+            self.assertEqual(self.bet('nowhere').status_code, 400)
+            self.assertEqual(self.bet('faridabad', 'andar').status_code, 400)
+            for game in (5, ['gali'], {'name': 'gali'}):
+                response = self.bet(game)
+                self.assertEqual((response.status_code, response.json()), (400, {'error': 'Invalid bet data'}))
+                response = self.client.post(reverse('place-bet-slip'), {'game': game, 'bets': [
+                    {'number': 5, 'amount': 10}]}, format='json')
+                self.assertEqual((response.status_code, response.json()), (400, {'error': 'Invalid bet slip'}))
+        self.assertEqual(self.bet('faridabad').status_code, 200)
+        self.assertEqual(Bet.objects.filter(user=self.user).count(), 1)
+
+    def test_status_follows_saved_games(self):
+        game = open_game(self)
+        with self.assertNumQueries(0):
+            statuses = {row['name']: row['status'] for row in self.client.get(reverse('game-status')).json()['games']}
+        self.assertEqual(statuses['gali'], 'open')
+
+        game.is_active = False
+        game.save()
+        statuses = {row['name'] for row in self.client.get(reverse('game-status')).json()['games']}
+        self.assertNotIn('gali', statuses)
+
+    def test_settlement_leaves_bets_for_the_next_draw(self):
+        # The draw closed an hour ago and betting on the next one has reopened
+        now = timezone.localtime(timezone.now(), game_schedule.time_zone)
+        open_game(self, 'gali', closes_at=(now - timedelta(hours=1)).time(),
+                  opens_at=(now - timedelta(minutes=30)).time())
+        earlier, later = Bet.objects.bulk_create(
+            Bet(user=self.user, game='gali', bet_type='number', number=5, amount=Decimal('10.00')) for _ in range(2))
+        Bet.objects.filter(pk=earlier.pk).update(created_at=now - timedelta(hours=2))
+
+        job = enqueue_settlement('gali', 5)
+        run_job(job, workers=1)
+        self.assertEqual(Bet.objects.get(pk=earlier.pk).status, 'won')
+        self.assertEqual(Bet.objects.get(pk=later.pk).status, 'pending')
+        self.assertEqual(SettlementJob.objects.get(pk=job.pk).bets_processed, 1)
+
+
+class ConcurrentIdempotencyTests(TransactionTestCase):
+    def test_concurrent_retries_place_one_bet(self):
+        user = seed_user('9000000004', 'racer')
+        open_game(self)
+
+        def place(_):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                return client.post(reverse('place-bet'), {'game': 'gali', 'number': 5, 'amount': 100},
+                                   format='json', HTTP_IDEMPOTENCY_KEY='same').status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            codes = list(pool.map(place, range(6)))
+
+        self.assertEqual(codes, [200] * 6)
+        self.assertEqual(Bet.objects.filter(user=user).count(), 1)
+        self.assertEqual(Wallet.objects.get(user=user).balance, Decimal('9900.00'))
+
+
+@PRIMARY_ONLY
+class ConcurrentAsyncBetTests(TransactionTestCase):
+    async def test_async_bets_run_on_worker_threads(self):
+        user = await sync_to_async(seed_user)('9000000016', 'asyncracer')
+        await sync_to_async(open_game)(self)
+        token = UserClaimsRefreshToken.for_user(user).access_token
+
+        def bet(**headers):
+            return self.async_client.post(reverse('async-place-bet'), {'game': 'gali', 'number': 5, 'amount': 100},
+                                          content_type='application/json',
+                                          headers={'Authorization': f'Bearer {token}', **headers})
+
+        responses = await asyncio.gather(*(bet() for _ in range(4)), *(bet(**{'Idempotency-Key': 'once'}) for _ in range(4)))
+        self.assertEqual([r.status_code for r in responses], [200] * 8)
+        self.assertEqual(await Bet.objects.filter(user=user).acount(), 5)
+        self.assertEqual((await Wallet.objects.aget(user=user)).balance, Decimal('9500.00'))
+
+
+class ConcurrentExposureTests(TransactionTestCase):
+    def test_bets_wait_for_a_rebuild_of_their_game(self):
+        user = seed_user('9000000015', 'punter')
+        open_game(self)
+
+        def place():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                return client.post(reverse('place-bet'), {'game': 'gali', 'number': 5, 'amount': 100},
+                                   format='json').status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            with transaction.atomic():
+                # Hold the lock as a rebuild does between its count and its rewrite
+                with connection.cursor() as cursor:
+                    cursor.execute(EXPOSURE_LOCK_SQL, ['gali'])
+                placed = pool.submit(place)
+                with self.assertRaises(FuturesTimeout):
+                    placed.result(timeout=0.5)
+            self.assertEqual(placed.result(timeout=5), 200)
+
+        rebuild_exposure()
+        counter = ExposureCounter.objects.get(game='gali', bet_type='number', number=5)
+        self.assertEqual((counter.stake, counter.bets), (Decimal('100.00'), 1))
+
+
+class ConcurrentWithdrawalApprovalTests(TransactionTestCase):
+    def test_admins_approving_together_debit_once(self):
+        user = seed_user('9000000014', 'withdrawer')
+        withdraw = WithdrawRequest.objects.create(user=user, amount=Decimal('100.00'))
+        model_admin = WithdrawRequestAdmin(WithdrawRequest, admin.site)
+        select_for_update = WithdrawRequest.objects.select_for_update
+        # Both admins see the request pending before either one locks it
+        barrier = threading.Barrier(2, timeout=5)
+
+        def lock(*args, **kwargs):
+            barrier.wait()
+            return select_for_update(*args, **kwargs)
+
+        def approve(_):
+            try:
+                model_admin.approve_withdrawal(None, WithdrawRequest.objects.filter(pk=withdraw.pk))
+            finally:
+                connections.close_all()
+
+        with mock.patch.object(WithdrawRequest.objects, 'select_for_update', lock), \
+                mock.patch.object(model_admin, 'message_user'), ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(approve, range(2)))
+
+        self.assertEqual(Wallet.objects.get(user=user).balance, Decimal('9900.00'))
+        self.assertEqual(Transaction.objects.filter(user=user, transaction_type='withdraw').count(), 1)
+        self.assertEqual(UserFinancialSummary.objects.get(user=user).total_withdraw, Decimal('100.00'))
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = seed_user('9000000010', 'reader')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        response_cache.backend.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        # The test database is only dropped once every pooled connection to it is gone
+        connections['replica'].close_pool()
+        super().tearDownClass()
+
+    def reads_from(self, name='transaction-history', **headers):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(reverse(name), **headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {'default': len(primary), 'replica': len(replica)}
+
+    def test_history_reads_from_the_replica_until_the_user_writes(self):
+        self.assertEqual(self.reads_from(), {'default': 0, 'replica': 1})
+        self.client.post(reverse('withdraw-request'), {'amount': 100}, format='json')
+        self.assertEqual(self.reads_from(), {'default': 1, 'replica': 0})
+
+    def test_every_replica_view_reads_only_from_the_replica(self):
+        admin = seed_user('9000000013', 'replica_admin', is_staff=True)
+        token = UserClaimsRefreshToken.for_user(self.user).access_token
+        views = [(name, self.user, {}) for name in (
+            'transaction-history', 'view-bets-24h', 'view-bets-30d', 'user-bet-history', 'referral_earnings')]
+        views += [(name, admin, {}) for name in (
+            'admin-grouped-bets', 'admin-bet-records', 'admin_transactions', 'admin_referral_summary',
+            'admin_referrers', 'admin_users_stats')]
+        views += [(name, None, {'HTTP_AUTHORIZATION': f'Bearer {token}'}) for name in (
+            'async-transaction-history', 'async-view-bets-24h', 'async-view-bets-30d', 'async-user-bet-history')]
+        for name, user, headers in views:
+            with self.subTest(name=name):
+                self.client.force_authenticate(user)
+                reads = self.reads_from(name, **headers)
+                self.assertEqual(reads['default'], 0)
+                self.assertGreater(reads['replica'], 0)
+
+    def test_objects_read_from_the_replica_save_to_the_primary(self):
+        with reading_from_replica():
+            wallet = Wallet.objects.get(user=self.user)
+        self.assertEqual(wallet._state.db, 'replica')
+        self.assertEqual(ReplicaRouter().db_for_write(Wallet, instance=wallet), 'default')
+        self.assertEqual(ReplicaRouter().db_for_read(Wallet, instance=wallet), 'default')
+
+
+class MigrationTests(TransactionTestCase):
+    def migrate(self, *targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(list(targets) or executor.loader.graph.leaf_nodes())
+        return executor.loader.project_state(list(targets) or None).apps
+
+    def test_bet_status_settles_existing_bets(self):
+        self.addCleanup(self.migrate)
+        apps = self.migrate(('stapp', '0012_user_profile_image'))
+        user = apps.get_model('stapp', 'User').objects.create(username='old', mobile='9000000020')
+        Bet = apps.get_model('stapp', 'Bet')
+        now = timezone.now()
+        # (game, number, is_win, hours ago): a gali result was declared after
+        # number 1 and 2 were placed, but not yet for 3, nor any faridabad one
+        for game, number, is_win, hours in (('gali', 1, False, 3), ('gali', 2, True, 2), ('gali', 3, False, 1),
+                                            ('faridabad', 4, False, 3)):
+            bet = Bet.objects.create(user=user, game=game, bet_type='number', number=number, amount=10, is_win=is_win)
+            Bet.objects.filter(pk=bet.pk).update(created_at=now - timedelta(hours=hours))
+
+        apps = self.migrate(('stapp', '0013_bet_status'))
+        statuses = dict(apps.get_model('stapp', 'Bet').objects.values_list('number', 'status'))
+        self.assertEqual(statuses, {1: 'lost', 2: 'won', 3: 'pending', 4: 'pending'})
+
+    def test_referred_by_codes_become_foreign_keys(self):
+        self.addCleanup(self.migrate)
+        User = self.migrate(('stapp', '0021_referral_code_sequence')).get_model('stapp', 'User')
+        referrer = User.objects.create(username='referrer', mobile='9000000021')
+        referrer.refresh_from_db()
+        User.objects.create(username='invited', mobile='9000000022', referred_by=referrer.referral_code)
+        User.objects.create(username='stray', mobile='9000000023', referred_by='NOBODY')
+
+        User = self.migrate(('stapp', '0022_referred_by_fk_cleanup')).get_model('stapp', 'User')
+        self.assertEqual(dict(User.objects.values_list('username', 'referred_by__username')),
+                         {'referrer': None, 'invited': 'referrer', 'stray': None})
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AuthBackendTests(TestCase):
+    def setUp(self):
+        self.user = seed_user('9000000005', 'loginname')
+        self.backend = MobileOrUsernameBackend()
+
+    def test_mobile_or_username_in_one_query(self):
+        for identifier in (self.user.mobile, self.user.username):
+            with self.subTest(identifier=identifier), self.assertNumQueries(1):
+                self.assertEqual(self.backend.authenticate(None, username=identifier, password='secret123'), self.user)
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.backend.authenticate(None, username='nobody', password='secret123'))
+        self.assertIsNone(self.backend.authenticate(None, username=self.user.mobile, password='wrong'))
+
+    def test_get_user_is_cached_until_the_user_changes(self):
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.backend.get_user(self.user.pk)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def login(self):
+        return self.client.post(reverse('login'), {'mobile': self.user.mobile, 'password': 'secret123'},
+                                content_type='application/json')
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher',
+                                         'django.contrib.auth.hashers.PBKDF2PasswordHasher'])
+    def test_login_upgrades_an_old_hash_once(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password('secret123', hasher='pbkdf2_sha256'))
+        self.assertEqual(self.login().status_code, 200)
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('md5$'))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_login_is_turned_away_when_the_hash_pool_is_full(self):
+        with mock.patch('stapp.hashers._slots', threading.BoundedSemaphore(1)) as slots, \
+                mock.patch('stapp.hashers.WAIT', 0):
+            slots.acquire()
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+    async def test_a_cancelled_login_gives_its_slot_back(self):
+        slots = threading.BoundedSemaphore(2)
+        with mock.patch('stapp.hashers._slots', slots), mock.patch('stapp.hashers.WAIT', 1):
+            for _ in range(2):
+                slots.acquire()
+            waiting = asyncio.create_task(acheck_password_bounded('secret123', ''))
+            await asyncio.sleep(0.1)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+            # The waiting thread takes the freed slot after the cancel
+            slots.release()
+            await asyncio.sleep(0.5)
+            slots.release()
+            # Full capacity again
+            self.assertTrue(slots.acquire(blocking=False))
+            self.assertTrue(slots.acquire(blocking=False))
+
+@PRIMARY_ONLY
+@skipUnless(connection.settings_dict['OPTIONS'].get('pool'), 'needs psycopg_pool')
+class LoginConnectionTests(TransactionTestCase):
+    """Logins hand their pooled connection back while the password hashes."""
+
+    def setUp(self):
+        self.user = seed_user('9000000012', 'pooled')
+        self.backend = MobileOrUsernameBackend()
+        self.held = []
+
+    def verify(self, password, encoded):
+        self.held.append(connection.connection is not None)
+        return bool(encoded), False
+
+    async def averify(self, password, encoded):
+        return await sync_to_async(self.verify)(password, encoded)
+
+    def test_login_hashes_without_a_connection(self):
+        with mock.patch('stapp.backends.check_password_bounded', self.verify):
+            self.assertEqual(self.backend.authenticate(None, username='pooled', password='secret123'), self.user)
+            self.assertIsNone(self.backend.authenticate(None, username='nobody', password='secret123'))
+        self.assertEqual(self.held, [False, False])
+
+    async def test_async_login_hashes_without_a_connection(self):
+        with mock.patch('stapp.backends.acheck_password_bounded', self.averify):
+            self.assertEqual(await self.backend.aauthenticate(None, username='pooled', password='secret123'),
+                             self.user)
+            self.assertIsNone(await self.backend.aauthenticate(None, username='nobody', password='secret123'))
+        self.assertEqual(self.held, [False, False])
+
+
+@PRIMARY_ONLY
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = seed_user('9000000006', 'claims', is_staff=True)
+        self.refresh = UserClaimsRefreshToken.for_user(self.user)
+        self.client = APIClient()
+
+    def get(self, name, token):
+        return self.client.get(reverse(name), HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_access_token_needs_no_user_query(self):
+        # Only the wallet read; the user and is_staff come from the token
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get('wallet-balance', self.refresh.access_token).status_code, 200)
+        self.assertEqual(self.get('admin_users_stats', self.refresh.access_token).status_code, 200)
+
+    def test_refresh_restamps_claims(self):
+        self.user.is_staff = False
+        self.user.save()
+        access = self.client.post(reverse('token_refresh'), {'refresh': str(self.refresh)}).json()['access']
+        self.assertEqual(self.get('admin_users_stats', access).status_code, 403)
+
+        self.user.is_active = False
+        self.user.save()
+        refresh = self.client.post(reverse('token_refresh'), {'refresh': str(self.refresh)})
+        self.assertEqual(refresh.status_code, 401)
+
+    def test_blocking_or_demoting_cuts_off_a_live_access_token(self):
+        self.addCleanup(cache.clear)
+        access = self.refresh.access_token
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.get('admin_users_stats', access).status_code, 403)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get('wallet-balance', access).status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get('wallet-balance', access).status_code, 401)
+
+    async def test_blocked_user_is_cut_off_in_async_views(self):
+        self.addCleanup(cache.clear)
+        access = self.refresh.access_token
+        self.user.is_active = False
+        await self.user.asave()
+        response = await self.async_client.get(reverse('async-wallet-balance'), headers={'Authorization': f'Bearer {access}'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_tokens_without_claims_load_the_user(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get('wallet-balance', RefreshToken.for_user(self.user).access_token).status_code, 200)
+
+    @override_settings(JWT_USER_CACHE_SIZE=10, RESPONSE_CACHE_TTL=0)
+    def test_user_cache_sees_blocked_users(self):
+        self.addCleanup(user_cache.clear)
+        self.get('wallet-balance', self.refresh.access_token)
+        with self.assertNumQueries(1):
+            self.get('wallet-balance', self.refresh.access_token)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get('wallet-balance', self.refresh.access_token).status_code, 401)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportUsersTests(TestCase):
+    def test_imports_users_with_wallets_and_rejects_bad_rows(self):
+        referrer = seed_user('9000000007', 'agent')
+        rows = [
+            {'username': 'p1', 'mobile': '9300000001', 'password': 'pw', 'referral_code': referrer.referral_code},
+            {'username': 'p2', 'mobile': '9300000002'},
+            {'username': 'p3', 'mobile': '9300000001'},
+            {'username': 'p4', 'mobile': referrer.mobile},
+            {'username': 'p5', 'mobile': '9300000005', 'referral_code': 'NOPE'},
+            {'username': 'p6', 'mobile': '12'},
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path, rejects = os.path.join(tmp, 'users.jsonl'), os.path.join(tmp, 'rejects.jsonl')
+            with open(path, 'w') as f:
+                f.writelines(json.dumps(row) + '\n' for row in rows)
+            call_command('import_users', path, workers=0, chunk_size=4, rejects=rejects, stdout=io.StringIO())
+            with open(rejects) as f:
+                rejected = [json.loads(line)['row']['username'] for line in f]
+
+        self.assertEqual(sorted(rejected), ['p3', 'p4', 'p5', 'p6'])
+        p1 = User.objects.get(username='p1')
+        self.assertTrue(p1.check_password('pw'))
+        self.assertEqual(p1.referred_by_id, referrer.id)
+        self.assertFalse(User.objects.get(username='p2').has_usable_password())
+        self.assertEqual(Wallet.objects.filter(user__username__in=['p1', 'p2']).count(), 2)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SeedDataTests(TestCase):
+    def test_seeds_consistent_data_and_clears_it(self):
+        bystander = seed_user('9000000012', 'bystander')
+        call_command('seed_data', users=50, bets=3000, referred=0.8, stdout=io.StringIO())
+        seeded = User.objects.filter(username__startswith='seed_')
+        self.assertEqual(seeded.filter(is_staff=False).count(), 50)
+        self.assertTrue(seeded.get(username='seed_admin').check_password('seed-password'))
+
+        bets = Bet.objects.filter(user__in=seeded)
+        self.assertEqual(bets.count(), 3000)
+        self.assertEqual(set(bets.values_list('game', flat=True)), {game for game, _ in Bet.GAME_CHOICES})
+        # Referrers are seeded users who joined earlier
+        for user in seeded.filter(referred_by__isnull=False):
+            self.assertLess(user.referred_by_id, user.id)
+        commissions = ReferralCommission.objects.filter(referred_user__in=seeded)
+        self.assertEqual(commissions.count(), bets.filter(
+            user__referred_by__isnull=False, game__in=COMMISSION_GAMES).count())
+        self.assertFalse(commissions.filter(rolled_up_at__isnull=True, bet__status__in=['won', 'lost']).exists())
+        self.assertEqual(Transaction.objects.filter(transaction_type='deposit').count(), DepositRequest.objects.count())
+        self.assertEqual(sum(c.stake for c in ExposureCounter.objects.all()),
+                         sum(b.amount for b in bets.filter(status='pending')))
+
+        call_command('seed_data', clear=True, stdout=io.StringIO())
+        self.assertFalse(User.objects.filter(username__startswith='seed_').exists())
+        self.assertEqual(list(Bet.objects.values_list('user', flat=True).distinct()), [])
+        self.assertFalse(ExposureCounter.objects.exists())
+        self.assertTrue(User.objects.filter(pk=bystander.pk).exists())
+
+
+@PRIMARY_ONLY
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN the hot queries against a large fixture and fail on a
+    sequential scan of the big tables.
+    """
+    SCAN_TABLES = [Bet, Transaction, DepositRequest]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = seed_user('9000000000', 'admin', is_staff=True)
+        cls.user = seed_user('9000000001', 'bettor')
+
+        quote = connection.ops.quote_name
+        user_table = quote(User._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {user_table} (password, is_superuser, username, first_name, last_name,
+                                          is_staff, is_active, date_joined, mobile, referral_code)
+                SELECT '', false, 'load' || i, '', '', false, true, now(), '7' || lpad(i::text, 9, '0'), 'LOAD' || i
+                FROM generate_series(1, %s) AS i
+            """, [PLAN_USERS])
+            cursor.execute(f"""
+                INSERT INTO {quote(Bet._meta.db_table)}
+                    (user_id, game, bet_type, number, amount, is_win, payout, status, created_at)
+                SELECT u.id, (ARRAY['gali','faridabad','disawer','ghaziabad'])[1 + i %% 4], 'number',
+                       i %% 100, 10, false, 0, CASE WHEN i %% 10 = 0 THEN 'pending' ELSE 'lost' END,
+                       now() - (i || ' seconds')::interval
+                FROM generate_series(1, %s) AS i
+                JOIN {user_table} AS u ON u.username = 'load' || (1 + i %% %s)
+            """, [PLAN_BETS, PLAN_USERS])
+            for model, columns, values in (
+                (Transaction, 'transaction_type, amount, status, note', "'deposit', 100, 'approved', ''"),
+                (DepositRequest, 'amount, utr_number, status', "100, lpad(i::text, 12, '0'), 'approved'"),
+                (WithdrawRequest, 'amount, is_approved, is_rejected', '50, true, false'),
+            ):
+                cursor.execute(f"""
+                    INSERT INTO {quote(model._meta.db_table)} (user_id, created_at, {columns})
+                    SELECT u.id, now() - (i || ' seconds')::interval, {values}
+                    FROM generate_series(1, %s) AS i
+                    JOIN {user_table} AS u ON u.username = 'load' || (1 + i %% %s)
+                """, [PLAN_ROWS, PLAN_USERS])
+            Bet.objects.bulk_create(
+                Bet(user=cls.user, game='gali', bet_type='number', number=i, amount=10) for i in range(50))
+            for model in (User, Bet, Transaction, DepositRequest, WithdrawRequest):
+                cursor.execute(f'ANALYZE {quote(model._meta.db_table)}')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def assertNoSeqScan(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        for model in self.SCAN_TABLES:
+            self.assertNotIn(f'Seq Scan on {model._meta.db_table}', plan, f'{sql}\n{plan}')
+
+    def assertEndpointUsesIndexes(self, url, user, data=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200, response.content)
+        for query in queries:
+            self.assertNoSeqScan(query['sql'])
+        return response
+
+    def test_user_history(self):
+        for name in ('transaction-history', 'view-bets-24h', 'view-bets-30d', 'user-bet-history'):
+            with self.subTest(name=name):
+                response = self.assertEndpointUsesIndexes(reverse(name), self.user, {'page_size': 10})
+                if response.data['next']:
+                    self.assertEndpointUsesIndexes(response.data['next'], self.user)
+
+    def test_admin_ledger(self):
+        response = self.assertEndpointUsesIndexes(reverse('admin_transactions'), self.admin)
+        self.assertEndpointUsesIndexes(
+            reverse('admin_transactions'), self.admin, {'cursor': response.data['next_cursor']})
+
+    def test_bet_book_drill_down(self):
+        self.assertEndpointUsesIndexes(
+            reverse('admin-bet-records'), self.admin, {'game': 'gali', 'bet_type': 'number', 'number': 7})
+
+    def test_settlement_window(self):
+        # Settling a window walks the pending-bets index, not the whole table
+        lo = Bet.objects.filter(game='gali', status='pending').order_by('id').values_list('id', flat=True)[0]
+        with CaptureQueriesContext(connection) as queries:
+            settle_chunk('gali', 7, lo, lo + CHUNK_SIZE)
+        for query in queries:
+            self.assertNoSeqScan(query['sql'])
@@ -1,5 +1,6 @@
 from django.urls import path
 from .views import *
+from . import async_views
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
@@ -10,12 +11,15 @@ urlpatterns = [
     path('withdraw/', withdraw_request, name='withdraw-request'),
     path('transactions/', transaction_history, name='transaction-history'),
     path('place-bet/', place_bet, name='place-bet'),
+    path('place-bet-slip/', place_bet_slip, name='place-bet-slip'),
     path('view-bets-24h/', view_bets_24h, name='view-bets-24h'),
     path('view-bets-30d/', view_bets_30d, name='view-bets-30d'),
     path('my-bets/', user_bet_history, name='user-bet-history'),
     path('admin/token/', AdminTokenObtainPairView.as_view(), name='admin_token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', TokenRefreshView.as_view(serializer_class=UserClaimsTokenRefreshSerializer), name='token_refresh'),
     path('admin/bets/', AdminGroupedBetStatsAPIView.as_view(), name='admin-grouped-bets'),
+    path('admin/bets/records/', AdminBetRecordsAPIView.as_view(), name='admin-bet-records'),
+    path('admin/exposure/', admin_exposure, name='admin-exposure'),
     path('admin/withdraw-requests/', admin_withdraw_requests, name='admin_withdraw_requests'),
     path('admin/withdraw-action/', admin_withdraw_action, name='admin_withdraw_action'),
     path('admin/transactions/', admin_transactions, name='admin_transactions'),  
@@ -23,11 +27,22 @@ urlpatterns = [
     path('admin/deposit-requests/', admin_list_deposit_requests, name='admin_list_deposit_requests'),
     path('admin/deposit-action/', admin_deposit_action, name='admin_deposit_action'),
     path('admin/declare-result/', declare_result, name='declare-result'),
+    path('admin/settlement-jobs/<int:job_id>/', settlement_job_status, name='settlement-job-status'),
     path('user/referrals/', referral_earnings, name="referral_earnings"),
     path('admin/referral-summary/', admin_referral_summary, name="admin_referral_summary"),
+    path('admin/referrers/', admin_referrers, name='admin_referrers'),
+    path('admin/cache-stats/', admin_cache_stats, name='admin_cache_stats'),
     path('user/my-referrals/', user_referral_summary, name='user_referral_summary'),
     path('admin/users-stats/', admin_users_stats, name='admin_users_stats'),
     path('game-status/', game_status, name='game-status'),
     path('get-profile/', get_user_profile, name='get_profile'),
+
+    # Async versions for ASGI deployments (see async_views.py)
+    path('async/balance/', async_views.wallet_balance, name='async-wallet-balance'),
+    path('async/place-bet/', async_views.place_bet, name='async-place-bet'),
+    path('async/transactions/', async_views.transaction_history, name='async-transaction-history'),
+    path('async/view-bets-24h/', async_views.view_bets_24h, name='async-view-bets-24h'),
+    path('async/view-bets-30d/', async_views.view_bets_30d, name='async-view-bets-30d'),
+    path('async/my-bets/', async_views.user_bet_history, name='async-user-bet-history'),
     
 ]
\ No newline at end of file
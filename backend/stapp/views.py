@@ -1,5 +1,5 @@
 from django.shortcuts import render
-from django.contrib.auth import authenticate
+from django.contrib.auth import aauthenticate
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
@@ -9,14 +9,27 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.db import models
-from django.db.models import Sum
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
 from .models import *
+from .wallet import InsufficientBalance
+from .settlement import enqueue_settlement
+from .exposure import exposure_book, stake_cap, StakeCapExceeded
+from .bets import place_bets, parse_line, InvalidBet, MAX_SLIP_LINES
+from .idempotency import idempotent
+from .caching import cached_response, invalidate_wallets, response_cache, PROFILE, WALLET
+from .schedule import game_schedule
+from .routers import pin_primary, replica_reads
+from .hashers import PasswordCheckBusy, make_password_bounded
+from .authentication import UserClaimsRefreshToken, UserClaimsTokenRefreshSerializer
+from .reports import (
+    users_stats_queryset, filter_users_stats, ledger_page, bet_book, bet_window, referrer_stats_queryset,
+    referrers_queryset,
+)
+from .pagination import StandardResultsSetPagination, HistoryCursorPagination
+from .summary import record_deposit, record_withdrawal
 import json
-import random
-import string
-from decimal import Decimal
-from django.contrib.auth.hashers import make_password
+from decimal import Decimal, InvalidOperation
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import RegisterSerializer, MobileTokenObtainPairSerializer, AdminTokenSerializer, WithdrawRequestSerializer, DepositRequestSerializer, DepositActionSerializer, ReferralCommissionSerializer
@@ -26,16 +39,10 @@ from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 
 
-def generate_referral_code(username, mobile):
-    """Generate a unique referral code based on username and mobile"""
-    # Take first 3 chars of username and last 4 digits of mobile
-    username_part = username[:3].upper() if username else "USR"
-    mobile_part = mobile[-4:] if mobile and len(mobile) >= 4 else "0000"
-
-    # Add 2 random characters for uniqueness
-    random_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=2))
-
-    return f"{username_part}{mobile_part}{random_part}"
+def taken_user_field(error):
+    """'username' or 'mobile' when an INSERT failed on that field's unique constraint."""
+    constraint = getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None) or ''
+    return next((field for field in ('username', 'mobile') if field in constraint), None)
 
 @csrf_exempt
 def register_user(request):
@@ -48,56 +55,45 @@ def register_user(request):
             password = data.get('password')
             referral_code = data.get('referral_code', '')
 
-            # Check if user already exists
-            if User.objects.filter(username=username).exists():
-                return JsonResponse({'error': 'Username already exists'}, status=400)
-
-            if User.objects.filter(mobile=mobile).exists():
-                return JsonResponse({'error': 'Mobile number already exists'}, status=400)
-
-            # Generate unique referral code for new user
-            new_referral_code = generate_referral_code(username, mobile)
-
-            # Ensure referral code is unique
-            while User.objects.filter(referral_code=new_referral_code).exists():
-                new_referral_code = generate_referral_code(username, mobile)
-
-            # Create user
-            user = User.objects.create(
-                username=username,
-                mobile=mobile,
-                email=email,
-                password=make_password(password),
-                referral_code=new_referral_code
-            )
-
-            # Create wallet for user
-            Wallet.objects.create(user=user)
-
-            # Handle referral logic
-            if referral_code:
-                try:
-                    referrer = User.objects.get(referral_code=referral_code)
-                    # Add referral bonus to referrer's wallet (50 bonus)
-                    referrer_wallet = Wallet.objects.get(user=referrer)
-                    referrer_wallet.bonus += Decimal('50.00')
-                    referrer_wallet.save()
-
-                    # Create referral commission record
-                    ReferralCommission.objects.create(
-                        referrer=referrer,
-                        referred_user=user,
-                        amount=Decimal('50.00'),
-                        commission_type='signup_bonus'
+            # Hash before opening the transaction
+            password = make_password_bounded(password)
+
+            # An unknown referral code is ignored
+            referrer = User.objects.filter(referral_code=referral_code).first() if referral_code else None
+
+            # One INSERT each; the unique constraints on username and mobile
+            # catch duplicates and the database assigns the referral code
+            try:
+                with transaction.atomic():
+                    user = User.objects.create(
+                        username=username,
+                        mobile=mobile,
+                        email=email,
+                        password=password,
+                        referred_by=referrer,
                     )
-                except User.DoesNotExist:
-                    pass  # Invalid referral code, ignore
+                    Wallet.objects.create(user=user)
+
+                    if referrer is not None:
+                        # Signup bonus for the referrer
+                        Wallet.objects.filter(user=referrer).update(bonus=F('bonus') + Decimal('50.00'))
+                        invalidate_wallets(referrer.id)
+            except IntegrityError as e:
+                field = taken_user_field(e)
+                if field is None:
+                    raise
+                message = 'Username already exists' if field == 'username' else 'Mobile number already exists'
+                return JsonResponse({'error': message}, status=400)
 
             return JsonResponse({
                 'message': 'User registered successfully',
-                'referral_code': new_referral_code
+                'referral_code': user.referral_code
             }, status=201)
 
+        except PasswordCheckBusy as e:
+            response = JsonResponse({'error': str(e.detail)}, status=e.status_code)
+            response['Retry-After'] = '1'
+            return response
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
@@ -106,7 +102,9 @@ def register_user(request):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 @csrf_exempt
-def login_user(request):
+async def login_user(request):
+    # Async so that under ASGI a login waiting on the password hash pool
+    # holds no thread; the hashing itself runs on stapp.hashers' bounded pool.
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
@@ -117,11 +115,11 @@ def login_user(request):
                 return JsonResponse({'error': 'Mobile and password are required'}, status=400)
 
             # Authenticate user using mobile number
-            user = authenticate(request, username=mobile, password=password)
+            user = await aauthenticate(request, username=mobile, password=password)
 
             if user is not None:
                 # Generate JWT tokens
-                refresh = RefreshToken.for_user(user)
+                refresh = UserClaimsRefreshToken.for_user(user)
                 access_token = refresh.access_token
 
                 return JsonResponse({
@@ -139,6 +137,10 @@ def login_user(request):
             else:
                 return JsonResponse({'error': 'Invalid mobile number or password'}, status=401)
 
+        except PasswordCheckBusy as e:
+            response = JsonResponse({'error': str(e.detail)}, status=e.status_code)
+            response['Retry-After'] = '1'
+            return response
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
@@ -148,13 +150,10 @@ def login_user(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_response(PROFILE)
 def get_user_profile(request):
     try:
         user = request.user
-        # Generate referral code if it doesn't exist
-        if not user.referral_code:
-            user.referral_code = generate_referral_code(user.username, user.mobile)
-            user.save()
 
         profile_image_url = None
         if user.profile_image:
@@ -174,6 +173,7 @@ def get_user_profile(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_response(WALLET)
 def get_wallet_balance(request):
     try:
         wallet = Wallet.objects.get(user=request.user)
@@ -193,75 +193,77 @@ def get_wallet_balance(request):
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
+def parse_bet(data):
+    """(game, line) from a place_bet body; raises InvalidBet."""
+    if not isinstance(data, dict):
+        raise InvalidBet('Invalid bet data')
+    game_name = data.get('game') or data.get('game_name') or ''
+    if not game_name or not isinstance(game_name, str):
+        raise InvalidBet('Invalid bet data')
+    return game_name.lower(), parse_line(data)
+
+def place_bet_result(user, game_name, line):
+    """place_bet's (status, body), shared by the sync view and async_views.place_bet."""
+    try:
+        bets, balance, bonus = place_bets(user, game_name, [line])
+        return 200, {
+            'message': 'Bet placed successfully',
+            'bet_id': bets[0].id,
+            'remaining_balance': str(balance + bonus)
+        }
+    except InvalidBet as e:
+        return 400, {'error': str(e)}
+    except InsufficientBalance:
+        return 400, {'error': 'Insufficient balance'}
+    except StakeCapExceeded:
+        return 400, {'error': 'Betting limit reached for this number'}
+    except Wallet.DoesNotExist:
+        return 404, {'error': 'Wallet not found'}
+    except Exception as e:
+        return 500, {'error': str(e)}
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def place_bet(request):
     try:
-        data = request.data
-        game_name = data.get('game_name')
-        number = data.get('number')
-        amount = Decimal(str(data.get('amount', 0)))
-
-        # Check if user has sufficient balance
-        wallet = Wallet.objects.get(user=request.user)
-        total_balance = wallet.balance + wallet.bonus
-
-        if total_balance < amount:
-            return Response({'error': 'Insufficient balance'}, status=400)
+        game_name, line = parse_bet(request.data)
+    except InvalidBet as e:
+        return Response({'error': str(e)}, status=400)
+    status_code, body = place_bet_result(request.user, game_name, line)
+    return Response(body, status=status_code)
 
-        # Deduct amount from wallet (prefer balance over bonus)
-        if wallet.balance >= amount:
-            wallet.balance -= amount
-        else:
-            remaining = amount - wallet.balance
-            wallet.balance = Decimal('0.00')
-            wallet.bonus -= remaining
-
-        wallet.save()
-
-        # Create bet record
-        bet = Bet.objects.create(
-            user=request.user,
-            game_name=game_name,
-            number=number,
-            amount=amount
-        )
-
-        # Handle referral commission (1% for specific games)
-        commission_games = ['faridabad', 'gali', 'disawar', 'ghaziabad']
-        if game_name.lower() in commission_games:
-            try:
-                # Find referrer
-                referrer_commission = ReferralCommission.objects.filter(
-                    referred_user=request.user,
-                    commission_type='signup_bonus'
-                ).first()
-
-                if referrer_commission:
-                    referrer = referrer_commission.referrer
-                    commission_amount = amount * Decimal('0.01')  # 1%
-
-                    # Add commission to referrer's bonus
-                    referrer_wallet = Wallet.objects.get(user=referrer)
-                    referrer_wallet.bonus += commission_amount
-                    referrer_wallet.save()
-
-                    # Create commission record
-                    ReferralCommission.objects.create(
-                        referrer=referrer,
-                        referred_user=request.user,
-                        amount=commission_amount,
-                        commission_type='bet_commission'
-                    )
-            except Exception as e:
-                print(f"Referral commission error: {e}")
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def place_bet_slip(request):
+    try:
+        data = request.data
+        game_name = data.get('game') or ''
+        lines = data.get('bets')
+        if not game_name or not isinstance(game_name, str) or not isinstance(lines, list) or not lines:
+            return Response({'error': 'Invalid bet slip'}, status=400)
+        game_name = game_name.lower()
+        if len(lines) > MAX_SLIP_LINES:
+            return Response({'error': f'At most {MAX_SLIP_LINES} bets per slip'}, status=400)
+
+        # Every line is checked before anything is debited
+        lines = [parse_line(line) for line in lines]
+        bets, balance, bonus = place_bets(request.user, game_name, lines)
 
         return Response({
-            'message': 'Bet placed successfully',
-            'bet_id': bet.id,
-            'remaining_balance': str(wallet.balance + wallet.bonus)
+            'message': 'Bets placed successfully',
+            'bet_ids': [bet.id for bet in bets],
+            'total_amount': str(sum(bet.amount for bet in bets)),
+            'remaining_balance': str(balance + bonus)
         })
 
+    except InvalidBet as e:
+        return Response({'error': str(e)}, status=400)
+    except InsufficientBalance:
+        return Response({'error': 'Insufficient balance'}, status=400)
+    except StakeCapExceeded:
+        return Response({'error': 'Betting limit reached for one of the numbers'}, status=400)
     except Wallet.DoesNotExist:
         return Response({'error': 'Wallet not found'}, status=404)
     except Exception as e:
@@ -271,52 +273,78 @@ def place_bet(request):
 @permission_classes([IsAuthenticated])
 def declare_result(request):
     try:
+        if not request.user.is_staff:
+            return Response({'error': 'Admin access required'}, status=403)
+
         data = request.data
-        game_name = data.get('game_name')
-        winning_number = data.get('winning_number')
-
-        # Find all bets for this game
-        bets = Bet.objects.filter(game_name=game_name, status='pending')
-
-        for bet in bets:
-            if bet.number == winning_number:
-                # User won
-                winning_amount = bet.amount * 10  # 10x multiplier
-                wallet = Wallet.objects.get(user=bet.user)
-                wallet.winnings += winning_amount
-                wallet.save()
-                bet.status = 'won'
-            else:
-                bet.status = 'lost'
-            bet.save()
+        game_name = data.get('game') or data.get('game_name') or ''
+        try:
+            winning_number = int(data.get('winning_number'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid game or winning number'}, status=400)
+
+        if not game_name or not isinstance(game_name, str) or not 0 <= winning_number <= 99:
+            return Response({'error': 'Invalid game or winning number'}, status=400)
+        game_name = game_name.lower()
 
-        return Response({'message': f'Results declared for {game_name}'})
+        # Settlement runs in the settlement_worker command, the admin polls the job
+        job = enqueue_settlement(game_name, winning_number, request.user)
+
+        return Response({
+            'message': f'Result declared for {game_name}, settlement queued',
+            'job_id': job.id,
+            'status': job.status
+        }, status=202)
 
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def settlement_job_status(request, job_id):
+    try:
+        if not request.user.is_staff:
+            return Response({'error': 'Admin access required'}, status=403)
+
+        job = SettlementJob.objects.get(id=job_id)
+        return Response({
+            'job_id': job.id,
+            'game': job.game,
+            'winning_number': job.winning_number,
+            'status': job.status,
+            'bets_processed': job.bets_processed,
+            'bets_total': job.bets_total,
+            'winners': job.winners,
+            'total_payout': str(job.payout),
+            'elapsed_seconds': round(job.elapsed(), 2),
+            'error': job.error
+        })
+    except SettlementJob.DoesNotExist:
+        return Response({'error': 'Settlement job not found'}, status=404)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+def referrer_stats_data(stats):
+    """The referral figures of a user from referrer_stats_queryset()."""
+    return {
+        'referral_code': stats.referral_code,
+        'total_referrals': stats.total_referrals,
+        'active_referrals': stats.active_referrals,
+        'total_earnings': str(stats.total_commission),
+        'pending_earnings': str(stats.pending_commission),
+        'last_30_days_earnings': str(stats.recent_commission),
+    }
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_referral_info(request):
     try:
         user = request.user
 
-        # Get referral stats
-        total_referrals = User.objects.filter(
-            id__in=ReferralCommission.objects.filter(
-                referrer=user,
-                commission_type='signup_bonus'
-            ).values_list('referred_user_id', flat=True)
-        ).count()
-
-        total_earnings = ReferralCommission.objects.filter(
-            referrer=user
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
+        # Every figure on the referral page, in one query
+        stats = referrer_stats_queryset().get(pk=user.pk)
 
-        return Response({
-            'referral_code': user.referral_code,
-            'total_referrals': total_referrals,
-            'total_earnings': str(total_earnings),
+        return Response(referrer_stats_data(stats) | {
             'referral_url': f"https://yourapp.com/register?ref={user.referral_code}"
         })
 
@@ -354,6 +382,7 @@ def wallet_balance(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def withdraw_request(request):
     try:
         amount = Decimal(str(request.data.get('amount', 0)))
@@ -372,81 +401,78 @@ def withdraw_request(request):
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
+def transaction_row(txn):
+    return {
+        'id': txn.id,
+        'type': txn.transaction_type,
+        'amount': str(txn.amount),
+        'status': txn.status,
+        'created_at': txn.created_at
+    }
+
+def bet_row(bet):
+    return {
+        'id': bet.id,
+        'game': bet.game,
+        'number': bet.number,
+        'amount': str(bet.amount),
+        'status': bet.status,
+        'created_at': bet.created_at
+    }
+
+def bet_history_row(bet):
+    return bet_row(bet) | {'payout': str(bet.payout) if bet.payout else '0'}
+
+# History endpoints by name: the user's rows and how each is shown. The
+# async versions in async_views.py serve the same pages.
+HISTORY = {
+    'transactions': (lambda user: Transaction.objects.filter(user=user), transaction_row),
+    'bets-24h': (lambda user: Bet.objects.filter(user=user, created_at__gte=timezone.now() - timedelta(hours=24)),
+                 bet_row),
+    'bets-30d': (lambda user: Bet.objects.filter(user=user, created_at__gte=timezone.now() - timedelta(days=30)),
+                 bet_row),
+    'my-bets': (lambda user: Bet.objects.filter(user=user), bet_history_row),
+}
+
+def history_page(request, name):
+    rows, row = HISTORY[name]
+    paginator = HistoryCursorPagination()
+    page = paginator.paginate_queryset(rows(request.user), request)
+    return paginator.get_paginated_response([row(item) for item in page])
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def transaction_history(request):
     try:
-        transactions = Transaction.objects.filter(user=request.user).order_by('-created_at')
-        data = []
-        for txn in transactions:
-            data.append({
-                'id': txn.id,
-                'type': txn.transaction_type,
-                'amount': str(txn.amount),
-                'status': txn.status,
-                'created_at': txn.created_at
-            })
-        return Response(data)
+        return history_page(request, 'transactions')
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def view_bets_24h(request):
     try:
-        yesterday = timezone.now() - timedelta(hours=24)
-        bets = Bet.objects.filter(user=request.user, created_at__gte=yesterday)
-        data = []
-        for bet in bets:
-            data.append({
-                'id': bet.id,
-                'game': bet.game,
-                'number': bet.number,
-                'amount': str(bet.amount),
-                'status': 'won' if bet.is_win else 'lost',
-                'created_at': bet.created_at
-            })
-        return Response(data)
+        return history_page(request, 'bets-24h')
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def view_bets_30d(request):
     try:
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        bets = Bet.objects.filter(user=request.user, created_at__gte=thirty_days_ago)
-        data = []
-        for bet in bets:
-            data.append({
-                'id': bet.id,
-                'game': bet.game,
-                'number': bet.number,
-                'amount': str(bet.amount),
-                'status': 'won' if bet.is_win else 'lost',
-                'created_at': bet.created_at
-            })
-        return Response(data)
+        return history_page(request, 'bets-30d')
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def user_bet_history(request):
     try:
-        bets = Bet.objects.filter(user=request.user).order_by('-created_at')
-        data = []
-        for bet in bets:
-            data.append({
-                'id': bet.id,
-                'game': bet.game,
-                'number': bet.number,
-                'amount': str(bet.amount),
-                'status': 'won' if bet.is_win else 'lost',
-                'payout': str(bet.payout) if bet.payout else '0',
-                'created_at': bet.created_at
-            })
-        return Response(data)
+        return history_page(request, 'my-bets')
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
@@ -454,24 +480,92 @@ def user_bet_history(request):
 class AdminGroupedBetStatsAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(replica_reads)
+    def get(self, request):
+        try:
+            if not request.user.is_staff:
+                return Response({'error': 'Admin access required'}, status=403)
+
+            # Totals per game, bet type and number, grouped in SQL
+            return Response(bet_book(request.query_params))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        except Exception as e:
+            return Response({'error': str(e)}, status=500)
+
+class AdminBetRecordsAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @method_decorator(replica_reads)
     def get(self, request):
         try:
-            bets = Bet.objects.all().order_by('-created_at')
+            if not request.user.is_staff:
+                return Response({'error': 'Admin access required'}, status=403)
+
+            # Drill-down into one cell of the bet book, one page at a time
+            bets, date_from, date_to = bet_window(request.query_params)
+            bet_type = request.query_params.get('bet_type')
+            if bet_type:
+                bets = bets.filter(bet_type=bet_type)
+            number = request.query_params.get('number')
+            if number not in (None, ''):
+                bets = bets.filter(number=int(number))
+
+            paginator = HistoryCursorPagination()
+            page = paginator.paginate_queryset(bets.select_related('user'), request)
+
             data = []
-            for bet in bets:
+            for bet in page:
                 data.append({
                     'id': bet.id,
                     'user': bet.user.username,
+                    'mobile': bet.user.mobile,
                     'game': bet.game,
+                    'bet_type': bet.bet_type,
                     'number': bet.number,
                     'amount': str(bet.amount),
-                    'is_win': bet.is_win,
+                    'status': bet.status,
                     'created_at': bet.created_at
                 })
-            return Response(data)
+            return paginator.get_paginated_response(data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def admin_exposure(request):
+    try:
+        if not request.user.is_staff:
+            return Response({'error': 'Admin access required'}, status=403)
+
+        game = (request.query_params.get('game') or '').lower()
+        if game not in dict(Bet.GAME_CHOICES):
+            return Response({'error': 'Invalid game'}, status=400)
+
+        # Read from the live counters, never from the bets table
+        rows = exposure_book(game)
+        cap = stake_cap(game)
+        return Response({
+            'game': game,
+            'cap': str(cap) if cap is not None else None,
+            'total_stake': str(sum((row['stake'] for row in rows), Decimal('0.00'))),
+            'max_liability': str(rows[0]['liability']) if rows else '0.00',
+            'numbers': [
+                {
+                    'bet_type': row['bet_type'],
+                    'number': row['number'],
+                    'stake': str(row['stake']),
+                    'bets': row['bets'],
+                    'liability': str(row['liability'])
+                }
+                for row in rows
+            ]
+        })
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def admin_withdraw_requests(request):
@@ -479,7 +573,7 @@ def admin_withdraw_requests(request):
         if not request.user.is_staff:
             return Response({'error': 'Admin access required'}, status=403)
 
-        requests = WithdrawRequest.objects.all().order_by('-created_at')
+        requests = WithdrawRequest.objects.select_related('user').order_by('-created_at')
         serializer = WithdrawRequestSerializer(requests, many=True)
         return Response(serializer.data)
     except Exception as e:
@@ -498,43 +592,53 @@ def admin_withdraw_action(request):
         if not withdraw_id or action not in ['approve', 'reject']:
             return Response({'error': 'Invalid request data'}, status=400)
 
-        withdraw_request = WithdrawRequest.objects.get(id=withdraw_id)
-
-        if action == 'approve':
-            # Check if user has sufficient balance
-            wallet = Wallet.objects.get(user=withdraw_request.user)
-            if wallet.balance < withdraw_request.amount:
-                return Response({'error': 'User has insufficient balance'}, status=400)
-
-            # Deduct amount from wallet
-            wallet.balance -= withdraw_request.amount
-            wallet.save()
-
-            withdraw_request.is_approved = True
-            withdraw_request.approved_at = timezone.now()
-
-            # Create transaction record for approved withdrawal
-            Transaction.objects.create(
-                user=withdraw_request.user,
-                transaction_type='withdraw',
-                amount=withdraw_request.amount,
-                status='approved',
-                note='Withdrawal approved'
-            )
-
-        else:  # reject
-            withdraw_request.is_rejected = True
-
-            # Create transaction record for rejected withdrawal
-            Transaction.objects.create(
-                user=withdraw_request.user,
-                transaction_type='withdraw',
-                amount=withdraw_request.amount,
-                status='rejected',
-                note='Withdrawal rejected'
-            )
-
-        withdraw_request.save()
+        with transaction.atomic():
+            # Lock the request so two admins can't process it twice
+            withdraw_request = WithdrawRequest.objects.select_for_update().get(id=withdraw_id)
+
+            if withdraw_request.is_approved or withdraw_request.is_rejected:
+                return Response({'error': 'Withdrawal request already processed'}, status=400)
+
+            # The user's next history read should see this decision
+            pin_primary(withdraw_request.user_id)
+
+            if action == 'approve':
+                # Deduct amount from wallet only if the user still has sufficient balance
+                debited = Wallet.objects.filter(
+                    user_id=withdraw_request.user_id, balance__gte=withdraw_request.amount
+                ).update(balance=F('balance') - withdraw_request.amount)
+                if not debited:
+                    return Response({'error': 'User has insufficient balance'}, status=400)
+                invalidate_wallets(withdraw_request.user_id)
+
+                withdraw_request.is_approved = True
+                withdraw_request.approved_at = timezone.now()
+
+                # Create transaction record for approved withdrawal
+                Transaction.objects.create(
+                    user_id=withdraw_request.user_id,
+                    transaction_type='withdraw',
+                    amount=withdraw_request.amount,
+                    status='approved',
+                    note='Withdrawal approved'
+                )
+
+                # Keep the user's running totals in step with the approval
+                record_withdrawal(withdraw_request)
+
+            else:  # reject
+                withdraw_request.is_rejected = True
+
+                # Create transaction record for rejected withdrawal
+                Transaction.objects.create(
+                    user_id=withdraw_request.user_id,
+                    transaction_type='withdraw',
+                    amount=withdraw_request.amount,
+                    status='rejected',
+                    note='Withdrawal rejected'
+                )
+
+            withdraw_request.save()
         return Response({'message': f'Withdrawal request {action}d successfully'})
 
     except WithdrawRequest.DoesNotExist:
@@ -544,78 +648,48 @@ def admin_withdraw_action(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def admin_transactions(request):
     try:
         if not request.user.is_staff:
             return Response({'error': 'Admin access required'}, status=403)
 
-        transactions = []
-
-        # Get all Transaction records
-        transaction_records = Transaction.objects.all().order_by('-created_at')
-        for txn in transaction_records:
-            transactions.append({
-                'id': txn.id,
-                'user': {
-                    'username': txn.user.username,
-                    'mobile': txn.user.mobile
-                },
-                'transaction_type': txn.transaction_type,
-                'amount': str(txn.amount),
-                'status': txn.status,
-                'created_at': txn.created_at.isoformat(),
-                'note': txn.note or ''
-            })
-
-        # Get all DepositRequest records
-        deposit_requests = DepositRequest.objects.all().order_by('-created_at')
-        for deposit in deposit_requests:
-            transactions.append({
-                'id': f'dep_{deposit.id}',
-                'user': {
-                    'username': deposit.user.username,
-                    'mobile': deposit.user.mobile
-                },
-                'transaction_type': 'deposit',
-                'amount': str(deposit.amount),
-                'status': deposit.status,
-                'created_at': deposit.created_at.isoformat(),
-                'note': f'UTR: {deposit.utr_number}'
-            })
+        # One UNION ALL over transactions, deposit and withdraw requests, keyset paginated
+        rows, next_cursor = ledger_page(request.query_params)
 
-        # Get all WithdrawRequest records
-        withdraw_requests = WithdrawRequest.objects.all().order_by('-created_at')
-        for withdraw in withdraw_requests:
-            status = 'approved' if withdraw.is_approved else 'rejected' if withdraw.is_rejected else 'pending'
+        transactions = []
+        for row in rows:
             transactions.append({
-                'id': f'with_{withdraw.id}',
+                'id': row['id'] if row['source'] == 'txn' else f"{row['source']}_{row['id']}",
                 'user': {
-                    'username': withdraw.user.username,
-                    'mobile': withdraw.user.mobile
+                    'username': row['username'],
+                    'mobile': row['mobile']
                 },
-                'transaction_type': 'withdraw',
-                'amount': str(withdraw.amount),
-                'status': status,
-                'created_at': withdraw.created_at.isoformat(),
-                'note': ''
+                'transaction_type': row['kind'],
+                'amount': str(row['amount']),
+                'status': row['status'],
+                'created_at': row['created_at'].isoformat(),
+                'note': row['note']
             })
 
-        # Sort all transactions by created_at in descending order
-        transactions.sort(key=lambda x: x['created_at'], reverse=True)
-
-        return Response(transactions)
+        return Response({
+            'results': transactions,
+            'next_cursor': next_cursor
+        })
+    except ValueError:
+        return Response({'error': 'Invalid cursor or filter value'}, status=400)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def user_deposit_request(request):
     try:
         # Get and validate data
         data = request.data
         amount = Decimal(str(data.get('amount', 0)))
         utr_number = data.get('utr_number', '').strip()
-        payment_method = data.get('payment_method', 'UPI').strip()
 
         # Validate amount
         if amount < Decimal('100.00'):
@@ -630,7 +704,6 @@ def user_deposit_request(request):
             user=request.user,
             amount=amount,
             utr_number=utr_number,
-            payment_method=payment_method,
             status='pending'
         )
 
@@ -668,7 +741,7 @@ def admin_list_deposit_requests(request):
         if not request.user.is_staff:
             return Response({'error': 'Admin access required'}, status=403)
 
-        requests = DepositRequest.objects.all().order_by('-created_at')
+        requests = DepositRequest.objects.select_related('user').order_by('-created_at')
         serializer = DepositRequestSerializer(requests, many=True)
         return Response(serializer.data)
     except Exception as e:
@@ -688,60 +761,64 @@ def admin_deposit_action(request):
         if not deposit_id or action not in ['approve', 'reject']:
             return Response({'error': 'Invalid request data'}, status=400)
 
-        deposit = DepositRequest.objects.get(id=deposit_id)
-        
-        if deposit.status != 'pending':
-            return Response({'error': 'Deposit request already processed'}, status=400)
-
-        if action == 'approve':
-            # Approve deposit
-            deposit.status = 'approved'
-            deposit.approved_at = timezone.now()
-            deposit.approved_by = request.user
-            deposit.save()
-
-            # Add funds to wallet
-            wallet = Wallet.objects.get(user=deposit.user)
-            wallet.balance += deposit.amount
-            wallet.save()
-
-            # Update transaction record
-            Transaction.objects.filter(
-                user=deposit.user,
-                amount=deposit.amount,
-                status='pending'
-            ).update(
-                status='approved',
-                note=f'Deposit approved - UTR: {deposit.utr_number}'
-            )
-
-            return Response({
-                'message': 'Deposit approved successfully',
-                'new_balance': str(wallet.balance)
-            })
-
-        else:
-            # Reject deposit
-            deposit.status = 'rejected'
-            deposit.rejected_at = timezone.now()
-            deposit.rejected_by = request.user
-            deposit.admin_note = admin_note
-            deposit.save()
-
-            # Update transaction record
-            Transaction.objects.filter(
-                user=deposit.user,
-                amount=deposit.amount,
-                status='pending'
-            ).update(
-                status='rejected',
-                note=f'Deposit rejected: {admin_note}'
-            )
+        with transaction.atomic():
+            # Lock the request so two admins can't approve it twice
+            deposit = DepositRequest.objects.select_for_update().get(id=deposit_id)
+
+            if deposit.status != 'pending':
+                return Response({'error': 'Deposit request already processed'}, status=400)
+
+            # The user's next history read should see this decision
+            pin_primary(deposit.user_id)
+
+            if action == 'approve':
+                # Approve deposit
+                deposit.status = 'approved'
+                deposit.approved_at = timezone.now()
+                deposit.save()
+
+                # Add funds to wallet
+                Wallet.objects.filter(user_id=deposit.user_id).update(balance=F('balance') + deposit.amount)
+                invalidate_wallets(deposit.user_id)
+                wallet = Wallet.objects.get(user_id=deposit.user_id)
+
+                # Update transaction record
+                Transaction.objects.filter(
+                    user=deposit.user_id,
+                    amount=deposit.amount,
+                    status='pending'
+                ).update(
+                    status='approved',
+                    note=f'Deposit approved - UTR: {deposit.utr_number}'
+                )
+
+                # Keep the user's running totals in step with the approval
+                record_deposit(deposit)
+
+                return Response({
+                    'message': 'Deposit approved successfully',
+                    'new_balance': str(wallet.balance)
+                })
 
-            return Response({
-                'message': 'Deposit rejected',
-                'reason': admin_note
-            })
+            else:
+                # Reject deposit
+                deposit.status = 'rejected'
+                deposit.save()
+
+                # Update transaction record
+                Transaction.objects.filter(
+                    user=deposit.user_id,
+                    amount=deposit.amount,
+                    status='pending'
+                ).update(
+                    status='rejected',
+                    note=f'Deposit rejected: {admin_note}'
+                )
+
+                return Response({
+                    'message': 'Deposit rejected',
+                    'reason': admin_note
+                })
 
     except DepositRequest.DoesNotExist:
         return Response({'error': 'Deposit request not found'}, status=404)
@@ -750,119 +827,132 @@ def admin_deposit_action(request):
     
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def referral_earnings(request):
     try:
-        commissions = ReferralCommission.objects.filter(referrer=request.user)
+        paginator = HistoryCursorPagination()
+        commissions = paginator.paginate_queryset(
+            ReferralCommission.objects.filter(referrer=request.user).select_related('referred_user', 'bet'), request)
         serializer = ReferralCommissionSerializer(commissions, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def admin_referral_summary(request):
     try:
         if not request.user.is_staff:
             return Response({'error': 'Admin access required'}, status=403)
 
-        commissions = ReferralCommission.objects.all().order_by('-created_at')
+        paginator = HistoryCursorPagination()
+        commissions = paginator.paginate_queryset(
+            ReferralCommission.objects.select_related('referred_user', 'bet'), request)
         serializer = ReferralCommissionSerializer(commissions, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def admin_referrers(request):
+    try:
+        if not request.user.is_staff:
+            return Response({'error': 'Admin access required'}, status=403)
+
+        # Every referrer's totals come out of one annotated query per page
+        paginator = StandardResultsSetPagination()
+        referrers = paginator.paginate_queryset(referrers_queryset(), request)
+        return paginator.get_paginated_response([
+            referrer_stats_data(referrer) | {'id': referrer.id, 'username': referrer.username, 'mobile': referrer.mobile}
+            for referrer in referrers
+        ])
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def admin_cache_stats(request):
+    if not request.user.is_staff:
+        return Response({'error': 'Admin access required'}, status=403)
+
+    # Counted per process; each worker reports its own
+    return Response({
+        'backend': type(response_cache.backend).__name__,
+        'ttl': response_cache.ttl,
+        'kinds': response_cache.stats(),
+    })
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_referral_summary(request):
-    return get_referral_info(request)
+    return get_referral_info(request._request)
 
 @api_view(['GET'])
 def game_status(request):
     try:
-        # Return current game status
-        return Response({
-            'games': [
-                {'name': 'faridabad', 'status': 'active'},
-                {'name': 'gali', 'status': 'active'},
-                {'name': 'disawar', 'status': 'active'},
-                {'name': 'ghaziabad', 'status': 'active'}
-            ]
-        })
+        # Open or closed is worked out per request from the in-memory schedule
+        return Response({'games': game_schedule.status()})
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def admin_users_stats(request):
     try:
         if not request.user.is_staff:
             return Response({'error': 'Admin access required'}, status=403)
 
-        users = User.objects.all()
-        users_data = []
+        # One annotated query, filtered and sorted in SQL, one page at a time
+        users = filter_users_stats(users_stats_queryset(), request.query_params)
 
-        for user in users:
-            try:
-                wallet = Wallet.objects.get(user=user)
-            except Wallet.DoesNotExist:
-                wallet = Wallet.objects.create(user=user)
-
-            # Calculate total deposits
-            total_deposits = DepositRequest.objects.filter(
-                user=user, status='approved'
-            ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-            # Calculate total withdrawals
-            total_withdrawals = WithdrawRequest.objects.filter(
-                user=user, is_approved=True
-            ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-            # Calculate today's deposits
-            today = timezone.now().date()
-            today_deposits = DepositRequest.objects.filter(
-                user=user, status='approved',
-                created_at__date=today
-            ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-            # Calculate today's withdrawals
-            today_withdrawals = WithdrawRequest.objects.filter(
-                user=user, is_approved=True,
-                created_at__date=today
-            ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-            # Calculate total referrals - count unique referred users
-            total_referrals = ReferralCommission.objects.filter(
-                referrer=user
-            ).values('referred_user').distinct().count()
-
-            # Calculate referral earnings
-            referral_earnings = ReferralCommission.objects.filter(
-                referrer=user
-            ).aggregate(total=Sum('commission'))['total'] or Decimal('0.00')
-
-            # Calculate total earnings (winnings + referral earnings)
-            total_earnings = wallet.winnings + referral_earnings
+        summary = users.aggregate(
+            sum_balance=Sum('balance'),
+            sum_deposit=Sum('total_deposit'),
+            sum_withdraw=Sum('total_withdraw'),
+            sum_earning=Sum('total_earning'),
+            sum_referrals=Sum('total_referrals'),
+        )
 
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(users, request)
+
+        users_data = []
+        for user in page:
             users_data.append({
                 'id': user.id,
                 'username': user.username,
                 'mobile': user.mobile,
                 'email': user.email or 'N/A',
-                'balance': str(wallet.balance),
-                'bonus': str(wallet.bonus),
-                'winnings': str(wallet.winnings),
-                'total_deposit': str(total_deposits),
-                'total_withdraw': str(total_withdrawals),
-                'total_earning': str(total_earnings),
-                'today_deposit': str(today_deposits),
-                'today_withdraw': str(today_withdrawals),
-                'total_referrals': total_referrals,
-                'referral_earnings': str(referral_earnings),
+                'balance': str(user.balance),
+                'bonus': str(user.bonus),
+                'winnings': str(user.winnings),
+                'total_deposit': str(user.total_deposit),
+                'total_withdraw': str(user.total_withdraw),
+                'total_earning': str(user.total_earning),
+                'today_deposit': str(user.today_deposit),
+                'today_withdraw': str(user.today_withdraw),
+                'total_referrals': user.total_referrals,
+                'referral_earnings': str(user.referral_earnings),
                 'status': 'active' if user.is_active else 'blocked',
                 'date_joined': user.date_joined
             })
 
-        return Response(users_data)
+        response = paginator.get_paginated_response(users_data)
+        response.data['summary'] = {
+            'total_users': paginator.page.paginator.count,
+            'total_balance': str(summary['sum_balance'] or 0),
+            'total_deposit': str(summary['sum_deposit'] or 0),
+            'total_withdraw': str(summary['sum_withdraw'] or 0),
+            'total_earning': str(summary['sum_earning'] or 0),
+            'total_referrals': summary['sum_referrals'] or 0
+        }
+        return response
+    except (InvalidOperation, ValueError):
+        return Response({'error': 'Invalid filter value'}, status=400)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
@@ -880,7 +970,7 @@ def get_profile(request):
         'mobile': user.mobile,
         'email': user.email,
         'referral_code': user.referral_code,
-        'referred_by': user.referred_by,
+        'referred_by': user.referred_by.referral_code if user.referred_by_id else None,
        
     })
 
@@ -892,6 +982,7 @@ from .serializers import UserProfileSerializer
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_response(PROFILE)
 def get_user_profile(request):
     serializer = UserProfileSerializer(request.user)
     return Response(serializer.data)
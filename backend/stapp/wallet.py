@@ -0,0 +1,47 @@
+from decimal import Decimal
+from django.db import connection
+from .caching import invalidate_wallets
+from .models import Wallet
+
+
+class InsufficientBalance(Exception):
+    """Raised when balance + bonus cannot cover a debit."""
+
+
+# Balance is used first, whatever is left comes out of bonus. Every SET
+# expression sees the old row values, so the split is computed in one pass
+# and the WHERE guard makes the check-and-debit a single atomic statement.
+DEBIT_SQL = """
+    UPDATE {table}
+    SET balance = CASE WHEN balance >= %(amount)s THEN balance - %(amount)s ELSE 0 END,
+        bonus = CASE WHEN balance >= %(amount)s THEN bonus ELSE bonus - (%(amount)s - balance) END
+    WHERE user_id = %(user_id)s AND balance + bonus >= %(amount)s
+    RETURNING balance, bonus
+"""
+
+
+def debit_wallet(user_id, amount):
+    """
+    Debit ``amount`` from the user's wallet with one guarded UPDATE.
+
+    Returns the new ``(balance, bonus)``. Raises ``InsufficientBalance`` if the
+    wallet can't cover the amount and ``Wallet.DoesNotExist`` if there is no
+    wallet. Call it inside ``transaction.atomic()`` together with whatever
+    row the debit pays for, so both commit or roll back together.
+    """
+    amount = Decimal(amount)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            DEBIT_SQL.format(table=connection.ops.quote_name(Wallet._meta.db_table)),
+            {'amount': amount, 'user_id': user_id},
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        # Only the failure path pays for a second query
+        if not Wallet.objects.filter(user_id=user_id).exists():
+            raise Wallet.DoesNotExist('Wallet not found')
+        raise InsufficientBalance('Insufficient balance')
+
+    invalidate_wallets(user_id)
+    return Decimal(str(row[0])), Decimal(str(row[1]))
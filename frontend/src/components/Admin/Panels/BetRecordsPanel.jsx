@@ -1,6 +1,19 @@
 import React, { useState, useEffect } from "react";
 import "./panels.css";
 
+const API = "http://localhost:8000/api";
+
+const today = () => new Date().toISOString().slice(0, 10);
+
+const emptyBook = {
+  total_stake: "0",
+  total_bets: 0,
+  total_users: 0,
+  number: [],
+  andar: [],
+  bahar: [],
+};
+
 const BetRecordsPanel = () => {
   const games = [
     "JAIPUR KING",
@@ -12,53 +25,44 @@ const BetRecordsPanel = () => {
   ];
 
   const [selectedGame, setSelectedGame] = useState(games[0]);
-  const [betRecords, setBetRecords] = useState({
-    numberWiseBets: {},
-    totalBets: 0,
-    totalAmount: 0,
-  });
+  const [dateFrom, setDateFrom] = useState(today());
+  const [dateTo, setDateTo] = useState(today());
+  const [betBook, setBetBook] = useState(emptyBook);
 
-  const [sortColumn, setSortColumn] = useState(null); // e.g. amount, andarAmount
+  const [sortColumn, setSortColumn] = useState(null); // stake, bets or users
   const [sortDirection, setSortDirection] = useState("asc");
 
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
 
+  // Raw bets behind one row of the book, fetched a page at a time
+  const [drillDown, setDrillDown] = useState(null);
+
+  // Live open stake and liability, read from the exposure counters
+  const [exposure, setExposure] = useState(null);
+
+  const authHeaders = () => ({
+    Authorization: `Bearer ${localStorage.getItem("adminToken")}`,
+  });
+
   const fetchBetRecords = async () => {
     setLoading(true);
     setError(null);
+    setDrillDown(null);
     try {
-      const token = localStorage.getItem("adminToken");
-
-      const res = await fetch(`http://localhost:8000/api/admin/bets/`, {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
+      const params = new URLSearchParams({
+        game: selectedGame.toLowerCase(),
+        date_from: dateFrom,
+        date_to: dateTo,
+      });
+      const res = await fetch(`${API}/admin/bets/?${params}`, {
+        headers: authHeaders(),
       });
 
       if (!res.ok) throw new Error("Failed to fetch bet records");
 
       const data = await res.json();
-      console.log("Fetched data:", data);
-      const selectedData = data[selectedGame];
-
-      if (!selectedData || !selectedData.numberWiseBets) {
-        setBetRecords({
-          numberWiseBets: {},
-          totalBets: 0,
-          totalAmount: 0,
-        });
-        setLoading(false);
-        return;
-      }
-
-      const totalBetsCount = Object.keys(selectedData.numberWiseBets).length;
-
-      setBetRecords({
-        numberWiseBets: selectedData.numberWiseBets,
-        totalBets: totalBetsCount,
-        totalAmount: 0,
-      });
+      setBetBook(data.games[selectedGame.toLowerCase()] || emptyBook);
     } catch (err) {
       setError(err.message);
     }
@@ -67,21 +71,57 @@ const BetRecordsPanel = () => {
 
   useEffect(() => {
     fetchBetRecords();
+  }, [selectedGame, dateFrom, dateTo]);
+
+  useEffect(() => {
+    const fetchExposure = async () => {
+      try {
+        const params = new URLSearchParams({ game: selectedGame.toLowerCase() });
+        const res = await fetch(`${API}/admin/exposure/?${params}`, {
+          headers: authHeaders(),
+        });
+        if (res.ok) setExposure(await res.json());
+      } catch (err) {
+        console.error("Error fetching exposure:", err);
+      }
+    };
+
+    fetchExposure();
+    // Counters are cheap to read, so keep them live while the panel is open
+    const interval = setInterval(fetchExposure, 10000);
+    return () => clearInterval(interval);
   }, [selectedGame]);
 
-  const numberTotal = Object.values(betRecords.numberWiseBets).reduce(
-    (sum, data) => sum + (data.amount || 0),
-    0
-  );
-  const andarTotal = Object.values(betRecords.numberWiseBets).reduce(
-    (sum, data) => sum + (data.andarAmount || 0),
-    0
-  );
-  const baharTotal = Object.values(betRecords.numberWiseBets).reduce(
-    (sum, data) => sum + (data.baharAmount || 0),
-    0
-  );
-  const totalAmount = numberTotal + andarTotal + baharTotal;
+  const fetchDrillDown = async (betType, number, url = null) => {
+    try {
+      const params = new URLSearchParams({
+        game: selectedGame.toLowerCase(),
+        bet_type: betType,
+        number,
+        date_from: dateFrom,
+        date_to: dateTo,
+      });
+      const res = await fetch(url || `${API}/admin/bets/records/?${params}`, {
+        headers: authHeaders(),
+      });
+      if (!res.ok) throw new Error("Failed to fetch bets");
+
+      const data = await res.json();
+      setDrillDown((prev) => ({
+        betType,
+        number,
+        rows: url && prev ? [...prev.rows, ...data.results] : data.results,
+        next: data.next,
+      }));
+    } catch (err) {
+      setError(err.message);
+    }
+  };
+
+  const sumStake = (rows) => rows.reduce((sum, row) => sum + Number(row.stake), 0);
+  const numberTotal = sumStake(betBook.number);
+  const andarTotal = sumStake(betBook.andar);
+  const baharTotal = sumStake(betBook.bahar);
 
   const handleSort = (column) => {
     if (sortColumn === column) {
@@ -92,22 +132,18 @@ const BetRecordsPanel = () => {
     }
   };
 
-  const sortedBets = Object.entries(betRecords.numberWiseBets).sort((a, b) => {
-    if (!sortColumn) return 0;
-
-    const valA =
-      sortColumn === "totalAmount"
-        ? (a[1].amount || 0) + (a[1].andarAmount || 0) + (a[1].baharAmount || 0)
-        : a[1][sortColumn] || 0;
-
-    const valB =
-      sortColumn === "totalAmount"
-        ? (b[1].amount || 0) + (b[1].andarAmount || 0) + (b[1].baharAmount || 0)
-        : b[1][sortColumn] || 0;
+  const sortArrow = (column) =>
+    sortColumn === column ? (sortDirection === "asc" ? "🔼" : "🔽") : "";
 
-    return sortDirection === "asc" ? valA - valB : valB - valA;
+  const sortedNumbers = [...betBook.number].sort((a, b) => {
+    if (!sortColumn) return 0;
+    const diff = Number(a[sortColumn]) - Number(b[sortColumn]);
+    return sortDirection === "asc" ? diff : -diff;
   });
 
+  // Andar and bahar are keyed by a single digit
+  const digitRow = (rows, digit) => rows.find((row) => row.number === digit);
+
   return (
     <div className="panel bet-records-panel">
       <h2 className="panel-title">Bet Records</h2>
@@ -124,6 +160,18 @@ const BetRecordsPanel = () => {
             </option>
           ))}
         </select>
+        <input
+          type="date"
+          value={dateFrom}
+          onChange={(e) => setDateFrom(e.target.value)}
+          className="game-select dark"
+        />
+        <input
+          type="date"
+          value={dateTo}
+          onChange={(e) => setDateTo(e.target.value)}
+          className="game-select dark"
+        />
       </div>
 
       {loading && <p>Loading bet records...</p>}
@@ -134,11 +182,15 @@ const BetRecordsPanel = () => {
           <div className="bet-records-summary">
             <div className="summary-card">
               <h3>Total Bets</h3>
-              <p>{betRecords.totalBets}</p>
+              <p>{betBook.total_bets}</p>
+            </div>
+            <div className="summary-card">
+              <h3>Players</h3>
+              <p>{betBook.total_users}</p>
             </div>
             <div className="summary-card highlight">
               <h3>Total Bet Amount</h3>
-              <p>₹{totalAmount}</p>
+              <p>₹{betBook.total_stake}</p>
             </div>
             <div className="summary-card number-total">
               <h3>Total Number Amount</h3>
@@ -154,68 +206,149 @@ const BetRecordsPanel = () => {
             </div>
           </div>
 
+          {exposure && (
+            <div className="bet-records-table">
+              <h3>
+                Live Exposure: ₹{exposure.total_stake} open, max liability ₹
+                {exposure.max_liability}
+                {exposure.cap && ` (cap ₹${exposure.cap} per number)`}
+              </h3>
+              <table className="admin-table">
+                <thead>
+                  <tr>
+                    <th>Type</th>
+                    <th>Number</th>
+                    <th>Open Stake</th>
+                    <th>Bets</th>
+                    <th>Liability</th>
+                  </tr>
+                </thead>
+                <tbody>
+                  {exposure.numbers.slice(0, 10).map((row) => (
+                    <tr key={`${row.bet_type}-${row.number}`}>
+                      <td>{row.bet_type}</td>
+                      <td>{row.number}</td>
+                      <td>₹{row.stake}</td>
+                      <td>{row.bets}</td>
+                      <td>₹{row.liability}</td>
+                    </tr>
+                  ))}
+                </tbody>
+              </table>
+            </div>
+          )}
+
           <div className="bet-records-table">
             <table className="admin-table">
               <thead>
                 <tr>
                   <th>Number</th>
-                  <th onClick={() => handleSort("amount")}>
-                    Number Amount{" "}
-                    {sortColumn === "amount"
-                      ? sortDirection === "asc"
-                        ? "🔼"
-                        : "🔽"
-                      : ""}
+                  <th onClick={() => handleSort("stake")}>
+                    Number Amount {sortArrow("stake")}
                   </th>
-                  <th>Andar Number</th>
-                  <th onClick={() => handleSort("andarAmount")}>
-                    Andar Amount{" "}
-                    {sortColumn === "andarAmount"
-                      ? sortDirection === "asc"
-                        ? "🔼"
-                        : "🔽"
-                      : ""}
+                  <th onClick={() => handleSort("bets")}>
+                    Bets {sortArrow("bets")}
                   </th>
-                  <th>Bahar Number</th>
-                  <th onClick={() => handleSort("baharAmount")}>
-                    Bahar Amount{" "}
-                    {sortColumn === "baharAmount"
-                      ? sortDirection === "asc"
-                        ? "🔼"
-                        : "🔽"
-                      : ""}
-                  </th>
-                  <th onClick={() => handleSort("totalAmount")}>
-                    Total Amount{" "}
-                    {sortColumn === "totalAmount"
-                      ? sortDirection === "asc"
-                        ? "🔼"
-                        : "🔽"
-                      : ""}
+                  <th onClick={() => handleSort("users")}>
+                    Players {sortArrow("users")}
                   </th>
                 </tr>
               </thead>
               <tbody>
-                {sortedBets.map(([number, data]) => {
-                  const total =
-                    (data.amount || 0) +
-                    (data.andarAmount || 0) +
-                    (data.baharAmount || 0);
+                {sortedNumbers.map((row) => (
+                  <tr
+                    key={row.number}
+                    onClick={() => fetchDrillDown("number", row.number)}
+                    style={{ cursor: "pointer" }}
+                  >
+                    <td>{row.number}</td>
+                    <td>₹{row.stake}</td>
+                    <td>{row.bets}</td>
+                    <td>{row.users}</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          </div>
+
+          <div className="bet-records-table">
+            <table className="admin-table">
+              <thead>
+                <tr>
+                  <th>Digit</th>
+                  <th>Andar Amount</th>
+                  <th>Andar Bets</th>
+                  <th>Bahar Amount</th>
+                  <th>Bahar Bets</th>
+                </tr>
+              </thead>
+              <tbody>
+                {[...Array(10).keys()].map((digit) => {
+                  const andar = digitRow(betBook.andar, digit);
+                  const bahar = digitRow(betBook.bahar, digit);
                   return (
-                    <tr key={number}>
-                      <td>{number}</td>
-                      <td>₹{data.amount || 0}</td>
-                      <td>{data.andarNumber || "-"}</td>
-                      <td>₹{data.andarAmount || 0}</td>
-                      <td>{data.baharNumber || "-"}</td>
-                      <td>₹{data.baharAmount || 0}</td>
-                      <td>₹{total}</td>
+                    <tr key={digit}>
+                      <td>{digit}</td>
+                      <td
+                        onClick={() => andar && fetchDrillDown("andar", digit)}
+                        style={{ cursor: andar ? "pointer" : "default" }}
+                      >
+                        ₹{andar ? andar.stake : 0}
+                      </td>
+                      <td>{andar ? andar.bets : 0}</td>
+                      <td
+                        onClick={() => bahar && fetchDrillDown("bahar", digit)}
+                        style={{ cursor: bahar ? "pointer" : "default" }}
+                      >
+                        ₹{bahar ? bahar.stake : 0}
+                      </td>
+                      <td>{bahar ? bahar.bets : 0}</td>
                     </tr>
                   );
                 })}
               </tbody>
             </table>
           </div>
+
+          {drillDown && (
+            <div className="bet-records-table">
+              <h3>
+                {drillDown.betType.toUpperCase()} {drillDown.number} bets
+              </h3>
+              <table className="admin-table">
+                <thead>
+                  <tr>
+                    <th>User</th>
+                    <th>Mobile</th>
+                    <th>Amount</th>
+                    <th>Status</th>
+                    <th>Placed At</th>
+                  </tr>
+                </thead>
+                <tbody>
+                  {drillDown.rows.map((bet) => (
+                    <tr key={bet.id}>
+                      <td>{bet.user}</td>
+                      <td>{bet.mobile}</td>
+                      <td>₹{bet.amount}</td>
+                      <td>{bet.status}</td>
+                      <td>{new Date(bet.created_at).toLocaleString()}</td>
+                    </tr>
+                  ))}
+                </tbody>
+              </table>
+              {drillDown.next && (
+                <button
+                  className="refresh-btn"
+                  onClick={() =>
+                    fetchDrillDown(drillDown.betType, drillDown.number, drillDown.next)
+                  }
+                >
+                  Load More
+                </button>
+              )}
+            </div>
+          )}
         </>
       )}
     </div>
@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useState, useEffect } from "react";
 import "./panels.css";
 import axios from "axios";
 import adminAxios from "../../utils/adminAxios";
@@ -9,6 +9,7 @@ const DeclareResultPanel = () => {
   const [showConfirm, setShowConfirm] = useState(false);
   const [showSuccess, setShowSuccess] = useState(false);
   const [loading, setLoading] = useState(false);
+  const [job, setJob] = useState(null);
 
   const games = [
     { name: "DISAWER", lockTime: "02:30 AM", payout: "91x/9x" },
@@ -19,6 +20,33 @@ const DeclareResultPanel = () => {
     { name: "DIAMOND KING", lockTime: "Every 2:30 hrs", payout: "90x/9x" },
   ];
 
+  // Settlement runs in the background, poll the job until it finishes
+  useEffect(() => {
+    if (!job || job.status === "done" || job.status === "failed") return;
+
+    const interval = setInterval(async () => {
+      try {
+        const res = await adminAxios.get(`admin/settlement-jobs/${job.job_id}/`);
+        setJob(res.data);
+
+        if (res.data.status === "done") {
+          setShowSuccess(true);
+          setTimeout(() => {
+            setShowSuccess(false);
+            setJob(null);
+          }, 3000);
+        } else if (res.data.status === "failed") {
+          alert("Settlement failed: " + res.data.error);
+          setJob(null);
+        }
+      } catch (error) {
+        console.error("Error fetching settlement status:", error);
+      }
+    }, 2000);
+
+    return () => clearInterval(interval);
+  }, [job]);
+
   const handleSubmit = (e) => {
     e.preventDefault();
     if (!selectedGame || !winningNumber) {
@@ -39,15 +67,11 @@ const DeclareResultPanel = () => {
         winning_number: winningNumber,
       });
 
-      if (res.status === 200 || res.status === 201) {
+      if (res.status === 202) {
         setShowConfirm(false);
-        setShowSuccess(true);
+        setJob(res.data);
         setWinningNumber("");
         setSelectedGame("");
-
-        setTimeout(() => {
-          setShowSuccess(false);
-        }, 3000);
       } else {
         throw new Error("Unexpected response");
       }
@@ -95,11 +119,20 @@ const DeclareResultPanel = () => {
           />
         </div>
 
-        <button type="submit" className="declare-btn" disabled={loading}>
+        <button type="submit" className="declare-btn" disabled={loading || !!job}>
           {loading ? "Declaring..." : "Declare Result"}
         </button>
       </form>
 
+      {job && job.status !== "done" && (
+        <div className="settlement-progress">
+          <p>
+            Settling bets: {job.bets_processed || 0} / {job.bets_total || 0}
+            {job.elapsed_seconds !== undefined && ` (${job.elapsed_seconds}s)`}
+          </p>
+        </div>
+      )}
+
       {showConfirm && (
         <div className="popup-overlay">
           <div className="popup-content">
@@ -125,6 +158,11 @@ const DeclareResultPanel = () => {
       {showSuccess && (
         <div className="success-popup">
           <h3>Result Declared Successfully!</h3>
+          {job && (
+            <p>
+              {job.bets_processed} bets settled, {job.winners} winners, payout ₹{job.total_payout}
+            </p>
+          )}
           <p>
             You can modify or change the result from the game history section.
           </p>
@@ -9,22 +9,40 @@ const TransactionsPanel = () => {
   const [error, setError] = useState(null);
   const [filter, setFilter] = useState("all");
 
+  const [statusFilter, setStatusFilter] = useState("all");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  // Transform the API data to match your existing UI structure
+  const formatTransactions = (results) =>
+    results.map(tx => ({
+      id: tx.id,
+      user: tx.user?.username || "N/A",
+      mobile: tx.user?.mobile || "N/A",
+      type: tx.transaction_type,
+      amount: `₹${tx.amount}`,
+      status: tx.status,
+      date: new Date(tx.created_at).toLocaleString(),
+      note: tx.note || "N/A"
+    }));
+
+  // Type, status and search are filtered by the server
+  const buildParams = (cursor) => {
+    const params = {};
+    if (filter !== "all") params.type = filter;
+    if (statusFilter !== "all") params.status = statusFilter;
+    if (searchTerm) params.search = searchTerm;
+    if (cursor) params.cursor = cursor;
+    return params;
+  };
+
   useEffect(() => {
     const fetchTransactions = async () => {
       try {
-        const res = await adminAxios.get("admin/transactions/");
-        // Transform the API data to match your existing UI structure
-        const formattedData = res.data.map(tx => ({
-          id: tx.id,
-          user: tx.user?.username || "N/A",
-          mobile: tx.user?.mobile || "N/A",
-          type: tx.transaction_type,
-          amount: `₹${tx.amount}`,
-          status: tx.status,
-          date: new Date(tx.created_at).toLocaleString(),
-          note: tx.note || "N/A"
-        }));
-        setTransactions(formattedData);
+        const res = await adminAxios.get("admin/transactions/", { params: buildParams() });
+        setTransactions(formatTransactions(res.data.results));
+        setNextCursor(res.data.next_cursor);
+        setError(null);
       } catch (error) {
         console.error("Error fetching transactions:", error);
         setError("Failed to load transactions. Please check your connection and try again.");
@@ -33,27 +51,31 @@ const TransactionsPanel = () => {
       }
     };
 
-    fetchTransactions();
+    const timeout = setTimeout(fetchTransactions, 400);
 
-    // Auto-refresh every 30 seconds
+    // Auto-refresh the first page every 30 seconds
     const interval = setInterval(fetchTransactions, 30000);
-    return () => clearInterval(interval);
-  }, []);
-
-  const filteredTransactions = transactions.filter((transaction) => {
-    const matchesSearch = 
-      transaction.user.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      transaction.mobile.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      transaction.type.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      transaction.amount.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      transaction.status.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      transaction.date.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      transaction.note.toLowerCase().includes(searchTerm.toLowerCase());
+    return () => {
+      clearTimeout(timeout);
+      clearInterval(interval);
+    };
+  }, [filter, statusFilter, searchTerm]);
 
-    const matchesFilter = filter === "all" || transaction.type.toLowerCase() === filter;
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const res = await adminAxios.get("admin/transactions/", { params: buildParams(nextCursor) });
+      setTransactions(prev => [...prev, ...formatTransactions(res.data.results)]);
+      setNextCursor(res.data.next_cursor);
+    } catch (error) {
+      console.error("Error loading more transactions:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
-    return matchesSearch && matchesFilter;
-  });
+  // Already filtered by the server
+  const filteredTransactions = transactions;
 
   const getStats = () => {
     const deposits = transactions.filter(tx => tx.type === 'deposit');
@@ -118,11 +140,25 @@ const TransactionsPanel = () => {
             <option value="withdraw">Withdrawals</option>
           </select>
         </div>
+
+        <div className="filter-group">
+          <label>Filter by Status:</label>
+          <select
+            value={statusFilter}
+            onChange={(e) => setStatusFilter(e.target.value)}
+            className="filter-select"
+          >
+            <option value="all">All Statuses</option>
+            <option value="pending">Pending</option>
+            <option value="approved">Approved</option>
+            <option value="rejected">Rejected</option>
+          </select>
+        </div>
         
         <div className="search-bar">
           <input
             type="text"
-            placeholder="Search by user, mobile, type, amount, status, or note..."
+            placeholder="Search by username or mobile..."
             value={searchTerm}
             onChange={(e) => setSearchTerm(e.target.value)}
             className="search-input"
@@ -194,6 +230,11 @@ const TransactionsPanel = () => {
             </tbody>
           </table>
           </div>
+          {nextCursor && (
+            <button className="refresh-btn" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? "Loading..." : "Load More"}
+            </button>
+          )}
         </div>
       )}
     </div>
@@ -30,15 +30,56 @@ const UsersPanel = () => {
     status: 'all'
   });
 
+  const [ordering, setOrdering] = useState('-id');
+  const [page, setPage] = useState(1);
+  const [totalUsers, setTotalUsers] = useState(0);
+  const [summary, setSummary] = useState(null);
+  const pageSize = 50;
+
+  // Filter state key -> query param evaluated by the server
+  const filterParams = {
+    minBalance: 'min_balance',
+    maxBalance: 'max_balance',
+    minDeposit: 'min_deposit',
+    maxDeposit: 'max_deposit',
+    minWithdraw: 'min_withdraw',
+    maxWithdraw: 'max_withdraw',
+    minEarning: 'min_earning',
+    maxEarning: 'max_earning',
+    minTodayDeposit: 'min_today_deposit',
+    maxTodayDeposit: 'max_today_deposit',
+    minTodayWithdraw: 'min_today_withdraw',
+    maxTodayWithdraw: 'max_today_withdraw',
+    minReferrals: 'min_referrals',
+    maxReferrals: 'max_referrals',
+    minReferralEarnings: 'min_referral_earnings',
+    maxReferralEarnings: 'max_referral_earnings',
+    status: 'status'
+  };
+
+  // Debounce so typing in a filter doesn't fire a request per keystroke
   useEffect(() => {
-    fetchUsers();
-  }, []);
+    const timeout = setTimeout(fetchUsers, 400);
+    return () => clearTimeout(timeout);
+  }, [filters, searchTerm, ordering, page]);
 
   const fetchUsers = async () => {
     try {
       setLoading(true);
-      const response = await adminAxios.get('admin/users-stats/');
-      setUsers(response.data);
+      const params = { page, page_size: pageSize, ordering };
+      Object.entries(filterParams).forEach(([field, param]) => {
+        if (filters[field] !== '' && filters[field] !== 'all') {
+          params[param] = filters[field];
+        }
+      });
+      if (searchTerm) {
+        params.search = searchTerm;
+      }
+
+      const response = await adminAxios.get('admin/users-stats/', { params });
+      setUsers(response.data.results);
+      setTotalUsers(response.data.count);
+      setSummary(response.data.summary);
       setError(null);
     } catch (error) {
       console.error('Error fetching users:', error);
@@ -53,6 +94,7 @@ const UsersPanel = () => {
       ...prev,
       [field]: value
     }));
+    setPage(1);
   };
 
   const clearFilters = () => {
@@ -75,69 +117,10 @@ const UsersPanel = () => {
       maxReferralEarnings: '',
       status: 'all'
     });
+    setPage(1);
   };
 
-  const applyFilters = (user) => {
-    const balance = parseFloat(user.balance);
-    const totalDeposit = parseFloat(user.total_deposit);
-    const totalWithdraw = parseFloat(user.total_withdraw);
-    const totalEarning = parseFloat(user.total_earning);
-    const todayDeposit = parseFloat(user.today_deposit);
-    const todayWithdraw = parseFloat(user.today_withdraw);
-    const totalReferrals = user.total_referrals;
-    const referralEarnings = parseFloat(user.referral_earnings);
-
-    // Status filter
-    if (filters.status !== 'all' && user.status !== filters.status) {
-      return false;
-    }
-
-    // Balance filters
-    if (filters.minBalance && balance < parseFloat(filters.minBalance)) return false;
-    if (filters.maxBalance && balance > parseFloat(filters.maxBalance)) return false;
-
-    // Total Deposit filters
-    if (filters.minDeposit && totalDeposit < parseFloat(filters.minDeposit)) return false;
-    if (filters.maxDeposit && totalDeposit > parseFloat(filters.maxDeposit)) return false;
-
-    // Total Withdraw filters
-    if (filters.minWithdraw && totalWithdraw < parseFloat(filters.minWithdraw)) return false;
-    if (filters.maxWithdraw && totalWithdraw > parseFloat(filters.maxWithdraw)) return false;
-
-    // Total Earning filters
-    if (filters.minEarning && totalEarning < parseFloat(filters.minEarning)) return false;
-    if (filters.maxEarning && totalEarning > parseFloat(filters.maxEarning)) return false;
-
-    // Today Deposit filters
-    if (filters.minTodayDeposit && todayDeposit < parseFloat(filters.minTodayDeposit)) return false;
-    if (filters.maxTodayDeposit && todayDeposit > parseFloat(filters.maxTodayDeposit)) return false;
-
-    // Today Withdraw filters
-    if (filters.minTodayWithdraw && todayWithdraw < parseFloat(filters.minTodayWithdraw)) return false;
-    if (filters.maxTodayWithdraw && todayWithdraw > parseFloat(filters.maxTodayWithdraw)) return false;
-
-    // Referrals filters
-    if (filters.minReferrals && totalReferrals < parseInt(filters.minReferrals)) return false;
-    if (filters.maxReferrals && totalReferrals > parseInt(filters.maxReferrals)) return false;
-
-    // Referral Earnings filters
-    if (filters.minReferralEarnings && referralEarnings < parseFloat(filters.minReferralEarnings)) return false;
-    if (filters.maxReferralEarnings && referralEarnings > parseFloat(filters.maxReferralEarnings)) return false;
-
-    return true;
-  };
-
-  const filteredUsers = users.filter(user => {
-    // Search filter
-    const searchMatch = [
-      user.username,
-      user.mobile,
-      user.email,
-      user.status
-    ].join(' ').toLowerCase().includes(searchTerm.toLowerCase());
-
-    return searchMatch && applyFilters(user);
-  });
+  const totalPages = Math.max(1, Math.ceil(totalUsers / pageSize));
 
   const toggleUserStatus = async (userId, currentStatus) => {
     try {
@@ -156,7 +139,7 @@ const UsersPanel = () => {
     // You can implement navigation to user details page here
   };
 
-  if (loading) {
+  if (loading && users.length === 0) {
     return (
       <div className="panel">
         <div className="loading-container">
@@ -181,7 +164,7 @@ const UsersPanel = () => {
   return (
     <div className="panel">
       <div className="panel-header">
-        <h2>Users Management ({filteredUsers.length} users)</h2>
+        <h2>Users Management ({totalUsers} users)</h2>
         <button onClick={fetchUsers} className="refresh-btn">Refresh</button>
       </div>
 
@@ -191,7 +174,10 @@ const UsersPanel = () => {
           type="text"
           placeholder="Search by username, mobile, email, or status..."
           value={searchTerm}
-          onChange={(e) => setSearchTerm(e.target.value)}
+          onChange={(e) => {
+            setSearchTerm(e.target.value);
+            setPage(1);
+          }}
           className="search-input"
         />
       </div>
@@ -344,6 +330,28 @@ const UsersPanel = () => {
             </div>
           </div>
 
+          <div className="filter-group">
+            <label>Sort By</label>
+            <select
+              value={ordering}
+              onChange={(e) => {
+                setOrdering(e.target.value);
+                setPage(1);
+              }}
+            >
+              <option value="-id">Newest</option>
+              <option value="-balance">Balance (high to low)</option>
+              <option value="-total_deposit">Total Deposit (high to low)</option>
+              <option value="-total_withdraw">Total Withdraw (high to low)</option>
+              <option value="-total_earning">Total Earning (high to low)</option>
+              <option value="-today_deposit">Today Deposit (high to low)</option>
+              <option value="-today_withdraw">Today Withdraw (high to low)</option>
+              <option value="-total_referrals">Referrals (high to low)</option>
+              <option value="-referral_earnings">Referral Earnings (high to low)</option>
+              <option value="username">Username (A-Z)</option>
+            </select>
+          </div>
+
           <div className="filter-group">
             <label>Status</label>
             <select
@@ -386,7 +394,7 @@ const UsersPanel = () => {
               </tr>
             </thead>
             <tbody>
-              {filteredUsers.map((user) => (
+              {users.map((user) => (
                 <tr key={user.id}>
                   <td>{user.id}</td>
                   <td className="username-cell">{user.username}</td>
@@ -429,39 +437,49 @@ const UsersPanel = () => {
         </div>
       </div>
 
-      {filteredUsers.length === 0 && (
+      {users.length === 0 && (
         <div className="no-data">
           <p>No users found matching the current filters.</p>
         </div>
       )}
 
+      <div className="pagination">
+        <button disabled={page <= 1} onClick={() => setPage(page - 1)}>
+          Previous
+        </button>
+        <span>Page {page} of {totalPages}</span>
+        <button disabled={page >= totalPages} onClick={() => setPage(page + 1)}>
+          Next
+        </button>
+      </div>
+
       {/* Summary Statistics */}
       <div className="summary-section">
         <h3>Summary Statistics</h3>
         <div className="stats-grid-detailed">
           <div className="stat-item">
             <span>Total Users:</span>
-            <span>{filteredUsers.length}</span>
+            <span>{summary?.total_users ?? 0}</span>
           </div>
           <div className="stat-item">
             <span>Total Balance:</span>
-            <span>₹{filteredUsers.reduce((sum, user) => sum + parseFloat(user.balance), 0).toFixed(2)}</span>
+            <span>₹{parseFloat(summary?.total_balance || 0).toFixed(2)}</span>
           </div>
           <div className="stat-item">
             <span>Total Deposits:</span>
-            <span>₹{filteredUsers.reduce((sum, user) => sum + parseFloat(user.total_deposit), 0).toFixed(2)}</span>
+            <span>₹{parseFloat(summary?.total_deposit || 0).toFixed(2)}</span>
           </div>
           <div className="stat-item">
             <span>Total Withdrawals:</span>
-            <span>₹{filteredUsers.reduce((sum, user) => sum + parseFloat(user.total_withdraw), 0).toFixed(2)}</span>
+            <span>₹{parseFloat(summary?.total_withdraw || 0).toFixed(2)}</span>
           </div>
           <div className="stat-item">
             <span>Total Earnings:</span>
-            <span>₹{filteredUsers.reduce((sum, user) => sum + parseFloat(user.total_earning), 0).toFixed(2)}</span>
+            <span>₹{parseFloat(summary?.total_earning || 0).toFixed(2)}</span>
           </div>
           <div className="stat-item">
             <span>Total Referrals:</span>
-            <span>{filteredUsers.reduce((sum, user) => sum + user.total_referrals, 0)}</span>
+            <span>{summary?.total_referrals ?? 0}</span>
           </div>
         </div>
       </div>
@@ -6,21 +6,27 @@ const GameHistory = () => {
   const [bets, setBets] = useState([]);
   const [filteredBets, setFilteredBets] = useState([]);
   const [selectedGame, setSelectedGame] = useState("all");
+  const [rawBets, setRawBets] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(true);
 
-  useEffect(() => {
-    const fetchBets = async () => {
+  // Pages are cursor-based; "next" is the full URL of the following page
+  const fetchBets = async (url = "http://127.0.0.1:8000/api/view-bets-30d/") => {
       try {
         const token = localStorage.getItem("token");
-        const res = await axios.get("http://127.0.0.1:8000/api/view-bets-30d/", {
+        const res = await axios.get(url, {
           headers: {
             Authorization: `Bearer ${token}`,
           },
         });
 
+        const allBets = url.includes("cursor=") ? [...rawBets, ...res.data.results] : res.data.results;
+        setRawBets(allBets);
+        setNextPage(res.data.next);
+
         // Grouping by game + timestamp
         const grouped = {};
-        res.data.forEach((bet) => {
+        allBets.forEach((bet) => {
           const key = `${bet.game}|${bet.timestamp}`;
           if (!grouped[key]) {
             grouped[key] = {
@@ -44,8 +50,9 @@ const GameHistory = () => {
       } finally {
         setLoading(false);
       }
-    };
+  };
 
+  useEffect(() => {
     fetchBets();
   }, []);
 
@@ -154,13 +161,13 @@ const GameHistory = () => {
         ))
       )}
 
-      <div className="pagination">
-        <button className="page-btn">&lt;</button>
-        <button className="page-btn active">1</button>
-        <button className="page-btn">2</button>
-        <button className="page-btn">3</button>
-        <button className="page-btn">&gt;</button>
-      </div>
+      {nextPage && (
+        <div className="pagination">
+          <button className="page-btn" onClick={() => fetchBets(nextPage)}>
+            Load More
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -4,21 +4,27 @@ import axios from "axios";
 
 const MyBet = () => {
   const [bets, setBets] = useState([]);
+  const [rawBets, setRawBets] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(true);
 
-  useEffect(() => {
-    const fetchBets = async () => {
+  // Pages are cursor-based; "next" is the full URL of the following page
+  const fetchBets = async (url = "http://127.0.0.1:8000/api/view-bets-24h/") => {
       try {
         const token = localStorage.getItem("token");
-        const res = await axios.get("http://127.0.0.1:8000/api/view-bets-24h/", {
+        const res = await axios.get(url, {
           headers: {
             Authorization: `Bearer ${token}`,
           },
         });
 
+        const allBets = url.includes("cursor=") ? [...rawBets, ...res.data.results] : res.data.results;
+        setRawBets(allBets);
+        setNextPage(res.data.next);
+
         // Group by game + timestamp
         const grouped = {};
-        res.data.forEach((bet) => {
+        allBets.forEach((bet) => {
           const key = `${bet.game}|${bet.timestamp}`;
           if (!grouped[key]) {
             grouped[key] = {
@@ -38,8 +44,9 @@ const MyBet = () => {
       } finally {
         setLoading(false);
       }
-    };
+  };
 
+  useEffect(() => {
     fetchBets();
   }, []);
 
@@ -110,6 +117,12 @@ const MyBet = () => {
           ))
         )}
 
+        {nextPage && (
+          <button className="bet-back-btn" onClick={() => fetchBets(nextPage)}>
+            Load More
+          </button>
+        )}
+
         <a href="/" className="bet-back-btn">
           <i className="fas fa-arrow-left" /> Back to Dashboard
         </a>
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from "react";
 import "./NumberPage.css";
 import { Link, useLocation, useNavigate } from "react-router-dom";
 import axios from "axios";
+import { useIdempotencyKey } from "../../utils/idempotency";
 
 function NumberPage() {
   const location = useLocation();
@@ -14,6 +15,7 @@ function NumberPage() {
   const [currentAmount, setCurrentAmount] = useState(0);
   const [highlightNumbers, setHighlightNumbers] = useState(false);
   const [activeSection, setActiveSection] = useState("all");
+  const idempotencyKeyFor = useIdempotencyKey();
 
   const standardAmounts = [10, 50, 100, 300, 500, 1000];
   const allNumbers = Array.from({ length: 100 }, (_, i) => i + 1);
@@ -69,21 +71,22 @@ function NumberPage() {
 
     const token = localStorage.getItem("token");
     try {
-      for (const key in selectedNumbers) {
-        const bet = selectedNumbers[key];
-        const payload = {
-          game: gameName,
+      // The whole slip goes in one request and is placed all-or-nothing
+      const payload = {
+        game: gameName,
+        bets: Object.values(selectedNumbers).map((bet) => ({
           number: bet.number,
           bet_type: bet.section === "all" ? "number" : bet.section,
           amount: bet.amount,
-        };
+        })),
+      };
 
-        await axios.post("http://127.0.0.1:8000/api/place-bet/", payload, {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-      }
+      await axios.post("http://127.0.0.1:8000/api/place-bet-slip/", payload, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+          "Idempotency-Key": idempotencyKeyFor(payload),
+        },
+      });
 
       // Navigate to success page with bet summary
       navigate("/ordersuccess", {
@@ -28,9 +28,10 @@ const Refers = () => {
         setReferralData({
           referral_code: "LOADING...",
           total_referrals: 0,
-          direct_bonus: 0,
-          commission_earned: 0,
-          total_earned: 0
+          active_referrals: 0,
+          last_30_days_earnings: 0,
+          total_earnings: 0,
+          pending_earnings: 0
         });
       } finally {
         setLoading(false);
@@ -85,16 +86,20 @@ const Refers = () => {
                 <div className="stat-label">Total Referrals</div>
               </div>
               <div className="stat-card">
-                <div className="stat-value">₹{referralData?.direct_bonus || 0}</div>
-                <div className="stat-label">Direct Bonus Earned</div>
+                <div className="stat-value">{referralData?.active_referrals || 0}</div>
+                <div className="stat-label">Active (30 Days)</div>
               </div>
               <div className="stat-card">
-                <div className="stat-value">₹{referralData?.commission_earned || 0}</div>
-                <div className="stat-label">Commission Earned</div>
+                <div className="stat-value">₹{referralData?.last_30_days_earnings || 0}</div>
+                <div className="stat-label">Earned (30 Days)</div>
               </div>
               <div className="stat-card">
-                <div className="stat-value">₹{referralData?.total_earned || 0}</div>
-                <div className="stat-label">Total Earnings</div>
+                <div className="stat-value">₹{referralData?.total_earnings || 0}</div>
+                <div className="stat-label">
+                  Total Commission
+                  {Number(referralData?.pending_earnings) > 0 &&
+                    ` (₹${referralData.pending_earnings} pending)`}
+                </div>
               </div>
             </div>
           )}
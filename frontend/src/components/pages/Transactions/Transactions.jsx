@@ -4,22 +4,23 @@ import "./Transactions.css";
 
 const Transactions = () => {
   const [transactions, setTransactions] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
 
-  useEffect(() => {
-    const fetchTransactions = async () => {
+  // Pages are cursor-based; "next" is the full URL of the following page
+  const fetchTransactions = async (url = "http://127.0.0.1:8000/api/transactions/") => {
       try {
         const token = localStorage.getItem("token");
-        const res = await axios.get("http://127.0.0.1:8000/api/transactions/", {
+        const res = await axios.get(url, {
           headers: {
             Authorization: `Bearer ${token}`,
           },
         });
 
         // Format the API data to your table structure
-        const formatted = res.data.map((tx, index) => ({
-          id: index + 1,
-          date: new Date(tx.date).toLocaleDateString(),
-          time: new Date(tx.date).toLocaleTimeString(),
+        const formatted = res.data.results.map((tx) => ({
+          id: tx.id,
+          date: new Date(tx.created_at).toLocaleDateString(),
+          time: new Date(tx.created_at).toLocaleTimeString(),
           type: tx.type,
           amount:
             (tx.type === "deposit" || tx.type === "win" || tx.type === "bonus"
@@ -28,12 +29,14 @@ const Transactions = () => {
           status: tx.status || "completed",
         }));
 
-        setTransactions(formatted);
+        setTransactions((prev) => (url.includes("cursor=") ? [...prev, ...formatted] : formatted));
+        setNextPage(res.data.next);
       } catch (error) {
         console.error("Failed to load transactions", error);
       }
-    };
+  };
 
+  useEffect(() => {
     fetchTransactions();
   }, []);
 
@@ -76,6 +79,11 @@ const Transactions = () => {
               </tbody>
             </table>
           </div>
+          {nextPage && (
+            <button className="search-input" onClick={() => fetchTransactions(nextPage)}>
+              Load More
+            </button>
+          )}
         </div>
       </div>
     </div>
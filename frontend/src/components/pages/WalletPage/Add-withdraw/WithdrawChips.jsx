@@ -2,11 +2,13 @@ import React, { useState } from "react";
 import "./WithdrawChips.css";
 import { useNavigate } from "react-router-dom";
 import axios from "axios";
+import { useIdempotencyKey } from "../../../utils/idempotency";
 
 const WithdrawChips = () => {
   const [amount, setAmount] = useState("");
   const [error, setError] = useState("");
   const navigate = useNavigate();
+  const idempotencyKeyFor = useIdempotencyKey();
 
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -20,12 +22,14 @@ const WithdrawChips = () => {
       const token = localStorage.getItem("token");
 
       // 🔁 Send only the amount
+      const payload = { amount: parseFloat(amount) };
       const res = await axios.post(
         "http://127.0.0.1:8000/api/withdraw/",
-        { amount: parseFloat(amount) },
+        payload,
         {
           headers: {
             Authorization: `Bearer ${token}`,
+            "Idempotency-Key": idempotencyKeyFor(payload),
           },
         }
       );
@@ -3,6 +3,7 @@ import "./PaymentPage.css";
 import infoIcon from "../../../../assets/paytm-icon.png";
 import { useLocation, useNavigate } from "react-router-dom";
 import axios from "axios";
+import { useIdempotencyKey } from "../../../utils/idempotency";
 
 const PaymentPage = () => {
   const location = useLocation();
@@ -12,6 +13,7 @@ const PaymentPage = () => {
   const [utr, setUtr] = useState("");
   const [error, setError] = useState("");
   const [loading, setLoading] = useState(false);
+  const idempotencyKeyFor = useIdempotencyKey();
 
   const handleConfirmPayment = async () => {
     if (!/^[0-9]{12}$/.test(utr)) {
@@ -25,17 +27,20 @@ const PaymentPage = () => {
     try {
       const token = localStorage.getItem("token");
 
+      const payload = {
+        amount: amount,
+        utr_number: utr,
+        payment_method: paymentMethod,
+      };
+
       const response = await axios.post(
         "/api/deposit-requests/", // Make sure this matches your Django URL
-        {
-          amount: amount,
-          utr_number: utr,
-          payment_method: paymentMethod,
-        },
+        payload,
         {
           headers: {
             Authorization: `Bearer ${token}`,
             "Content-Type": "application/json",
+            "Idempotency-Key": idempotencyKeyFor(payload),
           },
         }
       );
@@ -0,0 +1,17 @@
+// utils/idempotency.js
+import { useRef } from 'react';
+
+// Returns keyFor(payload): the same Idempotency-Key while the payload is
+// unchanged, so a resubmit or retry can't be applied twice, and a fresh
+// key once the user changes what they're sending.
+export const useIdempotencyKey = () => {
+  const current = useRef({ payload: null, key: null });
+
+  return (payload) => {
+    const signature = JSON.stringify(payload);
+    if (current.current.payload !== signature) {
+      current.current = { payload: signature, key: crypto.randomUUID() };
+    }
+    return current.current.key;
+  };
+};